@@ -1,5 +1,5 @@
 from src.utils.logging_config import setup_logger
-import httpx
+from src.services.http_pool import http_pool
 
 # Setup module-specific logger
 logger = setup_logger('anilist_ai')
@@ -21,14 +21,14 @@ class AnimeAIService:
         """Process anime update request through AI"""
         try:
             # Send request to AI service instead of direct Groq call
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.groq_service}/generate",
-                    json={"transcript": database_messages}
-                )
-                if response.status_code == 200:
-                    return response.json().get('text')
-                return None
+            response = await http_pool.post(
+                "ai",
+                "/generate",
+                json={"transcript": database_messages}
+            )
+            if response.status_code == 200:
+                return response.json().get('text')
+            return None
         except Exception as e:
             logger.error(f"Error processing anime update: {e}")
             return None 
\ No newline at end of file
@@ -39,7 +39,7 @@ async def show_media_list(content_type):
     media_type: 'anime' or 'manga'"""
     try:
         discord_username = "madrus"  # Hardcoded username since it's for personal use
-        formatted_string, media_list = anilist_api_requests.get_10_newest_entries(content_type)
+        formatted_string, media_list = await anilist_api_requests.get_10_newest_entries(content_type)
         
 
         title_name = "anime" if content_type == "ANIME" else "manga"
@@ -77,11 +77,11 @@ async def update_media_list(user_question, content_type):
     media_type: 'anime' or 'manga'"""
     try:
         discord_username = "madrus"  # Hardcoded username since it's for personal use
-        connect_to_phpmyadmin.check_user_in_database(discord_username)
-        database_messages = connect_to_phpmyadmin.retrieve_chat_history_from_database(discord_username)
+        await connect_to_phpmyadmin.check_user_in_database(discord_username)
+        database_messages = await connect_to_phpmyadmin.retrieve_chat_history_from_database(discord_username)
 
         print("content type: " + content_type)
-        media_list,_ = anilist_api_requests.get_10_newest_entries(content_type)
+        media_list,_ = await anilist_api_requests.get_10_newest_entries(content_type)
 
         question = f"Madrus: I will give you list of my 10 most recent watched/read {content_type} from site AniList. Here is this list:{media_list}. I want you to remember this because in next question I will ask you to update episodes/chapters of one of them."
         database_messages.append({"role": "user", "content": question})
@@ -119,7 +119,7 @@ async def update_media_list(user_question, content_type):
             updated_info = match.group(2)
             print(f"reformatted request: id:{updated_id}, type:{content_type}: ep/chap{updated_info}")
             
-            anilist_api_requests.change_progress(updated_id, updated_info, content_type)
+            await anilist_api_requests.change_progress(updated_id, updated_info, content_type)
             return answer
 
         return "Could not parse the AI response correctly."
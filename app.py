@@ -3,12 +3,29 @@ from src.utils.logging_config import setup_logger, handle_error
 # Setup main logger
 logger = setup_logger('main')
 
+import atexit
 from dotenv import load_dotenv
 from src.app_instance import socketio, app
+from src.services.http_pool import http_pool
+from src.services.loop_runner import background_loop
 
 # Load environment variables
 load_dotenv()
 
+def close_connection_pools():
+    """Flask has no lifespan hook, so pooled connections are released at interpreter exit"""
+    if background_loop.is_running:
+        try:
+            # Async clients must be closed on the loop that opened them
+            background_loop.run(http_pool.aclose(), timeout=10)
+        except Exception as e:
+            logger.error(f"[SHUTDOWN] Failed to close async connection pools: {e}")
+        background_loop.stop()
+    http_pool.close()
+    logger.info("[SHUTDOWN] Connection pools closed")
+
+atexit.register(close_connection_pools)
+
 if __name__ == '__main__':
     try:
         logger.info("[STARTUP] Starting main application...")
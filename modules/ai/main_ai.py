@@ -1,23 +1,29 @@
 import time
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict, List
+from fastapi.responses import StreamingResponse, Response
+from typing import Dict, List, AsyncIterator, Optional, Tuple
 from dotenv import load_dotenv
 import logging
-import httpx
 from datetime import datetime
 import asyncio
+import json
 
-from modules.ai.services.ai_service import GroqService
+from modules.ai.services.ai_service import GroqService, GROQ_ERROR_RESPONSE
 from modules.ai.services.tts_service import TTSService
+from modules.ai.services.tts_pipeline import IncrementalTTSPipeline
+from modules.ai.services.prompt_builder import PromptContext
+from modules.ai.services.response_cache import ResponseCache, CachedResponse
 from src.config.azure_config import get_groq_api_keys
-from src.config.service_config import DB_MODULE_URL
+from src.services.http_pool import http_pool
 import uvicorn
 from contextlib import asynccontextmanager
 from colorama import init
 from src.utils.logging_config import setup_logger
-from modules.ai.services.openai_service import OpenAIService
-from src.config.service_config import CHAT_HISTORY_PAIRS
+from modules.ai.services.openai_service import OpenAIService, OPENAI_BACKOFF_RESPONSE, OPENAI_ERROR_RESPONSE
+from src.config.service_config import (
+    RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL, RESPONSE_CACHE_SIMILARITY
+)
 
 # Initialize colorama
 init()
@@ -28,6 +34,9 @@ logger = setup_logger('ai')
 # Load environment variables
 load_dotenv()
 
+# Fixed replies worth having in the TTS cache before the first request needs them
+FALLBACK_PHRASES = [GROQ_ERROR_RESPONSE, OPENAI_BACKOFF_RESPONSE, OPENAI_ERROR_RESPONSE]
+
 # Initialize services at startup
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -46,40 +55,28 @@ async def lifespan(app: FastAPI):
         app.state.tts_service = TTSService()
         logger.info("[INIT] TTS service initialized")
         
-        # Initialize history service
-        class HistoryService:
-            async def get_chat_history(self, limit: int = 30) -> List[Dict]:
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(
-                        f"{DB_MODULE_URL}/chat/exchange",
-                        params={"limit": limit}
-                    )
-                    if response.status_code == 200:
-                        return response.json()
-                    logger.error(f"Failed to fetch chat history: {response.status_code}")
-                    return []
-        
-        app.state.history_service = HistoryService()
-        logger.info("[INIT] History service initialized")
-        
-        # Initialize context manager (if needed)
-        class ContextManager:
-            async def get_current_context(self) -> str:
-                return "No specific context"  # Or implement context logic
-        
-        app.state.context_manager = ContextManager()
-        logger.info("[INIT] Context manager initialized")
+        # Synthesize the fixed fallback phrases in the background so startup isn't delayed
+        app.state.tts_warmup = asyncio.create_task(app.state.tts_service.warm_cache(FALLBACK_PHRASES))
         
         # Initialize OpenAI service
         app.state.openai_service = OpenAIService()
         logger.info("[INIT] OpenAI service initialized")
         
+        # Replies to repeated questions are served without calling the LLM or TTS
+        app.state.response_cache = ResponseCache(
+            max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+            ttl=RESPONSE_CACHE_TTL,
+            similarity_threshold=RESPONSE_CACHE_SIMILARITY
+        )
+        logger.info("[INIT] Response cache initialized")
+        
         logger.info("[SUCCESS] All services initialized successfully")
         yield
     except Exception as e:
         logger.error(f"[ERROR] Failed to initialize services: {e}", exc_info=True)
         raise
     finally:
+        await http_pool.aclose()
         logger.info("[SHUTDOWN] Shutting down AI service")
 
 app = FastAPI(lifespan=lifespan)
@@ -94,99 +91,154 @@ app.add_middleware(
 )
 
 # Add helper functions for parallel context gathering
-async def get_vector_results(transcript: str) -> Dict:
+async def get_vector_results(transcript: str) -> List[Dict]:
     """Get relevant context from vector DB"""
     try:
         start_time = datetime.now()
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{DB_MODULE_URL}/vector/query",
-                json={"query": transcript, "limit": 5}
-            )
-            duration = (datetime.now() - start_time).total_seconds()
-            logger.info(f"[VECTOR] Query completed in {duration:.3f} seconds")
-            
-            if response.status_code == 200:
-                return response.json()
-            logger.error(f"[VECTOR] Query failed with status {response.status_code}")
-            logger.info("[VECTOR] Continuing without vector context")
-            return None
+        response = await http_pool.post(
+            "db",
+            "/vector/query",
+            json={"query": transcript, "limit": 5}
+        )
+        duration = (datetime.now() - start_time).total_seconds()
+        logger.info(f"[VECTOR] Query completed in {duration:.3f} seconds")
+        
+        if response.status_code == 200:
+            return response.json()
+        logger.error(f"[VECTOR] Query failed with status {response.status_code}")
+        logger.info("[VECTOR] Continuing without vector context")
+        return None
     except Exception as e:
         logger.error(f"[VECTOR] Error getting vector results: {e}")
         logger.info("[VECTOR] Continuing without vector context")
         return None
 
-async def get_chat_history() -> List[Dict]:
-    """Get recent chat history"""
+async def get_chat_history() -> str:
+    """Get recent chat history, already rendered for the prompt by the DB module's cache"""
     try:
         start_time = datetime.now()
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{DB_MODULE_URL}/chat/exchange",
-                params={"limit": CHAT_HISTORY_PAIRS}
-            )
-            duration = (datetime.now() - start_time).total_seconds()
-            logger.info(f"[HISTORY] Fetch completed in {duration:.3f} seconds")
-            
-            if response.status_code == 200:
-                return response.json()
-            logger.error(f"[HISTORY] Fetch failed with status {response.status_code}")
-            return []
+        response = await http_pool.get("db", "/chat/history/rendered")
+        duration = (datetime.now() - start_time).total_seconds()
+        logger.info(f"[HISTORY] Fetch completed in {duration:.3f} seconds")
+        
+        if response.status_code == 200:
+            return response.json().get("text", "")
+        logger.error(f"[HISTORY] Fetch failed with status {response.status_code}")
+        return ""
     except Exception as e:
         logger.error(f"[HISTORY] Error getting chat history: {e}")
-        return []
+        return ""
 
 async def get_context() -> str:
     """Get current context"""
     try:
         start_time = datetime.now()
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{DB_MODULE_URL}/context/current")
-            duration = (datetime.now() - start_time).total_seconds()
-            logger.info(f"[CONTEXT] Fetch completed in {duration:.3f} seconds")
-            
-            if response.status_code == 200:
-                return response.json().get('context', 'No specific context')
-            logger.error(f"[CONTEXT] Fetch failed with status {response.status_code}")
-            return "No specific context"
+        response = await http_pool.get("db", "/context/current")
+        duration = (datetime.now() - start_time).total_seconds()
+        logger.info(f"[CONTEXT] Fetch completed in {duration:.3f} seconds")
+        
+        if response.status_code == 200:
+            return response.json().get('context', 'No specific context')
+        logger.error(f"[CONTEXT] Fetch failed with status {response.status_code}")
+        return "No specific context"
     except Exception as e:
         logger.error(f"[CONTEXT] Error getting current context: {e}")
         return "Error fetching context"
 
+def start_context_fetch(transcript: str) -> Dict[str, asyncio.Task]:
+    """Start the context, history and vector fetches in parallel, one round-trip per source"""
+    return {
+        "context": asyncio.create_task(get_context()),
+        "history": asyncio.create_task(get_chat_history()),
+        "vector": asyncio.create_task(get_vector_results(transcript)),
+    }
+
+def cancel_context_fetch(tasks: Dict[str, asyncio.Task]):
+    """Drop fetches a cached reply doesn't need"""
+    for task in tasks.values():
+        if not task.done():
+            task.cancel()
+
+async def gather_context(tasks: Dict[str, asyncio.Task], timings: dict, context_start: datetime) -> PromptContext:
+    """Wait for the started fetches and assemble the prompt context"""
+    context, history = await asyncio.gather(tasks["context"], tasks["history"])
+    
+    # Vector results are optional, don't let them fail the whole request
+    try:
+        vector_results = await tasks["vector"]
+    except Exception as e:
+        logger.error(f"[VECTOR] Failed to get vector results: {e}")
+        logger.info("[VECTOR] Proceeding without vector context")
+        vector_results = None
+    
+    # Record timing for context gathering
+    context_duration = (datetime.now() - context_start).total_seconds()
+    timings['context_gathering'] = context_duration
+    return PromptContext(
+        current_context=context,
+        history_text=history or None,
+        vector_results=vector_results or []
+    )
+
+async def check_response_cache(transcript: str, tasks: Dict[str, asyncio.Task], streaming: bool) -> Tuple[Optional[CachedResponse], str]:
+    """Look the question up in the reply cache once the active context is known"""
+    current_context = await tasks["context"]
+    cached = app.state.response_cache.get(transcript, current_context)
+    if cached is None:
+        return None, current_context
+    
+    # The reply is only usable if its audio hasn't been evicted from the TTS cache
+    tts_service = app.state.tts_service
+    audio_ids = [chunk["audio_id"] for chunk in cached.audio_chunks] if streaming and cached.audio_chunks else [cached.audio_id]
+    if not all(tts_service.has_audio(audio_id) for audio_id in audio_ids if audio_id):
+        logger.info("[CACHE] Cached reply's audio was evicted, regenerating")
+        app.state.response_cache.invalidate(cached)
+        return None, current_context
+    return cached, current_context
+
+def is_cacheable_reply(text_response: str) -> bool:
+    return bool(text_response) and text_response not in FALLBACK_PHRASES
+
+async def save_chat_exchange(question: str, answer: str):
+    """Record a turn answered from the reply cache so chat history stays complete"""
+    try:
+        response = await http_pool.post("db", "/chat/exchange", params={"question": question, "answer": answer})
+        if response.status_code != 200:
+            logger.error(f"[SAVE] Failed to queue cached exchange: {response.status_code}")
+    except Exception as e:
+        logger.error(f"[SAVE] Failed to queue cached exchange: {e}")
+
+def db_round_trips() -> int:
+    """Total requests made to the DB module so far, used to report per-turn round-trips"""
+    return http_pool.metrics()["db"]["requests"]
+
 async def process_request(transcript: str, groq_service: GroqService, tts_service: TTSService, use_openai: bool = False, timings: dict = {}) -> Dict:
     """Process a single request through the AI pipeline"""
     try:
         logger.info(f"[RECEIVE] Processing request: {transcript[:30]}...")
+        db_requests_start = db_round_trips()
         
-        # Start timing vector/context gathering
         context_start = datetime.now()
-        
-        # Create tasks for parallel execution
-        context_task = asyncio.create_task(get_context())
-        history_task = asyncio.create_task(get_chat_history())
-        
-        # Try to get vector results, but don't let it block the whole process
-        try:
-            vector_task = asyncio.create_task(get_vector_results(transcript))
-            vector_results, context, history = await asyncio.gather(
-                vector_task,
-                context_task,
-                history_task
-            )
-        except Exception as e:
-            logger.error(f"[VECTOR] Failed to get vector results: {e}")
-            logger.info("[VECTOR] Proceeding without vector context")
-            # Continue without vector results
-            context, history = await asyncio.gather(
-                context_task,
-                history_task
-            )
-            vector_results = None
-        
-        # Record timing for context gathering
-        context_duration = (datetime.now() - context_start).total_seconds()
-        timings['context_gathering'] = context_duration
-        
+        context_tasks = start_context_fetch(transcript)
+        cached, current_context = await check_response_cache(transcript, context_tasks, streaming=False)
+        if cached is not None:
+            cancel_context_fetch(context_tasks)
+            audio_id = cached.audio_id
+            if audio_id is None:
+                # Cached from a streamed turn, which only kept per-sentence audio
+                audio_id = await tts_service.synthesize_to_id(cached.text)
+                cached.audio_id = audio_id
+            await save_chat_exchange(transcript, cached.text)
+            timings['cache_hit'] = True
+            logger.info(f"[SUCCESS] Served cached reply: {cached.text[:30]}...")
+            return {
+                "text": cached.text,
+                "audio_id": audio_id,
+                "success": True
+            }
+        
+        prompt_context = await gather_context(context_tasks, timings, context_start)
+        context_duration = timings['context_gathering']
         
         # Start timing AI service
         ai_start = datetime.now()
@@ -202,9 +254,7 @@ async def process_request(transcript: str, groq_service: GroqService, tts_servic
             api_start = datetime.now()
             text_response = await app.state.openai_service.send_to_openai(
                 transcript,
-                vector_db_service=vector_results if vector_results is not None else None,
-                chat_history_service=history,
-                context_manager=context
+                prompt_context=prompt_context
             )
             api_duration = (datetime.now() - api_start).total_seconds()
             logger.info(f"[OPENAI] API call completed in {api_duration:.3f} seconds")
@@ -212,9 +262,7 @@ async def process_request(transcript: str, groq_service: GroqService, tts_servic
             api_start = datetime.now()
             text_response = await app.state.groq_service.send_to_groq(
                 transcript,
-                vector_db_service=vector_results if vector_results is not None else None,
-                chat_history_service=history,
-                context_manager=context
+                prompt_context=prompt_context
             )
             api_duration = (datetime.now() - api_start).total_seconds()
             logger.info(f"[GROQ] API call completed in {api_duration:.3f} seconds")
@@ -224,6 +272,7 @@ async def process_request(transcript: str, groq_service: GroqService, tts_servic
         # Record timing for AI service
         ai_duration = (datetime.now() - ai_start).total_seconds()
         timings['ai_service'] = ai_duration
+        timings['db_round_trips'] = db_round_trips() - db_requests_start
         
         
         logger.info(f"[AI] Received response ({len(text_response)} chars): {text_response[:30]}...")
@@ -232,7 +281,7 @@ async def process_request(transcript: str, groq_service: GroqService, tts_servic
         tts_start = datetime.now()
         
         # Process complete response in TTS
-        audio_data = await tts_service.text_to_speech(text_response)
+        audio_id = await tts_service.synthesize_to_id(text_response)
         
         # Record timing for TTS
         tts_duration = (datetime.now() - tts_start).total_seconds()
@@ -241,14 +290,17 @@ async def process_request(transcript: str, groq_service: GroqService, tts_servic
         
         result = {
             "text": text_response,
-            "audio": audio_data,
+            "audio_id": audio_id,
             "success": True
         }
+        if audio_id and is_cacheable_reply(text_response):
+            app.state.response_cache.put(transcript, current_context, CachedResponse(transcript, text_response, audio_id=audio_id))
         # log the timings
         
         logger.info(f"[TIMING] Context gathering: {context_duration:.3f} seconds")
         logger.info(f"[TIMING] AI service: {ai_duration:.3f} seconds")
         logger.info(f"[TIMING] TTS service: {tts_duration:.3f} seconds")
+        logger.info(f"[TIMING] DB round-trips (context, history, vector, save): {timings['db_round_trips']}")
         logger.info("[SUCCESS] Request processing completed")
         return result
         
@@ -259,6 +311,108 @@ async def process_request(transcript: str, groq_service: GroqService, tts_servic
             "error": str(e)
         }
 
+def _ndjson(event: Dict) -> str:
+    """Serialize a single stream event as a newline-delimited JSON line"""
+    return json.dumps(event, ensure_ascii=False) + "\n"
+
+async def stream_cached_response(transcript: str, cached: CachedResponse, request_start: datetime) -> AsyncIterator[str]:
+    """Replay a cached reply as stream events: the full text, then its audio"""
+    yield _ndjson({"type": "delta", "text": cached.text})
+    
+    chunks = cached.audio_chunks or ([{"text": cached.text, "audio_id": cached.audio_id}] if cached.audio_id else [])
+    for index, chunk in enumerate(chunks):
+        yield _ndjson({"type": "audio", "index": index, "text": chunk["text"], "audio_id": chunk["audio_id"]})
+    
+    await save_chat_exchange(transcript, cached.text)
+    timings = {
+        'cache_hit': True,
+        'total_duration': (datetime.now() - request_start).total_seconds()
+    }
+    logger.info(f"[SUCCESS] Served cached streaming reply in {timings['total_duration']:.3f} seconds")
+    yield _ndjson({
+        "type": "done",
+        "text": cached.text,
+        "audio_chunks": len(chunks),
+        "success": True,
+        "timing": timings
+    })
+
+async def stream_request(transcript: str, tts_service: TTSService, use_openai: bool = False) -> AsyncIterator[str]:
+    """Process a request through the AI pipeline, yielding NDJSON text and audio chunk events as the completion streams in"""
+    request_start = datetime.now()
+    timings = {}
+    try:
+        logger.info(f"[RECEIVE] Processing streaming request: {transcript[:30]}...")
+        db_requests_start = db_round_trips()
+        
+        context_start = datetime.now()
+        context_tasks = start_context_fetch(transcript)
+        cached, current_context = await check_response_cache(transcript, context_tasks, streaming=True)
+        if cached is not None:
+            cancel_context_fetch(context_tasks)
+            async for line in stream_cached_response(transcript, cached, request_start):
+                yield line
+            return
+        
+        prompt_context = await gather_context(context_tasks, timings, context_start)
+        
+        # Start timing AI service
+        ai_start = datetime.now()
+        logger.info(f"[AI] Streaming from {'OpenAI' if use_openai else 'Groq'} service...")
+        
+        if use_openai:
+            deltas = app.state.openai_service.stream_openai(
+                transcript,
+                prompt_context=prompt_context
+            )
+        else:
+            deltas = app.state.groq_service.stream_groq(
+                transcript,
+                prompt_context=prompt_context
+            )
+        
+        # Synthesize sentence by sentence while the rest of the reply is still generating
+        pipeline = IncrementalTTSPipeline(tts_service)
+        audio_chunks = []
+        async for event in pipeline.run(deltas):
+            if event["type"] == "delta" and 'first_token' not in timings:
+                timings['first_token'] = (datetime.now() - request_start).total_seconds()
+                logger.info(f"[TIMING] First token: {timings['first_token']:.3f} seconds")
+            elif event["type"] == "audio" and 'first_audio' not in timings:
+                timings['first_audio'] = (datetime.now() - request_start).total_seconds()
+                logger.info(f"[TIMING] First audio chunk: {timings['first_audio']:.3f} seconds")
+            if event["type"] == "audio":
+                audio_chunks.append({"text": event["text"], "audio_id": event["audio_id"]})
+            yield _ndjson(event)
+        
+        text_response = pipeline.text
+        if audio_chunks and is_cacheable_reply(text_response):
+            app.state.response_cache.put(transcript, current_context, CachedResponse(transcript, text_response, audio_chunks=audio_chunks))
+        timings['ai_service'] = (datetime.now() - ai_start).total_seconds()
+        logger.info(f"[AI] Streamed response ({len(text_response)} chars) in {pipeline.audio_chunks} audio chunks: {text_response[:30]}...")
+        
+        timings['total_duration'] = (datetime.now() - request_start).total_seconds()
+        timings['db_round_trips'] = db_round_trips() - db_requests_start
+        logger.info(f"[TIMING] AI service + TTS: {timings['ai_service']:.3f} seconds")
+        logger.info(f"[TIMING] DB round-trips (context, history, vector, save): {timings['db_round_trips']}")
+        logger.info("[SUCCESS] Streaming request completed")
+        
+        yield _ndjson({
+            "type": "done",
+            "text": text_response,
+            "audio_chunks": pipeline.audio_chunks,
+            "success": True,
+            "timing": timings
+        })
+        
+    except Exception as e:
+        logger.error(f"[ERROR] Streaming request failed: {e}", exc_info=True)
+        yield _ndjson({
+            "type": "error",
+            "success": False,
+            "error": str(e)
+        })
+
 @app.post("/generate")
 async def generate(data: dict):
     try:
@@ -302,6 +456,53 @@ async def generate(data: dict):
         logger.error(f"[HTTP] Unexpected error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/generate/stream")
+async def generate_stream(data: dict):
+    """Stream completion deltas and per-sentence audio chunks as NDJSON events"""
+    transcript = data.get('transcript', '')
+    use_openai = data.get('use_openai', False)
+    
+    logger.info(f"[AI] Streaming with {'OpenAI' if use_openai else 'Groq'} service")
+    
+    return StreamingResponse(
+        stream_request(transcript, app.state.tts_service, use_openai=use_openai),
+        media_type="application/x-ndjson"
+    )
+
+@app.get("/audio/{audio_id}")
+async def get_audio(audio_id: str):
+    """Serve synthesized audio as raw bytes; IDs are content hashes, so responses never change"""
+    audio = await app.state.tts_service.get_audio(audio_id)
+    if audio is None:
+        raise HTTPException(status_code=404, detail="Audio not found")
+    return Response(
+        content=audio,
+        media_type="audio/wav",
+        headers={"Cache-Control": "private, max-age=3600, immutable"}
+    )
+
+@app.get("/metrics/http")
+async def http_metrics():
+    """Per-target connection pool metrics for outbound calls"""
+    return http_pool.metrics()
+
+@app.get("/metrics/responses")
+async def response_cache_metrics():
+    """Reply cache hit rates for this worker"""
+    return app.state.response_cache.stats()
+
+@app.get("/metrics/tts")
+async def tts_metrics():
+    """Synthesizer pool usage and audio cache hit rates"""
+    tts_service = app.state.tts_service
+    return {
+        "backend": tts_service.backend,
+        "pool_size": tts_service.pool.size,
+        "pool_available": tts_service.pool.available,
+        "pool_waiting": tts_service.pool.waiting,
+        "cache": tts_service.cache.stats()
+    }
+
 if __name__ == "__main__":
     import platform
     import uvicorn
@@ -1,16 +1,18 @@
 import time
-from typing import Optional, Dict, Union, List
+from typing import Optional, Dict, Union, List, AsyncIterator
 import logging
 from datetime import datetime, timedelta
-from groq import Groq
-from modules.ai.services.prompt_builder import PromptBuilder
+from groq import AsyncGroq
+from modules.ai.services.prompt_builder import PromptBuilder, PromptContext
 from src.utils.error_handler import handle_error
-import httpx
-from src.config.service_config import DB_MODULE_URL
+from src.services.http_pool import http_pool
+from src.config.service_config import STREAM_INTERRUPTED_MARKER
 from src.utils.logging_config import setup_logger
 
 logger = setup_logger("ai_service")
 
+GROQ_ERROR_RESPONSE = "I apologize, but I encountered an error processing your request."
+
 class GroqService:
     def __init__(self, api_keys: Union[Dict, List]):
         logger.info(f"Initializing GroqService with api_keys type: {type(api_keys)}")
@@ -40,7 +42,7 @@ class GroqService:
         # Initialize with default key (madruss_key)
         self.current_key = self.free_tier_keys[0]
         self.current_key_index = 0
-        self.client = Groq(api_key=self.current_key)
+        self.client = self._create_client(self.current_key)
         
         # Token tracking
         self.token_count = 0
@@ -56,12 +58,16 @@ class GroqService:
         logger.info(f"Using API key: {self.current_key[:4]}...{self.current_key[-4:]}")
         logger.info("Groq service initialized successfully")
 
+    def _create_client(self, api_key: str) -> AsyncGroq:
+        """Create the async Groq client so completions never block the event loop"""
+        return AsyncGroq(api_key=api_key)
+
     def _rotate_to_next_free_key(self):
         """Rotate to the next available free tier key"""
         prev_key = self.current_key
         self.current_key_index = (self.current_key_index + 1) % len(self.free_tier_keys)
         self.current_key = self.free_tier_keys[self.current_key_index]
-        self.client = Groq(api_key=self.current_key)
+        self.client = self._create_client(self.current_key)
         self.token_count = 0  # Reset token count for new key
         self.last_reset = datetime.now()
         logger.info(f"Rotated from key {prev_key[:4]}...{prev_key[-4:]} to {self.current_key[:4]}...{self.current_key[-4:]}")
@@ -70,100 +76,148 @@ class GroqService:
         """Switch to paid tier key if available"""
         if self.paid_tier_key:
             self.current_key = self.paid_tier_key
-            self.client = Groq(api_key=self.current_key)
+            self.client = self._create_client(self.current_key)
             self.token_limit = 30000  # Paid tier limit
             logger.info("Switched to paid tier key")
             return True
         return False
 
-    async def send_to_groq(self, user_message: str, **kwargs) -> str:
-        """Send a message to Groq API with token limit handling and key rotation"""
+    def _check_token_budget(self):
+        """Reset the per-minute token window and rotate keys when over the limit"""
+        # Check if we should reset token count
+        if datetime.now() - self.last_reset >= self.token_reset_interval:
+            self.token_count = 0
+            self.last_reset = datetime.now()
+            logger.info("Reset token count due to time interval")
+        
+        # Check if we're over the limit and should rotate
+        if self.token_count >= self.token_limit:
+            logger.warning(f"Token count {self.token_count} exceeds limit {self.token_limit}, rotating key")
+            self._rotate_to_next_free_key()
+
+    def _build_messages(self, user_message: str, prompt_context: Optional[PromptContext] = None) -> List[Dict]:
+        """Build the system/user message pair for a completion request"""
+        prompt = self.prompt_builder.build_prompt(user_message, prompt_context)
+        
+        return [
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": user_message},
+        ]
+
+    async def _create_completion(self, messages: List[Dict], **params):
+        """Create a completion, rotating to the next free key and then the paid key on rate limits"""
         try:
-            # Check if we should reset token count
-            if datetime.now() - self.last_reset >= self.token_reset_interval:
-                self.token_count = 0
-                self.last_reset = datetime.now()
-                logger.info("Reset token count due to time interval")
-            
-            # Check if we're over the limit and should rotate
-            if self.token_count >= self.token_limit:
-                logger.warning(f"Token count {self.token_count} exceeds limit {self.token_limit}, rotating key")
-                self._rotate_to_next_free_key()
-            
-            # Build the dynamic prompt
-            prompt = await self.prompt_builder.build_prompt(
-                user_message,
-                **kwargs
+            return await self.client.chat.completions.create(
+                model="llama-3.3-70b-versatile",
+                messages=messages,
+                temperature=0.7,
+                max_tokens=1000,
+                **params
             )
+        except Exception as e:
+            error_str = str(e).lower()
+            if "429" not in error_str and "rate_limit_exceeded" not in error_str:
+                raise
+            
+            logger.warning(f"Rate limit exceeded on key {self.current_key[:4]}...{self.current_key[-4:]}")
             
-            messages = [
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": user_message},
-            ]
+            # Try rotating to next free key
+            self._rotate_to_next_free_key()
+            logger.info(f"Retrying with new key: {self.current_key[:4]}...{self.current_key[-4:]}")
             
+            # Retry with new key
             try:
-                completion = self.client.chat.completions.create(
+                return await self.client.chat.completions.create(
                     model="llama-3.3-70b-versatile",
                     messages=messages,
                     temperature=0.7,
-                    max_tokens=1000
+                    max_tokens=1000,
+                    **params
                 )
+            except Exception as e2:
+                error_str2 = str(e2).lower()
+                # If still hitting limits, try paid key
+                if ("429" in error_str2 or "rate_limit_exceeded" in error_str2) and self._switch_to_paid_key():
+                    logger.info("Attempting paid tier key after exhausting free keys")
+                    return await self.client.chat.completions.create(
+                        model="llama-3.3-70b-versatile",
+                        messages=messages,
+                        temperature=0.7,
+                        max_tokens=1000,
+                        **params
+                    )
+                raise e2
+
+    def _add_token_usage(self, total_tokens: int):
+        """Add completion usage to the current minute's token count"""
+        self.token_count += total_tokens
+        logger.info(f"Total tokens in current minute: {self.token_count} (Key: {self.current_key[:4]}...{self.current_key[-4:]})")
+
+    async def send_to_groq(self, user_message: str, prompt_context: Optional[PromptContext] = None) -> str:
+        """Send a message to Groq API with token limit handling and key rotation"""
+        try:
+            self._check_token_budget()
+            
+            # Build the dynamic prompt
+            messages = self._build_messages(user_message, prompt_context)
+            
+            completion = await self._create_completion(messages)
+            
+            # Update token count
+            if completion.usage:
+                self._add_token_usage(completion.usage.total_tokens)
+            
+            answer = completion.choices[0].message.content
+            
+            # Save the chat exchange
+            await self._save_chat_exchange(user_message, answer)
+            return answer
                 
-                # Update token count
-                total_tokens = completion.usage.total_tokens
-                self.token_count += total_tokens
-                logger.info(f"Total tokens in current minute: {self.token_count} (Key: {self.current_key[:4]}...{self.current_key[-4:]})")
+        except Exception as e:
+            logger.error(f"Error in send_to_groq: {str(e)}")
+            return GROQ_ERROR_RESPONSE
+
+    async def stream_groq(self, user_message: str, prompt_context: Optional[PromptContext] = None) -> AsyncIterator[str]:
+        """Stream completion deltas from Groq API as they are generated"""
+        answer_parts = []
+        try:
+            self._check_token_budget()
+            
+            messages = self._build_messages(user_message, prompt_context)
+            
+            start_time = datetime.now()
+            stream = await self._create_completion(messages, stream=True)
+            
+            first_token_logged = False
+            async for chunk in stream:
+                # Groq reports usage on the final chunk under x_groq
+                x_groq = getattr(chunk, "x_groq", None)
+                if x_groq is not None and getattr(x_groq, "usage", None):
+                    self._add_token_usage(x_groq.usage.total_tokens)
                 
-                answer = completion.choices[0].message.content
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
                 
-                # Save the chat exchange
-                await self._save_chat_exchange(user_message, answer)
-                return answer
+                if not first_token_logged:
+                    first_token_logged = True
+                    ttft = (datetime.now() - start_time).total_seconds()
+                    logger.info(f"[GROQ] First token after {ttft:.3f} seconds")
                 
-            except Exception as e:
-                error_str = str(e).lower()
-                if "429" in error_str or "rate_limit_exceeded" in error_str:
-                    logger.warning(f"Rate limit exceeded on key {self.current_key[:4]}...{self.current_key[-4:]}")
-                    
-                    # Try rotating to next free key
-                    self._rotate_to_next_free_key()
-                    logger.info(f"Retrying with new key: {self.current_key[:4]}...{self.current_key[-4:]}")
-                    
-                    # Retry with new key
-                    try:
-                        completion = self.client.chat.completions.create(
-                            model="llama-3.3-70b-versatile",
-                            messages=messages,
-                            temperature=0.7,
-                            max_tokens=1000
-                        )
-                        answer = completion.choices[0].message.content
-                        await self._save_chat_exchange(user_message, answer)
-                        return answer
-                        
-                    except Exception as e2:
-                        error_str2 = str(e2).lower()
-                        # If still hitting limits, try paid key
-                        if ("429" in error_str2 or "rate_limit_exceeded" in error_str2) and self._switch_to_paid_key():
-                            logger.info("Attempting paid tier key after exhausting free keys")
-                            completion = self.client.chat.completions.create(
-                                model="llama-3.3-70b-versatile",
-                                messages=messages,
-                                temperature=0.7,
-                                max_tokens=1000
-                            )
-                            answer = completion.choices[0].message.content
-                            await self._save_chat_exchange(user_message, answer)
-                            return answer
-                        
-                        raise e2
-                raise e
+                answer_parts.append(delta)
+                yield delta
             
-            
-                
         except Exception as e:
-            logger.error(f"Error in send_to_groq: {str(e)}")
-            return "I apologize, but I encountered an error processing your request."
+            logger.error(f"Error in stream_groq: {str(e)}")
+            if not answer_parts:
+                yield GROQ_ERROR_RESPONSE
+                return
+            # The user already heard part of the answer; keep it in history, marked as cut off
+            answer_parts.append(STREAM_INTERRUPTED_MARKER)
+        
+        await self._save_chat_exchange(user_message, "".join(answer_parts))
 
     def get_token_info(self) -> Dict:
         """Get current token usage information"""
@@ -178,22 +232,22 @@ class GroqService:
         """Save the conversation exchange to the database"""
         try:
             logger.info(f"[SAVE] Queuing exchange save - Q: {user_message[:50]}... A: {ai_response[:50]}...")
-            async with httpx.AsyncClient() as client:
-                data = {
-                    "question": user_message,
-                    "answer": ai_response
-                }
-                logger.debug(f"[SAVE] Sending data: {data}")
-                response = await client.post(
-                    f"{DB_MODULE_URL}/chat/exchange",
-                    params=data
-                )
-                if response.status_code == 200:
-                    logger.info("[SAVE] Successfully queued chat exchange")
-                else:
-                    error_text = await response.text()
-                    logger.error(f"[SAVE] Failed to queue chat exchange: {response.status_code}")
-                    logger.error(f"[SAVE] Error details: {error_text}")
+            data = {
+                "question": user_message,
+                "answer": ai_response
+            }
+            logger.debug(f"[SAVE] Sending data: {data}")
+            response = await http_pool.post(
+                "db",
+                "/chat/exchange",
+                params=data
+            )
+            if response.status_code == 200:
+                logger.info("[SAVE] Successfully queued chat exchange")
+            else:
+                error_text = response.text
+                logger.error(f"[SAVE] Failed to queue chat exchange: {response.status_code}")
+                logger.error(f"[SAVE] Error details: {error_text}")
                 
         except Exception as e:
             logger.error(f"[SAVE] Failed to queue chat exchange: {e}", exc_info=True)
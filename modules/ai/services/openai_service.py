@@ -1,14 +1,17 @@
-from typing import Optional, Dict, Union, List
+from typing import Optional, Dict, Union, List, AsyncIterator
 from datetime import datetime
 from openai import AsyncOpenAI
 import os
-from modules.ai.services.prompt_builder import PromptBuilder
-import httpx
-from src.config.service_config import DB_MODULE_URL
+from modules.ai.services.prompt_builder import PromptBuilder, PromptContext
+from src.services.http_pool import http_pool
+from src.config.service_config import STREAM_INTERRUPTED_MARKER
 from src.utils.logging_config import setup_logger
 
 logger = setup_logger("openai_service")
 
+OPENAI_BACKOFF_RESPONSE = "I'm experiencing some technical difficulties. Please try again in a few minutes."
+OPENAI_ERROR_RESPONSE = "I apologize, but I encountered a temporary issue. Please try again in a moment."
+
 class OpenAIService:
     def __init__(self):
         # Get API key directly from environment variable
@@ -26,21 +29,14 @@ class OpenAIService:
         
     async def send_to_openai(self, 
                             user_message: str,
-                            vector_db_service=None,
-                            chat_history_service=None,
-                            context_manager=None) -> str:
+                            prompt_context: Optional[PromptContext] = None) -> str:
         """Send a message to OpenAI API with dynamically built prompt"""
         try:
             if self._should_backoff():
-                return "I'm experiencing some technical difficulties. Please try again in a few minutes."
+                return OPENAI_BACKOFF_RESPONSE
             
             # Build the dynamic prompt
-            prompt = await self.prompt_builder.build_prompt(
-                user_message,
-                vector_db_service,
-                chat_history_service,
-                context_manager
-            )
+            prompt = self.prompt_builder.build_prompt(user_message, prompt_context)
             
             messages = [
                 {"role": "system", "content": prompt},
@@ -86,7 +82,75 @@ class OpenAIService:
         except Exception as e:
             self._handle_api_error(e)
             logger.error(f"[OPENAI] API Error: {str(e)}")
-            return "I apologize, but I encountered a temporary issue. Please try again in a moment."
+            return OPENAI_ERROR_RESPONSE
+
+    async def stream_openai(self,
+                            user_message: str,
+                            prompt_context: Optional[PromptContext] = None) -> AsyncIterator[str]:
+        """Stream completion deltas from OpenAI API as they are generated"""
+        answer_parts = []
+        try:
+            if self._should_backoff():
+                yield OPENAI_BACKOFF_RESPONSE
+                return
+            
+            prompt = self.prompt_builder.build_prompt(user_message, prompt_context)
+            
+            messages = [
+                {"role": "system", "content": prompt},
+                {"role": "user", "content": user_message},
+            ]
+
+            start_time = datetime.now()
+            logger.info(f"[OPENAI] Starting streaming API call at {start_time.strftime('%H:%M:%S.%f')[:-3]}")
+
+            stream = await self.client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=messages,
+                temperature=0.7,
+                max_tokens=1000,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+
+            first_token_logged = False
+            async for chunk in stream:
+                # The final chunk carries usage and no choices
+                if chunk.usage:
+                    logger.info(f"[OPENAI] Tokens used - Prompt: {chunk.usage.prompt_tokens}, "
+                               f"Completion: {chunk.usage.completion_tokens}, "
+                               f"Total: {chunk.usage.total_tokens}")
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                
+                if not first_token_logged:
+                    first_token_logged = True
+                    ttft = (datetime.now() - start_time).total_seconds()
+                    logger.info(f"[OPENAI] First token after {ttft:.3f} seconds")
+                
+                answer_parts.append(delta)
+                yield delta
+
+            duration = (datetime.now() - start_time).total_seconds()
+            logger.info(f"[OPENAI] Total streaming duration: {duration:.3f} seconds")
+            
+            # Reset error count on successful request
+            self.error_count = 0
+            self.backoff_time = 1
+            
+        except Exception as e:
+            self._handle_api_error(e)
+            logger.error(f"[OPENAI] Streaming API Error: {str(e)}")
+            if not answer_parts:
+                yield OPENAI_ERROR_RESPONSE
+                return
+            # Part of the answer was already delivered; save it marked as cut off
+            answer_parts.append(STREAM_INTERRUPTED_MARKER)
+        
+        await self._save_chat_exchange(user_message, "".join(answer_parts))
 
     def _should_backoff(self) -> bool:
         """Check if we should back off based on recent errors"""
@@ -100,22 +164,22 @@ class OpenAIService:
         """Save the conversation exchange to the database"""
         try:
             logger.info(f"[SAVE] Queuing exchange save - Q: {user_message[:50]}... A: {ai_response[:50]}...")
-            async with httpx.AsyncClient() as client:
-                data = {
-                    "question": user_message,
-                    "answer": ai_response
-                }
-                logger.debug(f"[SAVE] Sending data: {data}")
-                response = await client.post(
-                    f"{DB_MODULE_URL}/chat/exchange",
-                    params=data
-                )
-                if response.status_code == 200:
-                    logger.info("[SAVE] Successfully queued chat exchange")
-                else:
-                    error_text = await response.text()
-                    logger.error(f"[SAVE] Failed to queue chat exchange: {response.status_code}")
-                    logger.error(f"[SAVE] Error details: {error_text}")
+            data = {
+                "question": user_message,
+                "answer": ai_response
+            }
+            logger.debug(f"[SAVE] Sending data: {data}")
+            response = await http_pool.post(
+                "db",
+                "/chat/exchange",
+                params=data
+            )
+            if response.status_code == 200:
+                logger.info("[SAVE] Successfully queued chat exchange")
+            else:
+                error_text = response.text
+                logger.error(f"[SAVE] Failed to queue chat exchange: {response.status_code}")
+                logger.error(f"[SAVE] Error details: {error_text}")
                 
         except Exception as e:
             logger.error(f"[SAVE] Failed to queue chat exchange: {e}", exc_info=True)
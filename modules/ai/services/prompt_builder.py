@@ -1,14 +1,19 @@
 from typing import List, Dict, Optional
-from datetime import datetime
-import aiohttp
+from dataclasses import dataclass, field
 from src.utils.logging_config import setup_logger
-from pathlib import Path
-from src.config.service_config import DB_MODULE_URL, CHAT_HISTORY_PAIRS
-from modules.db_module.dependencies import get_active_context
 # Setup logging
 logger = setup_logger("prompt_builder")
 
 
+@dataclass
+class PromptContext:
+    """Context for one turn, fetched once by the caller and passed to the prompt builder"""
+    current_context: Optional[str] = None
+    history: List[Dict] = field(default_factory=list)
+    # Pre-rendered history section; used instead of formatting history when set
+    history_text: Optional[str] = None
+    vector_results: List[Dict] = field(default_factory=list)
+
 
 class PromptBuilder:
     def __init__(self):
@@ -38,33 +43,20 @@ class PromptBuilder:
         Remember to preserve tokens by being concise while maintaining personality.
         """
         
-    async def build_prompt(self,
-                          user_message: str,
-                          vector_db_service=None,
-                          chat_history_service=None,
-                          context_manager=None) -> str:
+    def build_prompt(self, user_message: str, prompt_context: Optional[PromptContext] = None) -> str:
         """
-        Builds a dynamic prompt incorporating various context sources
+        Builds the system prompt from a pre-fetched context bundle; performs no I/O
         """
         try:
-            # Get chat history
-            chat_history = await self._get_chat_history(chat_history_service)
-            
-            # Get vector context
-            vector_context = await self._get_vector_context(vector_db_service, user_message)
+            prompt_context = prompt_context or PromptContext()
             
-            # Get current context from cache via endpoint instead of direct DB query
-            try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(f"{DB_MODULE_URL}/context/current") as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            current_context = data.get('context', "No specific context set.")
-                        else:
-                            current_context = "No specific context set."
-            except Exception as e:
-                logger.error(f"Error getting cached context: {e}")
-                current_context = "No specific context set."
+            chat_history = (
+                prompt_context.history_text
+                or self._format_chat_history(prompt_context.history)
+                or "No previous conversation."
+            )
+            vector_context = self._format_vector_results(prompt_context.vector_results) or "No relevant context found"
+            current_context = prompt_context.current_context or "No specific context set."
             
             # Format the final prompt using the base template
             final_prompt = self.base_prompt.format(
@@ -86,63 +78,6 @@ class PromptBuilder:
             logger.error(f"Error building prompt: {e}")
             return "Error building prompt"
     
-    async def _get_vector_context(self,
-                                vector_service: object,
-                                query: str,
-                                max_results: int = 5) -> str:
-        """
-        Fetches relevant context from vector database
-        """
-        try:
-            if not vector_service:
-                return "Vector service not available"
-            
-            if not hasattr(vector_service, 'query'):
-                logger.error("Vector service does not implement query method")
-                return "Vector service configuration error"
-            
-            # Use the new query method from VectorStoreService
-            results = await vector_service.query(query, limit=max_results)
-            if not results:
-                return "No relevant context found"
-            
-            return self._format_vector_results(results)
-        except Exception as e:
-            logger.error(f"Error fetching vector context: {e}")
-            return "Error fetching relevant context"
-    
-    async def _get_chat_history(self, history_service: object, max_messages: int = None) -> str:
-        """Fetches recent chat history from DB service"""
-        try:
-            logger.info(f"[PROMPT] Requesting chat history from {DB_MODULE_URL}/chat/exchange")
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{DB_MODULE_URL}/chat/exchange",
-                    params={"limit": CHAT_HISTORY_PAIRS}  # Always use configured amount
-                ) as response:
-                    logger.info(f"[PROMPT] Got response with status: {response.status}")
-                    if response.status != 200:
-                        error_text = await response.text()
-                        logger.error(f"[PROMPT] Error response: {error_text}")
-                        return f"Error fetching chat history: {response.status}"
-                    
-                    messages = await response.json()
-                    formatted = self._format_chat_history(messages)
-                    return formatted
-        except Exception as e:
-            logger.error(f"[PROMPT] Error in _get_chat_history: {e}", exc_info=True)
-            return f"Error fetching chat history: {str(e)}"
-    
-    async def _get_current_context(self, context_manager: object) -> str:
-        """
-        Gets current context from context manager
-        """
-        try:
-            return await context_manager.get_current_context()
-        except Exception as e:
-            logger.error(f"Error getting current context: {e}")
-            return "Error fetching current context"
-    
     def _format_vector_results(self, results: List[Dict]) -> str:
         """
         Formats vector search results into a string
@@ -150,9 +85,12 @@ class PromptBuilder:
         formatted = []
         for result in results:
             # Access the text from metadata
-            text = result.get('metadata', {}).get('text', '')
-            score = result.get('score', 0)
-            formatted.append(f"- {text} (Relevance: {score:.2f})")
+            text = (result.get('metadata') or {}).get('text', '')
+            if not text:
+                continue
+            # Lexical-only hybrid matches have no vector similarity to show
+            score = result.get('score')
+            formatted.append(f"- {text} (Relevance: {score:.2f})" if score is not None else f"- {text}")
         return "\n".join(formatted)
     
     def _format_chat_history(self, messages: List[Dict]) -> str:
@@ -168,13 +106,3 @@ class PromptBuilder:
                 continue
             formatted.append(f"{role}: {content}")
         return "\n".join(formatted)
-    
-    async def _get_function_context(self, function_service: object) -> str:
-        """Gets available functions and their context"""
-        try:
-            if not function_service:
-                return "No function service available"
-            return await function_service.get_available_functions()
-        except Exception as e:
-            logger.error(f"Error getting function context: {e}")
-            return "Error fetching function context" 
\ No newline at end of file
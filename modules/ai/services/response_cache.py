@@ -0,0 +1,202 @@
+import re
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.utils.logging_config import setup_logger
+
+logger = setup_logger("response_cache")
+
+# Answers to these go stale immediately, so they are never cached
+TIME_SENSITIVE = re.compile(r"\b(time|date|today|tonight|tomorrow|yesterday|now|weather|timer|latest|newest)\b")
+
+
+CONTRACTIONS = {
+    "what's": "what is", "whats": "what is", "who's": "who is", "where's": "where is",
+    "how's": "how is", "it's": "it is", "that's": "that is", "i'm": "i am", "you're": "you are",
+    "don't": "do not", "can't": "cannot", "won't": "will not", "i'd": "i would", "let's": "let us",
+}
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase, expand common contractions, drop punctuation and collapse whitespace"""
+    text = re.sub(r"[^\w\s']", " ", text.lower().replace("’", "'"))
+    words = [CONTRACTIONS.get(word, word) for word in text.split()]
+    return " ".join(words).replace("'", "")
+
+
+NUMBER_WORDS = {
+    "zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+    "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen",
+    "nineteen", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety",
+    "hundred", "thousand", "first", "second", "third", "last", "next", "half",
+}
+SENTENCE_START = re.compile(r"(^|[.!?]\s+)(\w+)")
+
+
+def anchor_tokens(question: str) -> frozenset:
+    """Numbers and proper nouns: words a near-duplicate must share to get the same reply.
+
+    "set chapter count to 12" and "...to 13" embed almost identically, so similarity
+    alone would answer one with the other's reply.
+    """
+    normalized = normalize_question(question)
+    anchors = {word for word in normalized.split() if any(ch.isdigit() for ch in word) or word in NUMBER_WORDS}
+    sentence_starts = {match.group(2) for match in SENTENCE_START.finditer(question.strip())}
+    anchors |= {
+        f"name:{word.lower()}" for word in re.findall(r"\b[A-Z][\w']*", question)
+        if word not in sentence_starts and word != "I"
+    }
+    return frozenset(anchors)
+
+
+class HashedNgramEmbedder:
+    """Small local embedder: hashed word and character-trigram counts, L2-normalized.
+
+    Good enough to match rephrasings of the same short voice command without a model
+    or a network call. Anything with an embed(text) -> np.ndarray method can replace it.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        words = text.split()
+        features = [f"w:{word}" for word in words]
+        features += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+        padded = f" {text} "
+        features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+        return features
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            # crc32 is stable across processes, unlike hash()
+            vector[zlib.crc32(feature.encode("utf-8")) % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+@dataclass
+class CachedResponse:
+    question: str
+    text: str
+    audio_id: Optional[str] = None
+    # Per-sentence audio from streamed turns: [{"text": ..., "audio_id": ...}]
+    audio_chunks: List[Dict] = field(default_factory=list)
+    created: float = field(default_factory=time.monotonic)
+    hits: int = 0
+
+
+class ResponseCache:
+    """Reply cache checked before the LLM: exact normalized match first, then nearest neighbour.
+
+    A nearest neighbour only counts if it has the same numbers and proper nouns as the
+    question (see anchor_tokens). Entries are scoped to the active context, expire after
+    a TTL and are evicted least-recently-used once max_entries is reached.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 600, similarity_threshold: float = 0.85,
+                 embedder=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.embedder = embedder or HashedNgramEmbedder()
+
+        self._entries: "OrderedDict[Tuple[str, str], CachedResponse]" = OrderedDict()
+        self._embeddings: Dict[Tuple[str, str], np.ndarray] = {}
+        self._anchors: Dict[Tuple[str, str], frozenset] = {}
+
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    def is_cacheable(self, question: str, answer: str = None) -> bool:
+        normalized = normalize_question(question)
+        if not normalized or TIME_SENSITIVE.search(normalized):
+            return False
+        return answer is None or bool(answer.strip())
+
+    def _expired(self, entry: CachedResponse) -> bool:
+        return time.monotonic() - entry.created > self.ttl
+
+    def _remove(self, key: Tuple[str, str]):
+        self._entries.pop(key, None)
+        self._embeddings.pop(key, None)
+        self._anchors.pop(key, None)
+
+    def _evict_expired(self):
+        for key in [key for key, entry in self._entries.items() if self._expired(entry)]:
+            self._remove(key)
+
+    def get(self, question: str, context: str) -> Optional[CachedResponse]:
+        if not self.is_cacheable(question):
+            return None
+        self._evict_expired()
+
+        normalized = normalize_question(question)
+        key = (context or "", normalized)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            entry.hits += 1
+            self.exact_hits += 1
+            logger.info(f"[CACHE] Exact hit for '{normalized[:40]}'")
+            return entry
+
+        # Near-duplicate search only among entries recorded under the same context that
+        # mention the same numbers and names
+        anchors = anchor_tokens(question)
+        candidates = [k for k in self._embeddings if k[0] == key[0] and self._anchors.get(k) == anchors]
+        if candidates:
+            query = self.embedder.embed(normalized)
+            scores = np.stack([self._embeddings[k] for k in candidates]) @ query
+            best = int(np.argmax(scores))
+            if scores[best] >= self.similarity_threshold:
+                match = candidates[best]
+                entry = self._entries[match]
+                self._entries.move_to_end(match)
+                entry.hits += 1
+                self.similar_hits += 1
+                logger.info(f"[CACHE] Similar hit ({scores[best]:.3f}) for '{normalized[:40]}' -> '{match[1][:40]}'")
+                return entry
+
+        self.misses += 1
+        return None
+
+    def put(self, question: str, context: str, response: CachedResponse):
+        if not self.is_cacheable(question, response.text):
+            return
+        normalized = normalize_question(question)
+        key = (context or "", normalized)
+
+        self._entries[key] = response
+        self._entries.move_to_end(key)
+        self._embeddings[key] = self.embedder.embed(normalized)
+        self._anchors[key] = anchor_tokens(question)
+
+        while len(self._entries) > self.max_entries:
+            oldest, _ = self._entries.popitem(last=False)
+            self._embeddings.pop(oldest, None)
+            self._anchors.pop(oldest, None)
+
+    def invalidate(self, entry: CachedResponse):
+        """Drop an entry whose cached audio is no longer available"""
+        for key, value in list(self._entries.items()):
+            if value is entry:
+                self._remove(key)
+
+    def stats(self) -> Dict:
+        lookups = self.exact_hits + self.similar_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.exact_hits + self.similar_hits) / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,187 @@
+"""Concurrency benchmark for GroqService.
+
+Runs N concurrent turns through the real GroqService completion path
+(send_to_groq -> _create_completion) and streaming path (stream_groq) with the
+Groq SDK pointed at a stubbed HTTP transport that answers after a fixed latency.
+Only the network is faked: request building, the SDK client, response parsing
+and token accounting are the production code.
+
+The "blocking" mode swaps in the sync Groq SDK called from the async method,
+which is what the service did before it moved to AsyncGroq: the turns
+serialize (wall time ~ N x latency) and the event loop stalls for each call.
+With AsyncGroq the turns overlap (wall time ~ one latency) and loop lag stays
+near zero.
+
+Usage: python -m modules.ai.services.testing_groq_concurrency [concurrency] [latency_seconds]
+"""
+import asyncio
+import json
+import sys
+import time
+
+import httpx
+from groq import AsyncGroq, Groq
+
+from modules.ai.services.ai_service import GroqService
+
+STREAM_DELTAS = ["Sure", ", here", " is", " the", " answer", "."]
+
+
+def _completion_body(model: str) -> dict:
+    return {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": "".join(STREAM_DELTAS)},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 40, "completion_tokens": 10, "total_tokens": 50},
+    }
+
+
+def _stream_event(model: str, delta: dict, finish_reason=None, **extra) -> bytes:
+    chunk = {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        **extra,
+    }
+    return f"data: {json.dumps(chunk)}\n\n".encode()
+
+
+class FakeGroqTransport(httpx.AsyncBaseTransport):
+    """Answers chat completion requests after `latency`, streamed or not"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        model = body["model"]
+        if not body.get("stream"):
+            await asyncio.sleep(self.latency)
+            return httpx.Response(200, json=_completion_body(model))
+
+        # Spread the latency over the deltas so time-to-first-token is a fraction of it
+        step = self.latency / len(STREAM_DELTAS)
+
+        async def events():
+            for delta in STREAM_DELTAS:
+                await asyncio.sleep(step)
+                yield _stream_event(model, {"content": delta})
+            yield _stream_event(model, {}, "stop", x_groq={
+                "id": "req-bench",
+                "usage": {"prompt_tokens": 40, "completion_tokens": 10, "total_tokens": 50},
+            })
+            yield b"data: [DONE]\n\n"
+
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=events())
+
+
+class FakeBlockingGroqTransport(httpx.BaseTransport):
+    """Sync counterpart of FakeGroqTransport for the sync SDK"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        time.sleep(self.latency)
+        return httpx.Response(200, json=_completion_body(json.loads(request.content)["model"]))
+
+
+class _BlockingCompletions:
+    """Calls the sync SDK from inside the coroutine, like the service used to"""
+
+    def __init__(self, client: Groq):
+        self._client = client
+
+    async def create(self, **kwargs):
+        return self._client.chat.completions.create(**kwargs)
+
+
+class _BlockingClient:
+    def __init__(self, client: Groq):
+        self.chat = type("Chat", (), {"completions": _BlockingCompletions(client)})()
+
+
+class BenchmarkGroqService(GroqService):
+    def __init__(self, latency: float, blocking: bool = False):
+        self.latency = latency
+        self.blocking = blocking
+        super().__init__(["bench_key_one", "bench_key_two"])
+
+    def _create_client(self, api_key: str):
+        if self.blocking:
+            http_client = httpx.Client(transport=FakeBlockingGroqTransport(self.latency))
+            return _BlockingClient(Groq(api_key=api_key, http_client=http_client, max_retries=0))
+        http_client = httpx.AsyncClient(transport=FakeGroqTransport(self.latency))
+        return AsyncGroq(api_key=api_key, http_client=http_client, max_retries=0)
+
+    async def _save_chat_exchange(self, user_message: str, ai_response: str):
+        # Keep the benchmark off the DB module
+        return None
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Return the worst delay between scheduled ticks while the benchmark runs"""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def _completion_turn(service: GroqService, i: int) -> str:
+    return await service.send_to_groq(f"benchmark turn {i}")
+
+
+async def _stream_turn(service: GroqService, i: int) -> str:
+    parts = []
+    async for delta in service.stream_groq(f"benchmark turn {i}"):
+        parts.append(delta)
+    return "".join(parts)
+
+
+async def run_benchmark(concurrency: int, latency: float, blocking: bool, stream: bool = False) -> float:
+    service = BenchmarkGroqService(latency, blocking=blocking)
+    turn = _stream_turn if stream else _completion_turn
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+
+    start = time.perf_counter()
+    answers = await asyncio.gather(*(turn(service, i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    worst_lag = await lag_task
+
+    expected = "".join(STREAM_DELTAS)
+    wrong = sum(answer != expected for answer in answers)
+    if wrong:
+        raise RuntimeError(f"{wrong} of {concurrency} turns returned an unexpected answer")
+
+    mode = ("blocking" if blocking else "async") + (" stream" if stream else "")
+    print(f"{mode:>12}: {concurrency} turns in {elapsed:.2f}s "
+          f"(ideal {latency:.2f}s, serialized {concurrency * latency:.2f}s), "
+          f"max loop lag {worst_lag * 1000:.0f}ms, {service.token_count} tokens counted")
+    return elapsed
+
+
+def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+
+    blocking_time = asyncio.run(run_benchmark(concurrency, latency, blocking=True))
+    async_time = asyncio.run(run_benchmark(concurrency, latency, blocking=False))
+    asyncio.run(run_benchmark(concurrency, latency, blocking=False, stream=True))
+    print(f"Speedup: {blocking_time / async_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
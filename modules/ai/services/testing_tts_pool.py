@@ -0,0 +1,74 @@
+"""Offline load test for the TTS synthesizer pool.
+
+Fires concurrent synthesize_to_id calls at a TTSService using the fake backend
+(each request synthesizes on a pooled synthesizer and stores the clip in a
+throwaway audio cache) and reports wall time, event-loop lag and requests that
+got no audio ID, for several pool sizes. With a pool
+of P synthesizers and latency L, N requests should take about ceil(N / P) x L
+while the loop stays responsive. FakeSynthesizer raises if the pool ever hands
+one synthesizer to two requests at once.
+
+Usage: python -m modules.ai.services.testing_tts_pool [requests] [latency_seconds]
+"""
+import asyncio
+import math
+import sys
+import tempfile
+import time
+
+import modules.ai.services.tts_service as tts_module
+from modules.ai.services.tts_cache import TTSAudioCache
+from modules.ai.services.tts_service import TTSService
+
+SAMPLE_SENTENCES = [
+    "Hello there, how was your day?",
+    "That anime had a great ending & a surprising twist.",
+    "Let me check your list <one moment>.",
+    "I think you should watch the next episode tonight!",
+]
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def run_load(pool_size: int, total_requests: int, latency: float):
+    tts_module.TTS_FAKE_LATENCY = latency
+    # Throwaway cache so earlier runs don't turn requests into cache hits
+    cache = TTSAudioCache(tempfile.mkdtemp(prefix="tts_pool_test_"), memory_max_bytes=8 * 1024 * 1024, disk_max_bytes=32 * 1024 * 1024)
+    service = TTSService(backend="fake", pool_size=pool_size, cache=cache)
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        # Numbered so every request misses the audio cache and really hits the pool
+        service.synthesize_to_id(f"{SAMPLE_SENTENCES[i % len(SAMPLE_SENTENCES)]} Take {i}.")
+        for i in range(total_requests)
+    ))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    worst_lag = await lag_task
+    failures = sum(1 for audio in results if audio is None)
+    expected = math.ceil(total_requests / pool_size) * latency
+    print(f"pool={pool_size:>2}: {total_requests} requests in {elapsed:.2f}s "
+          f"(expected ~{expected:.2f}s), max loop lag {worst_lag * 1000:.0f}ms, failures {failures}")
+
+
+def main():
+    total_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.3
+
+    for pool_size in (1, 2, 4, 8):
+        asyncio.run(run_load(pool_size, total_requests, latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import asyncio
+import io
+import re
+import wave
+from contextlib import asynccontextmanager
+from typing import Callable, Optional
+import logging
+
+logger = logging.getLogger("modules.ai.services.tts_backends")
+
+
+class AzureSynthesizer:
+    """One warm Azure SpeechSynthesizer; synthesis is awaited off the event loop"""
+
+    def __init__(self):
+        # Imported here so the fake backend runs without the Speech SDK installed
+        import azure.cognitiveservices.speech as speechsdk
+        from src.config.azure_config import get_speech_config
+
+        self.speechsdk = speechsdk
+        self.synthesizer = speechsdk.SpeechSynthesizer(
+            speech_config=get_speech_config(),
+            audio_config=None
+        )
+        # Open the service connection up front so the first request doesn't pay for the handshake
+        self.connection = speechsdk.Connection.from_speech_synthesizer(self.synthesizer)
+        self.connection.open(True)
+
+    async def synthesize(self, ssml: str) -> Optional[bytes]:
+        result_future = self.synthesizer.speak_ssml_async(ssml)
+        result = await asyncio.to_thread(result_future.get)
+
+        if result.reason == self.speechsdk.ResultReason.SynthesizingAudioCompleted:
+            return result.audio_data
+
+        if result.reason == self.speechsdk.ResultReason.Canceled:
+            details = result.cancellation_details
+            logger.error(f"[TTS] Synthesis canceled: {details.reason} {details.error_details}")
+        else:
+            logger.error(f"[TTS] Speech synthesis failed: {result.reason}")
+        return None
+
+
+class FakeSynthesizer:
+    """Offline synthesizer returning silent WAV audio after a simulated latency"""
+
+    SAMPLE_RATE = 16000
+    SECONDS_PER_CHAR = 0.06
+
+    def __init__(self, latency: float = 0.3):
+        self.latency = latency
+        self.in_use = False
+
+    async def synthesize(self, ssml: str) -> Optional[bytes]:
+        # A real synthesizer handles one request at a time; catch pool misuse in load tests
+        if self.in_use:
+            raise RuntimeError("FakeSynthesizer used by two requests at once")
+        self.in_use = True
+        try:
+            await asyncio.sleep(self.latency)
+            spoken_text = re.sub(r"<[^>]+>", "", ssml).strip()
+            return self._silent_wav(len(spoken_text) * self.SECONDS_PER_CHAR)
+        finally:
+            self.in_use = False
+
+    def _silent_wav(self, duration: float) -> bytes:
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.SAMPLE_RATE)
+            wav.writeframes(b"\x00\x00" * int(self.SAMPLE_RATE * duration))
+        return buffer.getvalue()
+
+
+class SynthesizerPool:
+    """Fixed set of warm synthesizers handed out one request at a time"""
+
+    def __init__(self, factory: Callable[[], object], size: int):
+        if size < 1:
+            raise ValueError("Synthesizer pool size must be at least 1")
+        self.size = size
+        self._idle: asyncio.Queue = asyncio.Queue()
+        for _ in range(size):
+            self._idle.put_nowait(factory())
+        self.waiting = 0
+
+    @property
+    def available(self) -> int:
+        return self._idle.qsize()
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Wait for an idle synthesizer and return it to the pool afterwards"""
+        self.waiting += 1
+        try:
+            synthesizer = await self._idle.get()
+        finally:
+            self.waiting -= 1
+        try:
+            yield synthesizer
+        finally:
+            self._idle.put_nowait(synthesizer)
+
+
+def create_synthesizer_factory(backend: str, fake_latency: float = 0.3) -> Callable[[], object]:
+    """Return a constructor for the configured TTS backend"""
+    if backend == "azure":
+        return AzureSynthesizer
+    if backend == "fake":
+        return lambda: FakeSynthesizer(latency=fake_latency)
+    raise ValueError(f"Unknown TTS backend: {backend}")
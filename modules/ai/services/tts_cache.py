@@ -0,0 +1,224 @@
+import asyncio
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+import logging
+
+logger = logging.getLogger("modules.ai.services.tts_cache")
+
+
+AUDIO_ID_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+# Set on an in-flight entry whose creator was cancelled: the next waiter synthesizes instead
+_RETRY = object()
+
+
+def cache_key(ssml: str) -> str:
+    """Content address for synthesized audio; the SSML carries the text, voice and prosody"""
+    return hashlib.sha256(ssml.encode("utf-8")).hexdigest()
+
+
+class TTSAudioCache:
+    """Two-tier audio cache: in-memory LRU in front of a size-bounded directory on disk.
+
+    The disk tier is shared by every AI worker process. Files are written atomically
+    and named by cache key, so a worker that didn't write an entry can still serve it.
+    Because other workers write to the same directory, the disk budget is enforced from
+    a scan of the directory (at startup, every scan_interval seconds, and whenever this
+    worker's own estimate goes over) rather than from the per-process index.
+    """
+
+    FILE_SUFFIX = ".audio"
+    TMP_SUFFIX = ".tmp"
+    # A temp file older than this is left over from an interrupted write
+    TMP_MAX_AGE = 60.0
+
+    def __init__(self, cache_dir: str, memory_max_bytes: int, disk_max_bytes: int, scan_interval: float = 30.0):
+        self.cache_dir = cache_dir
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.scan_interval = scan_interval
+
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        # key -> size, oldest access first
+        self._disk_index: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._last_scan = 0.0
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._scan_disk(sweep_tmp=True)
+        logger.info(f"[TTS CACHE] Loaded {len(self._disk_index)} cached clips ({self._disk_bytes / 1024:.0f} KB) from {self.cache_dir}")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + self.FILE_SUFFIX)
+
+    def _scan_disk(self, sweep_tmp: bool = False) -> int:
+        """Rebuild the disk index from the directory and evict the oldest clips over budget.
+
+        Returns the number of clips evicted. With sweep_tmp, temp files left behind by
+        interrupted writes (older than TMP_MAX_AGE) are removed too.
+        """
+        entries = []
+        now = time.time()
+        for entry in os.scandir(self.cache_dir):
+            try:
+                stat = entry.stat()
+                if entry.name.endswith(self.FILE_SUFFIX):
+                    entries.append((stat.st_mtime, entry.name[:-len(self.FILE_SUFFIX)], stat.st_size))
+                elif sweep_tmp and entry.name.endswith(self.TMP_SUFFIX) and now - stat.st_mtime > self.TMP_MAX_AGE:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                continue  # Removed by another worker mid-scan
+
+        entries.sort()
+        total = sum(size for _, _, size in entries)
+        evicted = 0
+        while total > self.disk_max_bytes and len(entries) > 1:
+            _, key, size = entries.pop(0)
+            self._remove_disk([key])
+            total -= size
+            evicted += 1
+
+        self._disk_index = OrderedDict((key, size) for _, key, size in entries)
+        self._disk_bytes = total
+        self._last_scan = time.monotonic()
+        return evicted
+
+    def _remember(self, key: str, audio: bytes):
+        """Add to the memory tier, evicting least recently used clips over the byte budget"""
+        if len(audio) > self.memory_max_bytes:
+            return
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = audio
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.memory_max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                audio = f.read()
+            # Bump mtime so recency survives restarts
+            os.utime(path)
+            return audio
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, key: str, audio: bytes):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, path)
+
+    def _track_disk(self, key: str, size: int):
+        if key in self._disk_index:
+            self._disk_index.move_to_end(key)
+            return
+        self._disk_index[key] = size
+        self._disk_bytes += size
+
+    def _needs_scan(self) -> bool:
+        return self._disk_bytes > self.disk_max_bytes or time.monotonic() - self._last_scan > self.scan_interval
+
+    def _remove_disk(self, keys: list):
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def has(self, key: str) -> bool:
+        return key in self._memory or os.path.exists(self._path(key))
+
+    async def get(self, key: str) -> Optional[bytes]:
+        audio = self._memory.get(key)
+        if audio is not None:
+            self._memory.move_to_end(key)
+            self.hits_memory += 1
+            return audio
+
+        audio = await asyncio.to_thread(self._read_disk, key)
+        if audio is not None:
+            self.hits_disk += 1
+            self._track_disk(key, len(audio))
+            self._remember(key, audio)
+            return audio
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, audio: bytes, keep_in_memory: bool = True):
+        if keep_in_memory:
+            self._remember(key, audio)
+        try:
+            await asyncio.to_thread(self._write_disk, key, audio)
+            self._track_disk(key, len(audio))
+            if self._needs_scan():
+                evicted = await asyncio.to_thread(self._scan_disk)
+                if evicted:
+                    logger.info(f"[TTS CACHE] Evicted {evicted} clips from disk")
+        except OSError as e:
+            logger.error(f"[TTS CACHE] Failed to write clip to disk: {e}")
+
+    async def get_or_create(self, key: str, create: Callable[[], Awaitable[Optional[bytes]]],
+                            keep_in_memory: bool = True) -> Optional[bytes]:
+        """Return cached audio or synthesize it once, even when several requests miss at the same time"""
+        audio = await self.get(key)
+        if audio is not None:
+            return audio
+
+        while True:
+            pending = self._in_flight.get(key)
+            if pending is None:
+                break
+            audio = await asyncio.shield(pending)
+            if audio is not _RETRY:
+                return audio
+            # Its creator was cancelled; whoever gets here first synthesizes it again
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            audio = await create()
+            if audio is not None:
+                await self.put(key, audio, keep_in_memory)
+            future.set_result(audio)
+            return audio
+        except asyncio.CancelledError:
+            # Only the creator was cancelled, not the requests waiting on the same text
+            future.set_result(_RETRY)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception retrieved so a future nobody waited on doesn't log a warning
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[key]
+
+    def stats(self) -> Dict:
+        lookups = self.hits_memory + self.hits_disk + self.misses
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": round((self.hits_memory + self.hits_disk) / lookups, 3) if lookups else 0.0,
+            "memory_clips": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_clips": len(self._disk_index),
+            "disk_bytes": self._disk_bytes,
+        }
@@ -0,0 +1,102 @@
+import asyncio
+import re
+from typing import AsyncIterator, Dict, List
+from src.utils.logging_config import setup_logger
+
+logger = setup_logger("tts_pipeline")
+
+# Sentence end: terminal punctuation (incl. Japanese), optional closing quotes/brackets, then whitespace
+SENTENCE_BOUNDARY = re.compile(r'[.!?。！？…]+["\'”’)\]]*\s+|\n+')
+
+_PIPELINE_DONE = object()
+
+
+class SentenceChunker:
+    """Splits streamed text into sentences as soon as each one is complete"""
+
+    def __init__(self, min_chars: int = 12):
+        # Very short fragments ("Hi!") are merged into the next sentence to avoid choppy audio
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def feed(self, delta: str) -> List[str]:
+        """Add a text delta and return any sentences it completed"""
+        self.buffer += delta
+        sentences = []
+        start = 0
+        for match in SENTENCE_BOUNDARY.finditer(self.buffer):
+            candidate = self.buffer[start:match.end()].strip()
+            if len(candidate) < self.min_chars:
+                continue
+            sentences.append(candidate)
+            start = match.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self) -> str:
+        """Return whatever text is left once the stream has ended"""
+        remainder = self.buffer.strip()
+        self.buffer = ""
+        return remainder
+
+
+class IncrementalTTSPipeline:
+    """Synthesizes each completed sentence while the LLM keeps generating the rest"""
+
+    def __init__(self, tts_service, chunker: SentenceChunker = None):
+        self.tts_service = tts_service
+        self.chunker = chunker or SentenceChunker()
+        self.text_parts: List[str] = []
+        self.audio_chunks = 0
+
+    @property
+    def text(self) -> str:
+        return "".join(self.text_parts)
+
+    async def run(self, deltas: AsyncIterator[str]) -> AsyncIterator[Dict]:
+        """Yield text delta events and in-order audio chunk events as they become available"""
+        events: asyncio.Queue = asyncio.Queue()
+        sentences: asyncio.Queue = asyncio.Queue()
+
+        async def produce():
+            try:
+                async for delta in deltas:
+                    self.text_parts.append(delta)
+                    await events.put({"type": "delta", "text": delta})
+                    for sentence in self.chunker.feed(delta):
+                        await sentences.put(sentence)
+                tail = self.chunker.flush()
+                if tail:
+                    await sentences.put(tail)
+            finally:
+                await sentences.put(None)
+
+        async def synthesize():
+            # A single worker keeps the chunks in sentence order
+            try:
+                while (sentence := await sentences.get()) is not None:
+                    audio_id = await self.tts_service.synthesize_to_id(sentence)
+                    if audio_id is None:
+                        logger.warning(f"[TTS] Skipping sentence that failed to synthesize: {sentence[:30]}...")
+                        continue
+                    await events.put({
+                        "type": "audio",
+                        "index": self.audio_chunks,
+                        "text": sentence,
+                        "audio_id": audio_id
+                    })
+                    self.audio_chunks += 1
+            finally:
+                await events.put(_PIPELINE_DONE)
+
+        producer = asyncio.create_task(produce())
+        synthesizer = asyncio.create_task(synthesize())
+        try:
+            while (event := await events.get()) is not _PIPELINE_DONE:
+                yield event
+            # Surface any error raised while producing or synthesizing
+            await asyncio.gather(producer, synthesizer)
+        finally:
+            for task in (producer, synthesizer):
+                if not task.done():
+                    task.cancel()
@@ -1,63 +1,110 @@
 from datetime import datetime
-import azure.cognitiveservices.speech as speechsdk
-import base64
+import os
 import logging
-from src.config.azure_config import get_speech_config
+from xml.sax.saxutils import escape
+from typing import Iterable
+from modules.ai.services.tts_backends import SynthesizerPool, create_synthesizer_factory
+from modules.ai.services.tts_cache import TTSAudioCache, cache_key, AUDIO_ID_PATTERN
+from src.config.service_config import (
+    TTS_BACKEND, TTS_POOL_SIZE, TTS_FAKE_LATENCY,
+    TTS_CACHE_DIR, TTS_CACHE_MEMORY_MB, TTS_CACHE_DISK_MB, TTS_CACHE_MAX_TEXT_CHARS
+)
 
 logger = logging.getLogger("modules.ai.services.tts_service")
 
+TTS_VOICE = "en-US-AshleyNeural"
+TTS_RATE = "3%"
+TTS_PITCH = "21%"
+
 class TTSService:
-    def __init__(self):
+    def __init__(self, backend: str = None, pool_size: int = None, cache: TTSAudioCache = None):
         try:
-            self.speech_config = get_speech_config()
-            self.speech_synthesizer = speechsdk.SpeechSynthesizer(
-                speech_config=self.speech_config,
-                audio_config=None
+            self.backend = backend or TTS_BACKEND
+            self.pool = SynthesizerPool(
+                create_synthesizer_factory(self.backend, fake_latency=TTS_FAKE_LATENCY),
+                pool_size or TTS_POOL_SIZE
+            )
+            self.cache = cache or TTSAudioCache(
+                os.path.join(TTS_CACHE_DIR, self.backend),
+                memory_max_bytes=TTS_CACHE_MEMORY_MB * 1024 * 1024,
+                disk_max_bytes=TTS_CACHE_DISK_MB * 1024 * 1024
             )
-            logger.info("TTS Service initialized successfully")
+            logger.info(f"TTS Service initialized successfully ({self.backend} backend, {self.pool.size} synthesizers)")
         except Exception as e:
             logger.error(f"Failed to initialize TTS service: {e}")
             raise
 
-    async def text_to_speech(self, text: str) -> str | None:
-        """Convert text to speech using Azure TTS."""
-        try:
-            # Log start time
-            start_time = datetime.now()
-            logger.info(f"[TTS] Starting synthesis at {start_time.strftime('%H:%M:%S.%f')[:-3]}")
-            
-            logger.info("Preparing TTS request...")
-            ssml = f"""<speak xmlns="http://www.w3.org/2001/10/synthesis" 
-                          xmlns:mstts="http://www.w3.org/2001/mstts" 
-                          xmlns:emo="http://www.w3.org/2009/10/emotionml" 
-                          version="1.0" 
+    def build_ssml(self, text: str) -> str:
+        """Wrap text in the assistant's voice settings; the text is escaped so '&' or '<' can't break the SSML"""
+        return f"""<speak xmlns="http://www.w3.org/2001/10/synthesis"
+                          xmlns:mstts="http://www.w3.org/2001/mstts"
+                          xmlns:emo="http://www.w3.org/2009/10/emotionml"
+                          version="1.0"
                           xml:lang="en-US">
-                    <voice name="en-US-AshleyNeural">
-                        <prosody rate="3%" pitch="21%">
-                            {text}
+                    <voice name="{TTS_VOICE}">
+                        <prosody rate="{TTS_RATE}" pitch="{TTS_PITCH}">
+                            {escape(text)}
                         </prosody>
                     </voice>
                 </speak>"""
-            
-            logger.info("Calling speech synthesis...")
-            result = self.speech_synthesizer.speak_ssml_async(ssml).get()
-            
-            if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
-                logger.info("Speech synthesis completed successfully")
-                audio_data = base64.b64encode(result.audio_data).decode('utf-8')
-                logger.info(f"Audio data length: {len(audio_data)}")
-                
-                # Calculate and log duration
-                end_time = datetime.now()
-                duration = (end_time - start_time).total_seconds()
-                logger.info(f"[TTS] Synthesis completed at {end_time.strftime('%H:%M:%S.%f')[:-3]}")
-                logger.info(f"[TTS] Total synthesis duration: {duration:.3f} seconds")
-                
-                return audio_data
-            else:
-                logger.error(f"Speech synthesis failed: {result.reason}")
+
+    async def _synthesize(self, ssml: str) -> bytes | None:
+        if self.pool.available == 0:
+            logger.info(f"[TTS] All {self.pool.size} synthesizers busy, waiting (queued: {self.pool.waiting + 1})")
+
+        async with self.pool.acquire() as synthesizer:
+            return await synthesizer.synthesize(ssml)
+
+    async def warm_cache(self, phrases: Iterable[str]):
+        """Pre-synthesize fixed phrases so they play instantly the first time"""
+        for phrase in phrases:
+            await self.synthesize_to_id(phrase)
+        logger.info(f"[TTS CACHE] Warmed cache: {self.cache.stats()}")
+
+    def has_audio(self, audio_id: str) -> bool:
+        """Whether audio for an ID is still cached (IDs outlive their audio once evicted)"""
+        return bool(audio_id) and self.cache.has(audio_id)
+
+    async def get_audio(self, audio_id: str) -> bytes | None:
+        """Look up synthesized audio by the ID returned from synthesize_to_id"""
+        if not AUDIO_ID_PATTERN.match(audio_id):
+            return None
+        return await self.cache.get(audio_id)
+
+    async def synthesize_to_id(self, text: str) -> str | None:
+        """Synthesize text on a pooled synthesizer and return the audio ID it can be fetched by.
+
+        Audio travels as raw bytes from GET /audio/{audio_id} instead of base64 inside the JSON responses.
+        """
+        try:
+            # Log start time
+            start_time = datetime.now()
+            logger.info(f"[TTS] Starting synthesis at {start_time.strftime('%H:%M:%S.%f')[:-3]}")
+
+            ssml = self.build_ssml(text)
+
+            audio_id = cache_key(ssml)
+
+            # Everything goes to disk so it can be fetched by ID; only short phrases, which repeat, stay in memory
+            audio_bytes = await self.cache.get_or_create(
+                audio_id,
+                lambda: self._synthesize(ssml),
+                keep_in_memory=len(text) <= TTS_CACHE_MAX_TEXT_CHARS
+            )
+
+            if audio_bytes is None:
                 return None
-                
+
+            logger.info(f"Audio data length: {len(audio_bytes)} bytes (id {audio_id[:12]})")
+
+            # Calculate and log duration
+            end_time = datetime.now()
+            duration = (end_time - start_time).total_seconds()
+            logger.info(f"[TTS] Synthesis completed at {end_time.strftime('%H:%M:%S.%f')[:-3]}")
+            logger.info(f"[TTS] Total synthesis duration: {duration:.3f} seconds")
+
+            return audio_id
+
         except Exception as e:
-            logger.error(f"Error in text_to_speech: {e}", exc_info=True)
-            return None 
\ No newline at end of file
+            logger.error(f"Error in synthesize_to_id: {e}", exc_info=True)
+            return None
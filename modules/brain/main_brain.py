@@ -1,17 +1,21 @@
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import httpx
-from typing import Dict, Optional
+from typing import Dict, Optional, AsyncIterator
 from pydantic import BaseModel
 import os
 from colorama import init
 import asyncio
 from src.utils.logging_config import setup_logger
-from asyncio import Queue, create_task
-from collections import defaultdict
+from asyncio import Queue, QueueEmpty, create_task
 import uuid
-import aiohttp
+import json
+import time
 from datetime import datetime
+from src.config.service_config import RESPONSE_QUEUE_MAXSIZE, RESPONSE_QUEUE_TTL
+from src.services.http_pool import http_pool
+from contextlib import asynccontextmanager
 # Initialize colorama for Windows compatibility
 init()
 # Setup module-specific logger
@@ -19,8 +23,24 @@ logger = setup_logger('brain')
 
 # Create custom logger formatter with colors
 
+# Fetch service URLs from Doppler configuration or fallback to defaults
+AI_SERVICE_URL = os.getenv("AI_SERVICE_URL", "http://127.0.0.1:8013")
+VTUBE_SERVICE_URL = os.getenv("VTUBE_SERVICE_URL", "http://localhost:5001")
+DB_MODULE_URL = os.getenv("DB_MODULE_URL", "http://127.0.0.1:8014")
+
+# Route the shared connection pools at the configured services
+http_pool.register("ai", AI_SERVICE_URL)
+http_pool.register("vtube", VTUBE_SERVICE_URL)
+http_pool.register("db", DB_MODULE_URL)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await http_pool.aclose()
+    logger.info("[SHUTDOWN] Brain service connection pools closed")
+
 # Initialize the FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -31,18 +51,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Fetch service URLs from Doppler configuration or fallback to defaults
-AI_SERVICE_URL = os.getenv("AI_SERVICE_URL", "http://127.0.0.1:8013")
-VTUBE_SERVICE_URL = os.getenv("VTUBE_SERVICE_URL", "http://localhost:5001")
-DB_MODULE_URL = os.getenv("DB_MODULE_URL", "http://127.0.0.1:8013")
-
 # Define the request model
 class InputData(BaseModel):
     transcript: str
 
 class ResponseData(BaseModel):
     text: str
-    audio: str | None = None  # Add audio field to response model
+    audio_id: str | None = None  # Fetch the audio bytes from /audio/{audio_id}
 
 async def analyze_input(text: str) -> str:
     """Determine the type of input and required processing"""
@@ -63,15 +78,14 @@ async def analyze_input(text: str) -> str:
 async def call_ai_service(data: Dict) -> Dict:
     """Forward request to AI service with detailed logging."""
     try:
-        async with httpx.AsyncClient() as client:
-            # Debug log the entire data payload
-            logger.info(f"[BRAIN] Sending to AI service: {data}")
-            use_openai = data.get('use_openai', False)
-            logger.info(f"[BRAIN] use_openai flag before AI call: {use_openai}")
-            
-            response = await client.post(f"{AI_SERVICE_URL}/generate", json=data, timeout=15.0)
-            response.raise_for_status()
-            return response.json()
+        # Debug log the entire data payload
+        logger.info(f"[BRAIN] Sending to AI service: {data}")
+        use_openai = data.get('use_openai', False)
+        logger.info(f"[BRAIN] use_openai flag before AI call: {use_openai}")
+        
+        response = await http_pool.post("ai", "/generate", json=data, timeout=15.0)
+        response.raise_for_status()
+        return response.json()
     except httpx.RequestError as e:
         logger.error(f"AI service request failed: {e}")
         raise HTTPException(status_code=503, detail="AI service unavailable")
@@ -79,42 +93,135 @@ async def call_ai_service(data: Dict) -> Dict:
         logger.error(f"Error calling AI service: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def stream_ai_service(data: Dict) -> AsyncIterator[str]:
+    """Relay NDJSON stream events from the AI service line by line"""
+    try:
+        logger.info(f"[BRAIN] Streaming from AI service: {data}")
+        async with http_pool.stream(
+            "ai",
+            "POST",
+            "/generate/stream",
+            json=data
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line:
+                    yield line + "\n"
+    except Exception as e:
+        logger.error(f"AI service stream failed: {e}")
+        yield json.dumps({"type": "error", "success": False, "error": str(e)}) + "\n"
+
 async def call_vtube_service(animation_data: Dict) -> Dict:
     """Asynchronously call VTube service for animation analysis"""
     try:
-        async with httpx.AsyncClient() as client:
-            # Create a copy for logging only
-            log_data = {
-                'text': animation_data['text'],
-                'ai_response': {
-                    'text': animation_data['ai_response']['text'],
-                    'audio': '<audio_data>' if 'audio' in animation_data['ai_response'] else None
-                },
-                'context': animation_data['context']
-            }
-            logger.info(f"Sending animation request: {log_data}")
-            
-            response = await client.post(
-                f"{VTUBE_SERVICE_URL}/play_animation",
-                json=animation_data,
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
+        # Create a copy for logging only
+        log_data = {
+            'text': animation_data['text'],
+            'ai_response': {
+                'text': animation_data['ai_response']['text'],
+                'audio_id': animation_data['ai_response'].get('audio_id')
+            },
+            'context': animation_data['context']
+        }
+        logger.info(f"Sending animation request: {log_data}")
+        
+        response = await http_pool.post(
+            "vtube",
+            "/play_animation",
+            json=animation_data,
+            timeout=10.0
+        )
+        response.raise_for_status()
+        return response.json()
     except Exception as e:
         logger.error(f"Animation analysis failed: {e}")
         return {"success": False, "error": str(e)}
 
+class _ConversationQueue(Queue):
+    """asyncio.Queue that can hand an item back to the front, e.g. when its delivery failed"""
+
+    def put_front_nowait(self, item):
+        # May briefly exceed maxsize: the item already held a slot before it was taken out
+        self._queue.appendleft(item)
+        self._unfinished_tasks += 1
+        self._finished.clear()
+        self._wakeup_next(self._getters)
+
 class ResponseQueue:
-    def __init__(self):
-        self.pending_responses: Dict[str, Queue] = defaultdict(Queue)
+    """Per-conversation response queues, bounded and evicted after a TTL if nobody collects them"""
+
+    def __init__(self, maxsize: int = RESPONSE_QUEUE_MAXSIZE, ttl: float = RESPONSE_QUEUE_TTL):
+        self.pending_responses: Dict[str, Queue] = {}
+        self.last_activity: Dict[str, float] = {}
+        self.subscribers: Dict[str, int] = {}
         self.current_conversation: Optional[str] = None
+        self.maxsize = maxsize
+        self.ttl = ttl
+    
+    def _evict_expired(self):
+        """Drop queues that have been idle longer than the TTL and have no active listener"""
+        now = time.monotonic()
+        expired = [
+            conversation_id for conversation_id, last_seen in self.last_activity.items()
+            if now - last_seen > self.ttl and not self.subscribers.get(conversation_id)
+        ]
+        for conversation_id in expired:
+            dropped = self.pending_responses.pop(conversation_id).qsize()
+            del self.last_activity[conversation_id]
+            logger.info(f"[BRAIN] Evicted expired conversation {conversation_id} ({dropped} undelivered responses)")
+    
+    def _get_queue(self, conversation_id: str) -> Queue:
+        self._evict_expired()
+        queue = self.pending_responses.get(conversation_id)
+        if queue is None:
+            queue = _ConversationQueue(maxsize=self.maxsize)
+            self.pending_responses[conversation_id] = queue
+        self.last_activity[conversation_id] = time.monotonic()
+        return queue
+    
+    def _discard_if_drained(self, conversation_id: str):
+        """Forget a conversation once everything queued for it has been delivered"""
+        queue = self.pending_responses.get(conversation_id)
+        if queue is not None and queue.empty() and not self.subscribers.get(conversation_id):
+            del self.pending_responses[conversation_id]
+            del self.last_activity[conversation_id]
     
     async def queue_response(self, conversation_id: str, response: dict):
-        await self.pending_responses[conversation_id].put(response)
+        queue = self._get_queue(conversation_id)
+        if queue.full():
+            # Never block the producer: drop the oldest undelivered response instead
+            queue.get_nowait()
+            logger.warning(f"[BRAIN] Response queue full for {conversation_id}, dropped oldest response")
+        queue.put_nowait(response)
+    
+    async def get_next_response(self, conversation_id: str, timeout: Optional[float] = None) -> Optional[dict]:
+        """Wait for the next response, or return None if the timeout expires first"""
+        queue = self._get_queue(conversation_id)
+        self.subscribers[conversation_id] = self.subscribers.get(conversation_id, 0) + 1
+        try:
+            return await asyncio.wait_for(queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self.subscribers[conversation_id] -= 1
+            if not self.subscribers[conversation_id]:
+                del self.subscribers[conversation_id]
+            self._discard_if_drained(conversation_id)
     
-    async def get_next_response(self, conversation_id: str) -> dict:
-        return await self.pending_responses[conversation_id].get()
+    def requeue_response(self, conversation_id: str, response: dict):
+        """Put back a response that was taken but never reached the client, ahead of newer ones"""
+        self._get_queue(conversation_id).put_front_nowait(response)
+
+    def get_response_nowait(self, conversation_id: str) -> Optional[dict]:
+        queue = self.pending_responses.get(conversation_id)
+        if queue is None:
+            return None
+        try:
+            return queue.get_nowait()
+        except QueueEmpty:
+            return None
+        finally:
+            self._discard_if_drained(conversation_id)
 
     def set_current_conversation(self, conversation_id: str):
         self.current_conversation = conversation_id
@@ -173,10 +280,10 @@ class BrainService:
         }
 
     async def get_pending_response(self, conversation_id: str):
+        """Polling fallback: return a queued response if one is ready, without waiting"""
         try:
-            # Get response when ready
-            if self.response_queue.current_conversation == conversation_id:
-                response = await self.response_queue.get_next_response(conversation_id)
+            response = self.response_queue.get_response_nowait(conversation_id)
+            if response is not None:
                 return response
             return {"status": "waiting"}
         except Exception as e:
@@ -186,6 +293,25 @@ class BrainService:
                 "error": str(e)
             }
 
+    async def response_events(self, conversation_id: str, request: Request, keepalive: float = 15.0) -> AsyncIterator[str]:
+        """Server-sent events: push the response for a conversation the moment it is queued"""
+        logger.info(f"[BRAIN] Client subscribed to responses for {conversation_id}")
+        while not await request.is_disconnected():
+            response = await self.response_queue.get_next_response(conversation_id, timeout=keepalive)
+            if response is None:
+                # Comment line keeps the connection (and any proxies) alive while we wait
+                yield ": keepalive\n\n"
+                continue
+            try:
+                yield f"event: response\ndata: {json.dumps(response)}\n\n"
+            except (GeneratorExit, asyncio.CancelledError):
+                # The client went away before this was sent; keep it for the next listener or poll
+                self.response_queue.requeue_response(conversation_id, response)
+                logger.info(f"[BRAIN] Client left before its response for {conversation_id} was sent, requeued it")
+                raise
+            return
+        logger.info(f"[BRAIN] Client disconnected from {conversation_id}")
+
 # Initialize BrainService
 brain_service = BrainService()
 
@@ -193,25 +319,45 @@ brain_service = BrainService()
 async def process_input(request: Request):
     return await brain_service.process_input(request)
 
+@app.post("/process/stream")
+async def process_input_stream(request: Request):
+    """Stream AI response events to the caller as they are produced"""
+    data = await request.json()
+    logger.info(f"[BRAIN] Starting streaming request using {'OpenAI' if data.get('use_openai', False) else 'Groq'} service")
+    return StreamingResponse(stream_ai_service(data), media_type="application/x-ndjson")
+
 @app.get("/pending_response/{conversation_id}")
 async def get_pending_response(conversation_id: str):
     return await brain_service.get_pending_response(conversation_id)
 
+@app.get("/responses/{conversation_id}/events")
+async def response_events(conversation_id: str, request: Request):
+    return StreamingResponse(
+        brain_service.response_events(conversation_id, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
 @app.post("/context/update")
 async def update_context(context_text: str):
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{DB_MODULE_URL}/context/update",
-                json={"context_text": context_text}
-            ) as response:
-                if response.status != 200:
-                    raise HTTPException(status_code=response.status, detail="Failed to update context")
-                return await response.json()
+        response = await http_pool.post(
+            "db",
+            "/context/update",
+            json={"context_text": context_text}
+        )
+        if response.status_code != 200:
+            raise HTTPException(status_code=response.status_code, detail="Failed to update context")
+        return response.json()
     except Exception as e:
         logger.error(f"Error updating context: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/metrics/http")
+async def http_metrics():
+    """Per-target connection pool metrics for outbound calls"""
+    return http_pool.metrics()
+
 if __name__ == "__main__":
     import uvicorn
     logger.info("Starting FastAPI application with Doppler configuration")
@@ -2,7 +2,10 @@ from fastapi import FastAPI, HTTPException
 from contextlib import asynccontextmanager
 from modules.db_module.services.vector_store import VectorStoreService
 from modules.db_module.database import db_engine, async_session_maker
-from modules.db_module.services.chat_service import ChatService
+from modules.db_module.migrations import apply_migrations
+from modules.db_module.services.chat_service import ChatService, write_exchange_batch
+from modules.db_module.services.write_behind import WriteBehindLog
+from modules.db_module.services.usage_service import UsageAccountant
 from src.utils.logging_config import setup_logger
 import platform
 import uvicorn
@@ -10,7 +13,11 @@ from modules.db_module.dependencies import save_context, get_active_context, get
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 from modules.db_module.services.cache_service import ChatHistoryCache, ContextCache
-from src.config.service_config import CHAT_HISTORY_PAIRS
+from src.config.service_config import (
+    CHAT_HISTORY_PAIRS, WRITE_BEHIND_DIR, WRITE_BEHIND_BATCH_SIZE,
+    WRITE_BEHIND_FLUSH_INTERVAL, WRITE_BEHIND_BACKLOG_WARNING,
+    USAGE_RECONCILE_INTERVAL, USAGE_RECONCILE_DAYS
+)
 from datetime import datetime
 
 logger = setup_logger("db_module_main")
@@ -20,19 +27,44 @@ async def lifespan(app: FastAPI):
     try:
         logger.info("[STARTUP] Initializing DB module services...")
         
+        try:
+            await apply_migrations(db_engine)
+        except Exception as e:
+            logger.error(f"[STARTUP] Schema migrations failed, continuing without them: {e}")
+        
         # Initialize Vector Store Service
         app.state.vector_store = VectorStoreService()
         logger.info("[INIT] Vector store service initialized")
         
         # Initialize chat history cache
         app.state.chat_cache = ChatHistoryCache()
-        # Load initial history
-        async with async_session_maker() as session:
-            chat_service = ChatService(session)
-            initial_history = await chat_service.get_chat_history(limit=CHAT_HISTORY_PAIRS)
-            app.state.chat_cache.update_cache(initial_history)
+        # Seed the shared history from the DB unless another worker already has
+        if not app.state.chat_cache.has_history():
+            async with async_session_maker() as session:
+                chat_service = ChatService(session)
+                initial_history = await chat_service.get_chat_history(limit=CHAT_HISTORY_PAIRS)
+                app.state.chat_cache.update_cache(initial_history)
         logger.info(f"[INIT] Chat history cache initialized with {CHAT_HISTORY_PAIRS} pairs")
         
+        # Chat exchanges are persisted write-behind, in batches, off the request path
+        app.state.exchange_writer = WriteBehindLog(
+            "exchanges",
+            WRITE_BEHIND_DIR,
+            write_exchange_batch,
+            batch_size=WRITE_BEHIND_BATCH_SIZE,
+            flush_interval=WRITE_BEHIND_FLUSH_INTERVAL,
+            backlog_warning=WRITE_BEHIND_BACKLOG_WARNING
+        )
+        await app.state.exchange_writer.start()
+        
+        # API usage totals are served from memory and reconciled with the rollup table
+        app.state.usage_accountant = UsageAccountant(
+            async_session_maker,
+            reconcile_days=USAGE_RECONCILE_DAYS,
+            reconcile_interval=USAGE_RECONCILE_INTERVAL
+        )
+        await app.state.usage_accountant.start()
+        
         # Initialize context cache
         app.state.context_cache = ContextCache()
         # Initial context load
@@ -47,6 +79,9 @@ async def lifespan(app: FastAPI):
         yield
         
         # Cleanup
+        await app.state.vector_store.close()
+        await app.state.exchange_writer.stop()
+        await app.state.usage_accountant.stop()
         await db_engine.dispose()
         logger.info("[SHUTDOWN] Database connections closed")
         
@@ -86,9 +121,11 @@ async def update_context(context: ContextUpdate):
 
 @app.get("/context/current")
 async def get_current_context():
-    """Get current context from cache only"""
+    """Get current context from the shared cache, reloading it from the DB if marked for refresh"""
     try:
         context_cache = ContextCache()
+        if context_cache.should_refresh():
+            context_cache.update_context(await get_active_context() or "No context set")
         return {"context": context_cache.get_context()}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -172,9 +209,6 @@ if __name__ == "__main__":
     
     logger.info(f"[STARTUP] Starting server with config: {config}")
     
-    # Use Server instance for more control
-    server = uvicorn.Server(uvicorn.Config(
-        app,
-        **config
-    ))
-    server.run() 
\ No newline at end of file
+    # uvicorn only spawns multiple workers for an import string; they share chat history
+    # and context through the shared state store
+    uvicorn.run("modules.db_module.main_db:app", **config) 
\ No newline at end of file
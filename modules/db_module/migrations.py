@@ -0,0 +1,120 @@
+"""Idempotent schema migrations for tables the DB module reads on hot paths.
+
+The tables predate the module and have no migration tool, so each migration checks
+information_schema before applying itself. It runs at DB module startup and can also be
+run by hand: python -m modules.db_module.migrations
+"""
+import asyncio
+from typing import List, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.utils.logging_config import setup_logger
+from modules.db_module.models import ApiUsageRollup
+
+logger = setup_logger("db_migrations")
+
+# (table, column, column definition)
+COLUMNS: List[Tuple[str, str, str]] = [
+    ("chatgpt_api_usage", "usage_key", "VARCHAR(64) NOT NULL DEFAULT 'default'"),
+    ("private_conversations", "exchange_id", "VARCHAR(32) NULL"),
+]
+
+# Tables that are created from their model if missing
+TABLES = [ApiUsageRollup.__table__]
+
+# (index name, table, columns)
+INDEXES: List[Tuple[str, str, str]] = [
+    # Keyset pagination of chat history walks (added_time, id) in descending order
+    ("idx_private_conversations_added_time_id", "private_conversations", "added_time, id"),
+    # Usage reconciliation re-aggregates the last few days
+    ("idx_chatgpt_api_usage_added_time", "chatgpt_api_usage", "added_time"),
+]
+
+# Same shape as INDEXES, created as UNIQUE
+UNIQUE_INDEXES: List[Tuple[str, str, str]] = [
+    # Write-behind inserts update nothing on a duplicate exchange_id, so a replay is a no-op
+    ("uq_private_conversations_exchange_id", "private_conversations", "exchange_id"),
+]
+
+# MySQL/MariaDB "Duplicate key name": another worker created the index first
+DUPLICATE_KEY_NAME = 1061
+
+
+def _create_if_missing(sync_conn, table) -> bool:
+    if inspect(sync_conn).has_table(table.name):
+        return False
+    table.create(sync_conn)
+    return True
+
+
+async def apply_migrations(engine: AsyncEngine):
+    async with engine.begin() as conn:
+        # Every worker runs this at startup; a named lock makes them take turns
+        await conn.execute(text("SELECT GET_LOCK('db_module_migrations', 30)"))
+        try:
+            await _apply(conn)
+        finally:
+            await conn.execute(text("SELECT RELEASE_LOCK('db_module_migrations')"))
+
+
+async def _apply(conn):
+    for table, column, definition in COLUMNS:
+        exists = (await conn.execute(
+            text(
+                "SELECT COUNT(*) FROM information_schema.columns "
+                "WHERE table_schema = DATABASE() AND table_name = :table AND column_name = :column"
+            ),
+            {"table": table, "column": column}
+        )).scalar()
+        if not exists:
+            logger.info(f"[MIGRATION] Adding column {table}.{column}")
+            await conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+
+    for table in TABLES:
+        if await conn.run_sync(_create_if_missing, table):
+            logger.info(f"[MIGRATION] Created table {table.name}")
+            if table is ApiUsageRollup.__table__:
+                await backfill_usage_rollup(conn)
+
+    indexes = [(index, False) for index in INDEXES] + [(index, True) for index in UNIQUE_INDEXES]
+    for (name, table, columns), unique in indexes:
+        exists = (await conn.execute(
+            text(
+                "SELECT COUNT(*) FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND table_name = :table AND index_name = :name"
+            ),
+            {"table": table, "name": name}
+        )).scalar()
+        if exists:
+            continue
+        logger.info(f"[MIGRATION] Creating index {name} on {table} ({columns})")
+        try:
+            await conn.execute(text(f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table} ({columns})"))
+        except OperationalError as e:
+            if getattr(e.orig, "args", [None])[0] != DUPLICATE_KEY_NAME:
+                raise
+            logger.info(f"[MIGRATION] Index {name} was created concurrently")
+
+
+async def backfill_usage_rollup(conn):
+    """Build the rollup from the whole usage table once, when the rollup table is first created"""
+    await conn.execute(text(
+        "INSERT INTO chatgpt_api_usage_rollup (day, usage_key, requests, prompt_tokens, completion_tokens, total_tokens) "
+        "SELECT DATE(added_time), usage_key, COUNT(*), COALESCE(SUM(prompt_tokens), 0), "
+        "COALESCE(SUM(completion_tokens), 0), COALESCE(SUM(total_tokens), 0) "
+        "FROM chatgpt_api_usage WHERE added_time IS NOT NULL GROUP BY DATE(added_time), usage_key"
+    ))
+    logger.info("[MIGRATION] Backfilled chatgpt_api_usage_rollup from chatgpt_api_usage")
+
+
+if __name__ == "__main__":
+    from modules.db_module.database import db_engine
+
+    async def main():
+        await apply_migrations(db_engine)
+        await db_engine.dispose()
+
+    asyncio.run(main())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Date, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import declarative_base
 from datetime import datetime
 from sqlalchemy import func
@@ -12,6 +12,14 @@ class ChatMessage(Base):
     question = Column(Text)  # Original 'Question' column
     answer = Column(Text)    # Original 'Answer' column
     added_time = Column(DateTime, default=datetime.utcnow)
+    # Assigned when the exchange is queued, so replaying the write-behind log can't duplicate it
+    exchange_id = Column(String(32), nullable=True)
+    
+    # Created on existing databases by modules/db_module/migrations.py
+    __table_args__ = (
+        Index('idx_private_conversations_added_time_id', 'added_time', 'id'),
+        Index('uq_private_conversations_exchange_id', 'exchange_id', unique=True),
+    )
 
 class ApiUsage(Base):
     __tablename__ = 'chatgpt_api_usage'  # Using the existing table name
@@ -21,6 +29,23 @@ class ApiUsage(Base):
     completion_tokens = Column(Integer)
     total_tokens = Column(Integer)
     added_time = Column(DateTime, default=datetime.utcnow) 
+    # Which API key / account the tokens were spent on; added by migrations.py
+    usage_key = Column(String(64), nullable=False, default='default', server_default='default')
+    
+    __table_args__ = (
+        Index('idx_chatgpt_api_usage_added_time', 'added_time'),
+    )
+
+class ApiUsageRollup(Base):
+    """Running usage totals per day and key, kept in step with chatgpt_api_usage on every insert"""
+    __tablename__ = 'chatgpt_api_usage_rollup'
+    
+    day = Column(Date, primary_key=True)
+    usage_key = Column(String(64), primary_key=True)
+    requests = Column(BigInteger, nullable=False, default=0)
+    prompt_tokens = Column(BigInteger, nullable=False, default=0)
+    completion_tokens = Column(BigInteger, nullable=False, default=0)
+    total_tokens = Column(BigInteger, nullable=False, default=0)
 
 class ContextChoice(Base):
     __tablename__ = 'context_choices'
@@ -1,11 +1,11 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import func, select, desc
+from sqlalchemy import func, select, desc, insert, delete, and_, or_, text
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.future import select
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 import logging
-from modules.db_module.models import ChatMessage, ApiUsage
-from decimal import Decimal
-from datetime import datetime
+from modules.db_module.models import ChatMessage, ApiUsage, ApiUsageRollup
+from datetime import date, datetime
 from src.config.service_config import CHAT_HISTORY_PAIRS
 
 logger = logging.getLogger(__name__)
@@ -32,18 +32,41 @@ class ChatRepository:
             await self.session.rollback()
             return False
     
+    async def add_chat_exchanges(self, exchanges: List[Dict]) -> bool:
+        """Insert many {question, answer, added_time, exchange_id} rows with one multi-row INSERT and one commit.
+
+        Rows whose exchange_id is already stored are left as they are, so a replayed batch
+        is harmless. Unlike INSERT IGNORE this only absorbs the duplicate key; a row with bad
+        data still fails the batch, so the write-behind log keeps it.
+        """
+        if not exchanges:
+            return True
+        try:
+            statement = mysql_insert(ChatMessage).values(exchanges)
+            await self.session.execute(statement.on_duplicate_key_update(exchange_id=ChatMessage.exchange_id))
+            await self.session.commit()
+            logger.info(f"[REPO] Wrote {len(exchanges)} chat exchanges in one statement")
+            return True
+            
+        except Exception as e:
+            logger.error(f"[REPO] Error saving {len(exchanges)} chat exchanges: {e}")
+            await self.session.rollback()
+            return False
+    
     async def get_recent_exchanges(self, limit: int = CHAT_HISTORY_PAIRS) -> List[Dict]:
         """Get recent chat exchanges"""
         try:
             start_time = datetime.now()
             # Get pairs of exchanges, limit is number of pairs
-            query = select(ChatMessage).order_by(
-                desc(ChatMessage.added_time)
+            query = select(
+                ChatMessage.question, ChatMessage.answer, ChatMessage.added_time
+            ).order_by(
+                desc(ChatMessage.added_time), desc(ChatMessage.id)
             ).limit(limit)
             
             query_start = datetime.now()
             result = await self.session.execute(query)
-            exchanges = result.scalars().all()
+            exchanges = result.all()
             query_duration = (datetime.now() - query_start).total_seconds()
             logger.info(f"[REPO] Database query completed in {query_duration:.3f} seconds")
             
@@ -68,32 +91,124 @@ class ChatRepository:
             logger.error(f"Error fetching chat history: {e}")
             return []
     
-    async def save_api_usage(self, prompt_tokens: int, completion_tokens: int, total_tokens: int) -> bool:
-        """Save API usage statistics"""
+    async def stream_exchanges(self, limit: int, before: Optional[Tuple[datetime, int]] = None) -> AsyncIterator[Dict]:
+        """Yield up to limit exchanges, newest first, strictly older than the (added_time, id) keyset cursor.
+
+        Served by the (added_time, id) index, so each page costs the same however deep it is;
+        rows are streamed as plain columns rather than loaded as ORM objects.
+        """
+        query = select(
+            ChatMessage.id, ChatMessage.question, ChatMessage.answer, ChatMessage.added_time
+        ).order_by(
+            desc(ChatMessage.added_time), desc(ChatMessage.id)
+        ).limit(limit)
+        if before is not None:
+            before_time, before_id = before
+            query = query.where(or_(
+                ChatMessage.added_time < before_time,
+                and_(ChatMessage.added_time == before_time, ChatMessage.id < before_id)
+            ))
+        
+        result = await self.session.stream(query)
+        async for row in result:
+            yield {
+                "id": row.id,
+                "question": row.question,
+                "answer": row.answer,
+                "timestamp": row.added_time.isoformat()
+            }
+    
+    async def save_api_usage(self, prompt_tokens: int, completion_tokens: int, total_tokens: int,
+                             usage_key: str = "default") -> bool:
+        """Save API usage statistics and add them to the day/key rollup in the same transaction"""
         try:
+            now = datetime.utcnow()
             usage = ApiUsage(
                 prompt_tokens=prompt_tokens,
                 completion_tokens=completion_tokens,
-                total_tokens=total_tokens
+                total_tokens=total_tokens,
+                usage_key=usage_key,
+                added_time=now
             )
             self.session.add(usage)
-            await self.session.commit()
-            
-            # Calculate total usage and cost
-            query = select(func.sum(ApiUsage.total_tokens))
-            result = await self.session.execute(query)
-            token_sum = result.scalar() or 0
-            
-            # Calculate cost (using your existing formula)
-            token_sum = Decimal(str(token_sum))
-            price_per_1000_tokens = Decimal('0.002')
-            tokens_per_dollar = Decimal('1000')
-            price = token_sum / tokens_per_dollar * price_per_1000_tokens
             
-            logger.info(f"Total tokens used: {token_sum}, Current cost: ${price}")
+            rollup = mysql_insert(ApiUsageRollup).values(
+                day=now.date(),
+                usage_key=usage_key,
+                requests=1,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=total_tokens
+            )
+            await self.session.execute(rollup.on_duplicate_key_update(
+                requests=ApiUsageRollup.requests + 1,
+                prompt_tokens=ApiUsageRollup.prompt_tokens + rollup.inserted.prompt_tokens,
+                completion_tokens=ApiUsageRollup.completion_tokens + rollup.inserted.completion_tokens,
+                total_tokens=ApiUsageRollup.total_tokens + rollup.inserted.total_tokens
+            ))
+            await self.session.commit()
             return True
             
         except Exception as e:
             logger.error(f"Error saving API usage: {e}")
             await self.session.rollback()
-            return False 
\ No newline at end of file
+            return False
+    
+    async def get_usage_rollups(self) -> List[Dict]:
+        """All rollup rows: one per day and key, so this stays small however many calls were made"""
+        result = await self.session.execute(select(ApiUsageRollup))
+        return [
+            {
+                "day": row.day,
+                "usage_key": row.usage_key,
+                "requests": row.requests,
+                "prompt_tokens": row.prompt_tokens,
+                "completion_tokens": row.completion_tokens,
+                "total_tokens": row.total_tokens
+            }
+            for row in result.scalars()
+        ]
+    
+    async def rebuild_usage_rollups(self, since: date) -> Optional[int]:
+        """Recompute the rollup rows from `since` onwards from the raw usage table.
+
+        Every worker reconciles on a timer; the named lock lets one of them do the work
+        and the others skip (returning None) rather than rewrite the same rows. The lock
+        belongs to the connection, so it is released before the commit hands it back.
+        """
+        locked = (await self.session.execute(text("SELECT GET_LOCK('usage_rollup_rebuild', 0)"))).scalar()
+        if locked != 1:
+            # 0: another worker holds it; NULL: the lock could not be taken at all
+            await self.session.rollback()
+            return None
+        try:
+            day = func.date(ApiUsage.added_time)
+            result = await self.session.execute(
+                select(
+                    day.label("day"),
+                    ApiUsage.usage_key,
+                    func.count().label("requests"),
+                    func.coalesce(func.sum(ApiUsage.prompt_tokens), 0).label("prompt_tokens"),
+                    func.coalesce(func.sum(ApiUsage.completion_tokens), 0).label("completion_tokens"),
+                    func.coalesce(func.sum(ApiUsage.total_tokens), 0).label("total_tokens")
+                ).where(
+                    ApiUsage.added_time >= datetime.combine(since, datetime.min.time())
+                ).group_by(day, ApiUsage.usage_key)
+            )
+            rows = [dict(row._mapping) for row in result]
+            
+            await self.session.execute(delete(ApiUsageRollup).where(ApiUsageRollup.day >= since))
+            if rows:
+                await self.session.execute(insert(ApiUsageRollup).values(rows))
+            await self.session.execute(text("SELECT RELEASE_LOCK('usage_rollup_rebuild')"))
+            await self.session.commit()
+            return len(rows)
+            
+        except Exception as e:
+            logger.error(f"Error rebuilding usage rollups: {e}")
+            try:
+                await self.session.execute(text("SELECT RELEASE_LOCK('usage_rollup_rebuild')"))
+            except Exception:
+                pass  # A dead connection takes its lock with it
+            await self.session.rollback()
+            raise
@@ -1,26 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, Form, BackgroundTasks, Request
+from fastapi import APIRouter, Depends, HTTPException, Form, Request
 from pydantic import BaseModel
 from modules.db_module.services.chat_service import ChatService
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from modules.db_module.dependencies import get_db_session
 from src.utils.logging_config import setup_logger
 from modules.db_module.services.cache_service import ChatHistoryCache
-from src.config.service_config import CHAT_HISTORY_PAIRS
+from src.config.service_config import CHAT_HISTORY_PAIRS, CHAT_HISTORY_PAGE_MAX
+from modules.db_module.database import async_session_maker
+from fastapi.responses import StreamingResponse
 from datetime import datetime
+import base64
+import json
+import uuid
 
 logger = setup_logger("db_router")
 
 router = APIRouter()
 
-async def save_exchange_background(service: ChatService, question: str, answer: str):
-    """Background task for saving chat exchange"""
-    try:
-        await service.save_exchange(question, answer)
-        logger.info("[BACKGROUND] Successfully saved chat exchange")
-    except Exception as e:
-        logger.error(f"[BACKGROUND] Error saving chat exchange: {e}", exc_info=True)
-
 @router.get("/chat/exchange")
 async def get_chat_history(
     request: Request,
@@ -32,10 +29,9 @@ async def get_chat_history(
     try:
         # Use cache from app state
         cache = request.app.state.chat_cache
-        cached_messages = cache.get_cached_history()
-        
         # If requesting same or fewer messages than what's cached, return from cache
         if limit <= CHAT_HISTORY_PAIRS:
+            cached_messages = cache.get_cached_history(limit)
             cache_duration = (datetime.now() - start_time).total_seconds()
             logger.info(f"[GET] Retrieved {len(cached_messages)} messages from cache in {cache_duration:.3f} seconds")
             return cached_messages
@@ -55,38 +51,99 @@ async def get_chat_history(
         logger.error(f"[GET] Error retrieving chat history: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def encode_history_cursor(added_time: str, exchange_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{added_time}|{exchange_id}".encode()).decode()
+
+def decode_history_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        added_time, exchange_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(added_time), int(exchange_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid history cursor")
+
+async def stream_history_page(limit: int, before: Optional[Tuple[datetime, int]]) -> AsyncIterator[str]:
+    """Write {"items": [...], "next_cursor": ...} as rows arrive from the DB"""
+    # The response outlives the request's dependencies, so the stream owns its session
+    async with async_session_maker() as session:
+        yield '{"items": ['
+        count = 0
+        last = None
+        async for exchange in ChatService(session).stream_history(limit, before):
+            yield ("," if count else "") + json.dumps(exchange, ensure_ascii=False)
+            count += 1
+            last = exchange
+        next_cursor = encode_history_cursor(last["timestamp"], last["id"]) if count == limit else None
+        yield f'], "next_cursor": {json.dumps(next_cursor)}}}'
+
+@router.get("/chat/history")
+async def browse_chat_history(limit: int = 50, cursor: Optional[str] = None) -> StreamingResponse:
+    """Page through the full conversation table, newest first.
+
+    Pass the previous page's next_cursor to get the next (older) page; each page is one
+    index range scan on (added_time, id), however far back it is.
+    """
+    if not 1 <= limit <= CHAT_HISTORY_PAGE_MAX:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {CHAT_HISTORY_PAGE_MAX}")
+    before = decode_history_cursor(cursor) if cursor else None
+    logger.info(f"[GET] Streaming history page. Limit: {limit}, cursor: {before}")
+    return StreamingResponse(stream_history_page(limit, before), media_type="application/json")
+
+@router.get("/chat/history/rendered")
+async def get_rendered_history(request: Request) -> Dict:
+    """The cached history already formatted as the prompt's conversation section"""
+    cache = request.app.state.chat_cache
+    return {"text": cache.get_rendered_history(), "exchanges": len(cache.exchanges)}
+
 @router.post("/chat/exchange")
 async def save_chat_exchange(
     request: Request,
-    background_tasks: BackgroundTasks,
     question: str,
     answer: str,
-    session: AsyncSession = Depends(get_db_session)
+    exchange_id: Optional[str] = None
 ) -> Dict:
+    if exchange_id is not None and not 1 <= len(exchange_id) <= 32:
+        raise HTTPException(status_code=400, detail="exchange_id must be 1-32 characters")
     logger.info(f"[POST] Received chat exchange to save - Q: {question[:50]}...")
     try:
         # Use cache from app state
         cache = request.app.state.chat_cache
         cache.add_new_exchange(question, answer)
         
-        # Save to DB in background
-        service = ChatService(session)
-        background_tasks.add_task(save_exchange_background, service, question, answer)
-        logger.info("[POST] Added chat exchange to background tasks")
+        # Durably queued in the local WAL; the write-behind flusher batches it into the DB
+        await request.app.state.exchange_writer.submit({
+            "question": question,
+            "answer": answer,
+            "added_time": datetime.utcnow().isoformat(),
+            # A caller retrying the POST can pass its own id; either way a replay stays one row
+            "exchange_id": exchange_id or uuid.uuid4().hex
+        })
+        logger.info("[POST] Queued chat exchange for write-behind")
         return {"status": "processing"}
     except Exception as e:
         logger.error(f"[POST] Error queuing chat exchange: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/chat/write-behind/stats")
+async def write_behind_stats(request: Request) -> Dict:
+    """Backlog and flush counters of this worker's write-behind queue"""
+    return request.app.state.exchange_writer.stats()
+
 @router.post("/chat/usage")
 async def save_token_usage(
+    request: Request,
     prompt_tokens: int,
     completion_tokens: int,
     total_tokens: int,
-    session: AsyncSession = Depends(get_db_session)
+    usage_key: str = "default"
 ) -> Dict:
-    service = ChatService(session)
-    success = await service.save_token_usage(prompt_tokens, completion_tokens, total_tokens)
+    if not usage_key or len(usage_key) > 64:
+        raise HTTPException(status_code=400, detail="usage_key must be 1-64 characters")
+    success = await request.app.state.usage_accountant.record(prompt_tokens, completion_tokens, total_tokens, usage_key)
     if not success:
         raise HTTPException(status_code=500, detail="Failed to save token usage")
-    return {"status": "success"} 
\ No newline at end of file
+    return {"status": "success"}
+
+@router.get("/chat/usage/summary")
+async def usage_summary(request: Request) -> Dict:
+    """Running token and cost totals (overall, today, per key) from this worker's memory"""
+    return request.app.state.usage_accountant.summary()
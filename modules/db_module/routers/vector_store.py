@@ -1,5 +1,5 @@
-from fastapi import APIRouter, Depends
-from typing import List, Dict
+from fastapi import APIRouter, Depends, Request
+from typing import List, Dict, Optional
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -7,21 +7,38 @@ router = APIRouter()
 class VectorQuery(BaseModel):
     query: str
     limit: int = 5
+    # Seconds the caller can wait; reranking is skipped when it runs short
+    budget: Optional[float] = None
 
-@router.post("/vector/query")
+def get_vector_store(request: Request):
+    return request.app.state.vector_store
+
+# Mounted under the /vector prefix in main_db
+@router.post("/query")
 async def query_vector_store(
     query: VectorQuery,
-    vector_store=Depends(lambda: app.state.vector_store)
+    vector_store=Depends(get_vector_store)
 ):
     """Query the vector store for relevant documents"""
-    results = await vector_store.query(query.query, query.limit)
+    results = await vector_store.query(query.query, query.limit, budget=query.budget)
     return results
 
-@router.post("/vector/index")
+@router.post("/index")
 async def index_documents(
     documents: List[Dict],
-    vector_store=Depends(lambda: app.state.vector_store)
+    vector_store=Depends(get_vector_store)
 ):
     """Index new documents in the vector store"""
     success = await vector_store.index_documents(documents)
-    return {"success": success} 
\ No newline at end of file
+    return {"success": success}
+
+@router.get("/stats")
+async def vector_store_stats(vector_store=Depends(get_vector_store)):
+    """Query embedding cache hit/miss counters and vector backend size for this worker"""
+    return {
+        "embedding_cache": vector_store.embedding_cache.stats(),
+        "backend": vector_store.backend.stats(),
+        "query_batching": vector_store.query_batcher.stats(),
+        "rerank": vector_store.reranker.stats() if vector_store.reranker else None,
+        "lexical_index": vector_store.lexical_index.stats() if vector_store.lexical_index else None
+    }
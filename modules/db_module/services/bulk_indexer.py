@@ -0,0 +1,163 @@
+import asyncio
+import os
+import time
+from typing import AsyncIterable, Callable, Dict, Iterable, List, Optional, Sequence, Set, Union
+
+from src.utils.logging_config import setup_logger
+
+logger = setup_logger("bulk_indexer")
+
+_STAGE_DONE = None
+
+
+class IndexCheckpoint:
+    """Append-only file of document ids that have been upserted, so an interrupted run can resume"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.done = {line.rstrip("\n") for line in f if line.strip()}
+            logger.info(f"[INDEXER] Resuming: {len(self.done)} documents already indexed")
+
+    def record(self, ids: Sequence[str]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(f"{doc_id}\n" for doc_id in ids)
+            f.flush()
+            os.fsync(f.fileno())
+        self.done.update(ids)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.done = set()
+
+
+class BulkIndexer:
+    """Streaming embed -> upsert pipeline with bounded queues between the stages.
+
+    Documents ({"id", "text", optional "metadata"}) are pulled from a (sync or async)
+    iterable, grouped into embedding batches, embedded by embed_workers concurrent
+    workers, regrouped into upsert batches and written by upsert_workers workers. Only
+    a few batches are ever in memory. With a checkpoint path, upserted ids are recorded
+    so a rerun skips them; on_indexed is called with the ids of every upserted batch.
+    """
+
+    def __init__(self, embed_fn: Callable[[List[str]], List[List[float]]], backend,
+                 checkpoint_path: Optional[str] = None, embed_batch_size: int = 128,
+                 upsert_batch_size: int = 200, embed_workers: int = 2, upsert_workers: int = 2,
+                 queue_size: int = 4, max_retries: int = 3,
+                 on_indexed: Optional[Callable[[List[str]], None]] = None):
+        self.embed_fn = embed_fn
+        self.backend = backend
+        self.checkpoint = IndexCheckpoint(checkpoint_path) if checkpoint_path else None
+        self.embed_batch_size = embed_batch_size
+        self.upsert_batch_size = upsert_batch_size
+        self.embed_workers = embed_workers
+        self.upsert_workers = upsert_workers
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.on_indexed = on_indexed
+
+        self.indexed = 0
+        self.skipped = 0
+
+    async def _retry(self, description: str, fn, *args):
+        """Run a blocking call in a thread, retrying with exponential backoff"""
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                return await asyncio.to_thread(fn, *args)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = 2 ** attempt
+                logger.warning(f"[INDEXER] {description} failed (attempt {attempt}/{self.max_retries}): {e}, retrying in {delay}s")
+                await asyncio.sleep(delay)
+
+    async def _iterate(self, documents: Union[Iterable[Dict], AsyncIterable[Dict]]):
+        if hasattr(documents, "__aiter__"):
+            async for document in documents:
+                yield document
+        else:
+            for document in documents:
+                yield document
+                # Let the workers run while a sync generator is being drained
+                await asyncio.sleep(0)
+
+    async def _source(self, documents, embed_queue: asyncio.Queue):
+        batch = []
+        async for document in self._iterate(documents):
+            if self.checkpoint and document["id"] in self.checkpoint.done:
+                self.skipped += 1
+                continue
+            batch.append(document)
+            if len(batch) >= self.embed_batch_size:
+                await embed_queue.put(batch)
+                batch = []
+        if batch:
+            await embed_queue.put(batch)
+
+    async def _embed_worker(self, embed_queue: asyncio.Queue, upsert_queue: asyncio.Queue):
+        while (batch := await embed_queue.get()) is not _STAGE_DONE:
+            embeddings = await self._retry("Embedding batch", self.embed_fn, [doc["text"] for doc in batch])
+            items = [
+                (doc["id"], embedding, {"text": doc["text"], **doc.get("metadata", {})})
+                for doc, embedding in zip(batch, embeddings)
+            ]
+            for i in range(0, len(items), self.upsert_batch_size):
+                await upsert_queue.put(items[i:i + self.upsert_batch_size])
+
+    async def _upsert_worker(self, upsert_queue: asyncio.Queue):
+        while (items := await upsert_queue.get()) is not _STAGE_DONE:
+            await self._retry("Upsert batch", self.backend.upsert, items)
+            ids = [doc_id for doc_id, _, _ in items]
+            if self.checkpoint:
+                await asyncio.to_thread(self.checkpoint.record, ids)
+            if self.on_indexed:
+                await asyncio.to_thread(self.on_indexed, ids)
+            self.indexed += len(ids)
+            logger.info(f"[INDEXER] Indexed {self.indexed} documents")
+
+    async def run(self, documents: Union[Iterable[Dict], AsyncIterable[Dict]]) -> Dict:
+        """Index every document; returns counts and timing"""
+        start = time.perf_counter()
+        embed_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        upsert_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        embedders = [asyncio.create_task(self._embed_worker(embed_queue, upsert_queue)) for _ in range(self.embed_workers)]
+        upserters = [asyncio.create_task(self._upsert_worker(upsert_queue)) for _ in range(self.upsert_workers)]
+        source = asyncio.create_task(self._source(documents, embed_queue))
+        try:
+            # Each stage shuts down the next once it has drained: one sentinel per worker
+            await self._await_stage([source], embedders + upserters)
+            for _ in embedders:
+                await embed_queue.put(_STAGE_DONE)
+            await self._await_stage(embedders, upserters)
+            for _ in upserters:
+                await upsert_queue.put(_STAGE_DONE)
+            await self._await_stage(upserters, [])
+        except BaseException:
+            for task in [source] + embedders + upserters:
+                task.cancel()
+            raise
+
+        duration = time.perf_counter() - start
+        logger.info(f"[INDEXER] Finished: {self.indexed} indexed, {self.skipped} skipped in {duration:.1f}s")
+        if self.checkpoint:
+            # A complete run leaves nothing to resume
+            self.checkpoint.clear()
+        return {"indexed": self.indexed, "skipped": self.skipped, "duration": duration}
+
+    async def _await_stage(self, stage: List[asyncio.Task], downstream: List[asyncio.Task]):
+        """Wait for a stage to finish, failing fast if any downstream worker dies first"""
+        pending = set(stage)
+        watch = set(downstream)
+        while pending:
+            done, _ = await asyncio.wait(pending | watch, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+                if task in watch:
+                    raise RuntimeError("Indexing worker stopped unexpectedly")
+            pending -= done
@@ -1,87 +1,121 @@
+from collections import deque
+from dataclasses import dataclass
 from typing import List, Dict, Optional
 from datetime import datetime
 from src.utils.logging_config import setup_logger
 from src.config.service_config import CHAT_HISTORY_PAIRS
+from modules.db_module.services.shared_state import get_shared_state
 
 logger = setup_logger("db_cache")
 
+USER_ROLE = "Madrus"
+ASSISTANT_ROLE = "Shiro"
+
+
+@dataclass(frozen=True, slots=True)
+class Exchange:
+    """One question/answer pair with its prompt lines rendered once, when it is cached"""
+    question: str
+    answer: str
+    timestamp: str
+    rendered: str
+
+    @classmethod
+    def create(cls, question: str, answer: str, timestamp: Optional[str] = None) -> "Exchange":
+        return cls(
+            question=question,
+            answer=answer,
+            timestamp=timestamp or datetime.now().isoformat(),
+            rendered=f"{USER_ROLE}: {question}\n{ASSISTANT_ROLE}: {answer}"
+        )
+
+    def messages(self) -> List[Dict]:
+        return [
+            {"role": USER_ROLE, "content": self.question, "timestamp": self.timestamp},
+            {"role": ASSISTANT_ROLE, "content": self.answer, "timestamp": self.timestamp}
+        ]
+
+
 class ChatHistoryCache:
+    """The last max_pairs exchanges in a fixed-capacity deque, plus the history section of
+    the prompt kept rendered: adding an exchange appends its line and drops the evicted one.
+
+    The exchanges also live in the shared state store, so every DB module worker sees an
+    exchange posted to any of them; a worker reloads its copy when the store changed.
+    """
+
     _instance = None
     
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
-            cls._instance.history_cache = []
             cls._instance.max_pairs = CHAT_HISTORY_PAIRS
+            cls._instance.exchanges = deque(maxlen=CHAT_HISTORY_PAIRS)
+            cls._instance.rendered = ""
+            cls._instance.store = get_shared_state()
+            cls._instance.loaded_version = None
             logger.info(f"[CACHE] Chat history cache initialized with {CHAT_HISTORY_PAIRS} pairs limit")
         return cls._instance
     
+    def _load(self, rows):
+        self.exchanges.clear()
+        for question, answer, timestamp in rows:
+            self.exchanges.append(Exchange.create(question, answer, timestamp))
+        self.rendered = "\n".join(exchange.rendered for exchange in self.exchanges)
+    
+    def _sync(self):
+        """Reload from the shared store if another worker has written to it"""
+        version = self.store.data_version()
+        if version != self.loaded_version:
+            self.loaded_version = version
+            self._load(self.store.recent_exchanges(self.max_pairs))
+    
+    def has_history(self) -> bool:
+        self._sync()
+        return bool(self.exchanges)
+    
     def update_cache(self, messages: List[Dict]):
-        """Update the cache with new messages"""
+        """Replace the cache with exchanges loaded from the DB ({question, answer, timestamp})"""
         start_time = datetime.now()
-        logger.info(f"[CACHE] Previous cache size: {len(self.history_cache)}")
-        logger.debug(f"[CACHE] Received messages to cache: {messages}")
-        
-        # Since messages come in pairs, we need to handle them differently
-        convert_start = datetime.now()
-        pairs = []
-        for msg in messages:
-            if 'question' in msg and 'answer' in msg:
-                # Convert DB format to our cache format
-                pairs.extend([
-                    {
-                        "role": "Madrus",
-                        "content": msg['question'],
-                        "timestamp": msg['timestamp'] if 'timestamp' in msg else datetime.now().isoformat()
-                    },
-                    {
-                        "role": "Shiro",
-                        "content": msg['answer'],
-                        "timestamp": msg['timestamp'] if 'timestamp' in msg else datetime.now().isoformat()
-                    }
-                ])
-        logger.debug(f"[CACHE] Converted pairs: {pairs}")
-        
-        # Keep only the last max_pairs
-        self.history_cache = pairs[-(self.max_pairs * 2):]  # Times 2 because each pair is 2 messages
+        rows = [
+            (msg['question'], msg['answer'], msg.get('timestamp') or datetime.now().isoformat())
+            for msg in messages if 'question' in msg and 'answer' in msg
+        ][-self.max_pairs:]
+        self.store.replace_exchanges(rows)
+        self._load(rows)
         
         total_duration = (datetime.now() - start_time).total_seconds()
-        if self.history_cache:
-            latest = self.history_cache[-1]
-            logger.info(f"[CACHE] Latest cached exchange - Content: {latest['content'][:30]}...")
-        logger.info(f"[CACHE] Updated cache with {len(self.history_cache)} messages in {total_duration:.3f} seconds")
+        logger.info(f"[CACHE] Loaded {len(self.exchanges)} exchanges into the shared cache in {total_duration:.3f} seconds")
+    
+    def get_cached_history(self, limit: Optional[int] = None) -> List[Dict]:
+        """Get cached messages, oldest first, as role/content dicts"""
+        self._sync()
+        exchanges = list(self.exchanges)[-limit:] if limit else self.exchanges
+        return [message for exchange in exchanges for message in exchange.messages()]
     
-    def get_cached_history(self) -> List[Dict]:
-        """Get cached messages"""
-        return self.history_cache
+    def get_rendered_history(self) -> str:
+        """The chat history section of the prompt, already formatted"""
+        self._sync()
+        return self.rendered
     
     def add_new_exchange(self, question: str, answer: str):
-        """Add a new message pair to the cache"""
-        logger.info(f"[CACHE] Adding new exchange to cache. Current size: {len(self.history_cache)}")
+        """Add a new message pair to the cache, evicting the oldest pair at capacity"""
+        self._sync()
+        exchange = Exchange.create(question, answer)
+        self.store.append_exchange(exchange.question, exchange.answer, exchange.timestamp, keep=self.max_pairs)
         
-        # Create new exchange entries
-        new_exchanges = [
-            {
-                "role": "Madrus",
-                "content": question,
-                "timestamp": datetime.now().isoformat()
-            },
-            {
-                "role": "Shiro",
-                "content": answer,
-                "timestamp": datetime.now().isoformat()
-            }
-        ]
-        
-        # Remove oldest pair if we're at max capacity
-        if len(self.history_cache) >= (self.max_pairs * 2):  # Times 2 because each pair is 2 messages
-            self.history_cache = self.history_cache[2:]  # Remove oldest pair
-        
-        # Add new pair
-        self.history_cache.extend(new_exchanges)
-        logger.info(f"[CACHE] Added new exchange. New cache size: {len(self.history_cache)}")
+        # Our own write doesn't change data_version, so the local copy is updated in place
+        if len(self.exchanges) == self.exchanges.maxlen:
+            evicted = self.exchanges[0]
+            # The evicted exchange is always the first line(s) of the rendered text
+            self.rendered = self.rendered[len(evicted.rendered) + 1:]
+        self.exchanges.append(exchange)
+        self.rendered = f"{self.rendered}\n{exchange.rendered}" if self.rendered else exchange.rendered
+        logger.info(f"[CACHE] Added new exchange. Cache holds {len(self.exchanges)} exchanges")
 
 class ContextCache:
+    """Active context shared across DB module workers through the shared state store"""
+
     _instance = None
     
     def __new__(cls):
@@ -90,25 +124,43 @@ class ContextCache:
             cls._instance.context = None
             cls._instance.needs_refresh = True  # Initially true to force first load
             cls._instance.last_update = None
+            cls._instance.store = get_shared_state()
+            cls._instance.loaded_version = None
             logger.info("[CACHE] Context cache initialized")
         return cls._instance
     
+    def _sync(self):
+        version = self.store.data_version()
+        if version != self.loaded_version:
+            self.loaded_version = version
+            self.context = self.store.get("context")
+            self.needs_refresh = self.store.get("context_needs_refresh", True)
+            self.last_update = self.store.get("context_updated")
+    
     def get_context(self) -> Optional[str]:
         """Get cached context"""
+        self._sync()
         return self.context
     
     def update_context(self, new_context: str):
-        """Update cached context"""
+        """Update cached context for every worker"""
         self.context = new_context
-        self.last_update = datetime.now()
+        self.last_update = datetime.now().isoformat()
         self.needs_refresh = False
+        self.store.set_many({
+            "context": self.context,
+            "context_needs_refresh": False,
+            "context_updated": self.last_update
+        })
         logger.info(f"[CACHE] Context updated: {new_context[:50]}...")
     
     def mark_for_refresh(self):
         """Mark context as needing refresh"""
         self.needs_refresh = True
+        self.store.set_many({"context_needs_refresh": True})
         logger.info("[CACHE] Context marked for refresh")
     
     def should_refresh(self) -> bool:
         """Check if context needs refreshing"""
-        return self.needs_refresh
\ No newline at end of file
+        self._sync()
+        return self.needs_refresh
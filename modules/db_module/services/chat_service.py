@@ -1,5 +1,6 @@
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from modules.db_module.repositories.chat_repository import ChatRepository
+from modules.db_module.database import async_session_maker
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.utils.logging_config import setup_logger
 from src.config.service_config import CHAT_HISTORY_PAIRS
@@ -7,6 +8,21 @@ from datetime import datetime
 
 logger = setup_logger("db_service")
 
+async def write_exchange_batch(records: List[Dict]) -> bool:
+    """Write-behind sink: insert a batch of queued {question, answer, added_time, exchange_id} exchanges"""
+    rows = [
+        {
+            "question": record["question"],
+            "answer": record["answer"],
+            "added_time": datetime.fromisoformat(record["added_time"]),
+            # Records queued before exchange ids existed have none and can't be deduplicated
+            "exchange_id": record.get("exchange_id")
+        }
+        for record in records
+    ]
+    async with async_session_maker() as session:
+        return await ChatRepository(session).add_chat_exchanges(rows)
+
 class ChatService:
     def __init__(self, session: AsyncSession):
         self.repository = ChatRepository(session)
@@ -17,13 +33,10 @@ class ChatService:
         """Save a Q&A exchange to the database"""
         try:
             logger.debug(f"[SERVICE] Saving exchange - Q: {question[:50]}...")
-            success = await self.repository.add_chat_exchange(question, answer)
-            # Make sure to close the session after background task is done
-            await self.session.close()
-            return success
+            # The session belongs to the caller (get_db_session closes it), so it isn't closed here
+            return await self.repository.add_chat_exchange(question, answer)
         except Exception as e:
             logger.error(f"[SERVICE] Error in save_exchange: {e}")
-            await self.session.close()
             return False
     
     async def get_chat_history(self, limit: int = CHAT_HISTORY_PAIRS) -> List[Dict]:
@@ -39,6 +52,11 @@ class ChatService:
             logger.error(f"[SERVICE] Error fetching chat history: {e}")
             raise
     
-    async def save_token_usage(self, prompt_tokens: int, completion_tokens: int, total_tokens: int) -> bool:
+    def stream_history(self, limit: int, before: Optional[Tuple[datetime, int]] = None) -> AsyncIterator[Dict]:
+        """Stream one keyset page of exchanges, newest first"""
+        return self.repository.stream_exchanges(limit, before)
+    
+    async def save_token_usage(self, prompt_tokens: int, completion_tokens: int, total_tokens: int,
+                               usage_key: str = "default") -> bool:
         """Save token usage statistics"""
-        return await self.repository.save_api_usage(prompt_tokens, completion_tokens, total_tokens) 
\ No newline at end of file
+        return await self.repository.save_api_usage(prompt_tokens, completion_tokens, total_tokens, usage_key) 
\ No newline at end of file
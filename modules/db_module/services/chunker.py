@@ -0,0 +1,141 @@
+import asyncio
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from src.utils.logging_config import setup_logger
+
+logger = setup_logger("chunker")
+
+
+class TokenChunker:
+    """Splits texts into overlapping token windows.
+
+    Texts are tokenized in batches with a fast tokenizer, and each window is cut out of
+    the original text using the tokens' character offsets, so every text is tokenized once
+    and no window is decoded back from tokens. Items are (key, text) pairs; chunk ids are
+    "{key}:chunk{n}" and each chunk carries a "Title: {key} - " prefix for context.
+    """
+
+    def __init__(self, tokenizer_name: str = "voyageai/voyage-3", chunk_size: int = 512, chunk_overlap: int = 128):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.tokenizer_name = tokenizer_name
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self._tokenizer = None
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            # Imported here so worker processes and callers that never chunk skip the load
+            from transformers import AutoTokenizer
+            self._tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_name, use_fast=True)
+            if not self._tokenizer.is_fast:
+                raise ValueError(f"{self.tokenizer_name} has no fast tokenizer, offsets are unavailable")
+        return self._tokenizer
+
+    def _windows(self, key: str, text: str, offsets: Sequence[Tuple[int, int]]) -> List[Dict]:
+        chunks = []
+        step = self.chunk_size - self.chunk_overlap
+        for number, start in enumerate(range(0, len(offsets), step), start=1):
+            end = min(start + self.chunk_size, len(offsets))
+            content = text[offsets[start][0]:offsets[end - 1][1]]
+            chunks.append({"id": f"{key}:chunk{number}", "text": f"Title: {key} - {content}"})
+        return chunks
+
+    def chunk_batch(self, items: Sequence[Tuple[str, str]]) -> List[Tuple[str, List[Dict]]]:
+        """Chunk a batch of (key, text) items with a single tokenizer call"""
+        if not items:
+            return []
+        encoded = self.tokenizer(
+            [text for _, text in items],
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+        )
+        return [
+            (key, self._windows(key, text, offsets))
+            for (key, text), offsets in zip(items, encoded["offset_mapping"])
+        ]
+
+    def chunk_stream(self, items: Iterable[Tuple[str, str]], batch_size: int = 64,
+                     workers: int = 1) -> Iterator[Tuple[str, List[Dict]]]:
+        """Chunk a (possibly large, lazily produced) stream of items, yielding (key, chunks) in order.
+
+        With workers > 1, batches are tokenized in a process pool; only a couple of batches
+        per worker are in flight, so the stream is never materialized.
+        """
+        batches = _batched(items, batch_size)
+        if workers <= 1:
+            for batch in batches:
+                yield from self.chunk_batch(batch)
+            return
+
+        with self._pool(workers) as pool:
+            in_flight = deque()
+            for batch in batches:
+                in_flight.append(pool.submit(_chunk_in_worker, batch))
+                if len(in_flight) >= workers * 2:
+                    yield from in_flight.popleft().result()
+            while in_flight:
+                yield from in_flight.popleft().result()
+
+    async def chunk_stream_async(self, items: Iterable[Tuple[str, str]], batch_size: int = 64,
+                                 workers: int = 1) -> AsyncIterator[Tuple[str, List[Dict]]]:
+        """chunk_stream for async pipelines: tokenizing batches are awaited, never waited on,
+        so the event loop keeps serving while the pool (or a thread, with one worker) works."""
+        batches = _batched(items, batch_size)
+        if workers <= 1:
+            for batch in batches:
+                for item in await asyncio.to_thread(self.chunk_batch, batch):
+                    yield item
+            return
+
+        pool = self._pool(workers)
+        try:
+            in_flight = deque()
+            for batch in batches:
+                in_flight.append(asyncio.wrap_future(pool.submit(_chunk_in_worker, batch)))
+                if len(in_flight) >= workers * 2:
+                    for item in await in_flight.popleft():
+                        yield item
+            while in_flight:
+                for item in await in_flight.popleft():
+                    yield item
+        finally:
+            # Joining the worker processes blocks, so it happens off the loop
+            await asyncio.to_thread(pool.shutdown, wait=True, cancel_futures=True)
+
+    def _pool(self, workers: int) -> ProcessPoolExecutor:
+        # spawn rather than fork: the tokenizer's own thread pool doesn't survive a fork
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.tokenizer_name, self.chunk_size, self.chunk_overlap),
+        )
+
+
+def _batched(items: Iterable[Tuple[str, str]], batch_size: int) -> Iterator[List[Tuple[str, str]]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+_worker_chunker: Optional[TokenChunker] = None
+
+
+def _init_worker(tokenizer_name: str, chunk_size: int, chunk_overlap: int):
+    global _worker_chunker
+    _worker_chunker = TokenChunker(tokenizer_name, chunk_size, chunk_overlap)
+
+
+def _chunk_in_worker(batch: List[Tuple[str, str]]) -> List[Tuple[str, List[Dict]]]:
+    return _worker_chunker.chunk_batch(batch)
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.utils.logging_config import setup_logger
+
+logger = setup_logger("embedding_cache")
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class EmbeddingCache:
+    """Embedding cache keyed by (model, input_type, normalized text).
+
+    An in-process LRU sits in front of an append-only record file that is memory-mapped
+    as float32: each record is a 32-byte key digest followed by the vector. Records are
+    never rewritten, so the DB module's workers share one file: each appends with a single
+    O_APPEND write and picks up the others' records when it misses.
+    """
+
+    def __init__(self, cache_dir: str, dim: int, memory_entries: int = 2048, max_disk_entries: int = 100_000):
+        self.dim = dim
+        self.memory_entries = memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.record_dtype = np.dtype([("key", "S32"), ("vector", "<f4", (dim,))])
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, f"embeddings_{dim}.bin")
+
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._rows: Dict[bytes, int] = {}
+        self._records: Optional[np.memmap] = None
+        self._indexed_rows = 0
+        self._lock = threading.Lock()
+        self._disk_full_logged = False
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._refresh()
+        logger.info(f"[EMBED CACHE] Loaded {self._indexed_rows} cached embeddings from {self.path}")
+
+    @staticmethod
+    def make_key(model: str, input_type: str, text: str) -> bytes:
+        return hashlib.sha256(f"{model}\0{input_type}\0{normalize_text(text)}".encode("utf-8")).digest()
+
+    def _refresh(self):
+        """Map the record file again and index records appended since the last look"""
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return
+        total_rows = size // self.record_dtype.itemsize
+        if total_rows <= self._indexed_rows:
+            return
+        self._records = np.memmap(self.path, dtype=self.record_dtype, mode="r", shape=(total_rows,))
+        for row in range(self._indexed_rows, total_rows):
+            self._rows[bytes(self._records[row]["key"])] = row
+        self._indexed_rows = total_rows
+
+    def _remember(self, key: bytes, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _read_row(self, key: bytes) -> Optional[np.ndarray]:
+        row = self._rows.get(key)
+        if row is None:
+            # Another worker may have appended it since we last mapped the file
+            self._refresh()
+            row = self._rows.get(key)
+        if row is None:
+            return None
+        return np.array(self._records[row]["vector"], dtype=np.float32)
+
+    def get(self, model: str, input_type: str, text: str) -> Optional[np.ndarray]:
+        key = self.make_key(model, input_type, text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return vector
+
+            vector = self._read_row(key)
+            if vector is not None:
+                self._remember(key, vector)
+                self.disk_hits += 1
+                return vector
+
+            self.misses += 1
+            return None
+
+    def put(self, model: str, input_type: str, text: str, embedding: List[float]):
+        vector = np.asarray(embedding, dtype=np.float32)
+        if vector.shape != (self.dim,):
+            logger.warning(f"[EMBED CACHE] Not caching {vector.shape} embedding, expected ({self.dim},)")
+            return
+        key = self.make_key(model, input_type, text)
+        with self._lock:
+            self._remember(key, vector)
+            if key in self._rows:
+                return
+            if self._indexed_rows >= self.max_disk_entries:
+                if not self._disk_full_logged:
+                    logger.warning(f"[EMBED CACHE] Disk store full ({self.max_disk_entries} entries), caching in memory only")
+                    self._disk_full_logged = True
+                return
+
+            record = np.zeros(1, dtype=self.record_dtype)
+            record["key"] = key
+            record["vector"] = vector
+            try:
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+                try:
+                    os.write(fd, record.tobytes())
+                finally:
+                    os.close(fd)
+            except OSError as e:
+                logger.error(f"[EMBED CACHE] Failed to persist embedding: {e}")
+
+    def stats(self) -> Dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "pid": os.getpid(),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_entries": self._indexed_rows,
+        }
@@ -0,0 +1,234 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+from src.utils.logging_config import setup_logger
+from modules.db_module.services.bulk_indexer import BulkIndexer
+
+logger = setup_logger("incremental_indexer")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class IndexStateStore:
+    """SQLite record of what is in the vector index: a content hash per source record
+    and per chunk, so a refresh can tell which chunks changed or disappeared."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS records (record_id TEXT PRIMARY KEY, hash TEXT NOT NULL)")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks (chunk_id TEXT PRIMARY KEY, record_id TEXT NOT NULL, hash TEXT NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_chunks_record ON chunks (record_id)")
+        self._lock = threading.Lock()
+
+    def record_hash(self, record_id: str) -> Optional[str]:
+        with self._lock:
+            row = self.db.execute("SELECT hash FROM records WHERE record_id = ?", (record_id,)).fetchone()
+        return row[0] if row else None
+
+    def chunk_hashes(self, record_id: str) -> Dict[str, str]:
+        with self._lock:
+            return dict(self.db.execute("SELECT chunk_id, hash FROM chunks WHERE record_id = ?", (record_id,)))
+
+    def record_ids(self) -> Set[str]:
+        """Every record with state, including ones whose chunks were indexed by an interrupted run"""
+        with self._lock:
+            return {
+                record_id for (record_id,) in
+                self.db.execute("SELECT record_id FROM records UNION SELECT record_id FROM chunks")
+            }
+
+    def chunk_ids(self, record_ids: Sequence[str]) -> List[str]:
+        chunk_ids = []
+        with self._lock:
+            for record_id in record_ids:
+                chunk_ids.extend(
+                    chunk_id for (chunk_id,) in
+                    self.db.execute("SELECT chunk_id FROM chunks WHERE record_id = ?", (record_id,))
+                )
+        return chunk_ids
+
+    def save_chunks(self, chunks: Sequence[Tuple[str, str, str]]):
+        """Store (chunk_id, record_id, hash) for chunks that are now in the index"""
+        with self._lock:
+            self.db.executemany("INSERT OR REPLACE INTO chunks (chunk_id, record_id, hash) VALUES (?, ?, ?)", chunks)
+
+    def save_records(self, records: Sequence[Tuple[str, str]]):
+        with self._lock:
+            self.db.executemany("INSERT OR REPLACE INTO records (record_id, hash) VALUES (?, ?)", records)
+
+    def delete_chunks(self, chunk_ids: Sequence[str]):
+        with self._lock:
+            self.db.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(chunk_id,) for chunk_id in chunk_ids])
+
+    def delete_records(self, record_ids: Sequence[str]):
+        with self._lock:
+            self.db.execute("BEGIN")
+            self.db.executemany("DELETE FROM chunks WHERE record_id = ?", [(record_id,) for record_id in record_ids])
+            self.db.executemany("DELETE FROM records WHERE record_id = ?", [(record_id,) for record_id in record_ids])
+            self.db.execute("COMMIT")
+
+
+class IncrementalIndexer:
+    """Re-index a corpus touching only what changed since the last run.
+
+    Records are (record_id, text) pairs with unique, non-empty ids; records without an id
+    and repeats of an id already seen in the run are skipped and counted as
+    records_skipped. A record whose text hash is unchanged is skipped
+    without being chunked. Changed records are streamed through chunk_fn, which takes an
+    iterable of (record_id, text) and yields (record_id, chunks) in order, synchronously or
+    asynchronously (e.g. TokenChunker.chunk_stream_async), and only chunks whose
+    text hash differs are embedded and upserted, while chunk ids it no longer produces are
+    deleted from the backend. Records missing from the run have all their chunks deleted.
+
+    Chunk hashes are saved as each upsert batch lands and record hashes once a record is
+    fully indexed, so an interrupted run only redoes the work that didn't complete.
+    """
+
+    def __init__(self, embed_fn: Callable[[List[str]], List[List[float]]], backend,
+                 chunk_fn: Callable[[Iterable[Tuple[str, str]]],
+                                    Union[Iterable[Tuple[str, List[Dict]]], AsyncIterable[Tuple[str, List[Dict]]]]],
+                 state_path: str,
+                 version: str = "", **indexer_options):
+        self.embed_fn = embed_fn
+        self.backend = backend
+        self.chunk_fn = chunk_fn
+        self.state = IndexStateStore(state_path)
+        # Changing the version (e.g. the chunking parameters) invalidates every record hash
+        self.version = version
+        self.indexer_options = indexer_options
+
+        # Upsert callbacks arrive on worker threads while _plan runs on the event loop
+        self._lock = threading.Lock()
+        self._pending_chunks: Dict[str, Tuple[str, str]] = {}
+        # record_id -> [record hash, chunk ids not yet upserted, all chunks planned]
+        self._pending_records: Dict[str, list] = {}
+        self._stale_chunks: List[str] = []
+        self._deferred_records: List[Tuple[str, str]] = []
+        self._seen: Set[str] = set()
+        self._record_hashes: Dict[str, str] = {}
+        self.counts = {"records_unchanged": 0, "records_changed": 0, "records_skipped": 0, "chunks_unchanged": 0,
+                       "chunks_indexed": 0, "chunks_deleted": 0, "records_deleted": 0}
+
+    def _changed_records(self, records: Iterable[Tuple[str, str]]) -> Iterator[Tuple[str, str]]:
+        for record_id, text in records:
+            # Chunk ids derive from the record id, so a repeated id would overwrite (and then
+            # delete as stale) the chunks of the record that came first
+            if not record_id:
+                self.counts["records_skipped"] += 1
+                logger.error("[INDEXER] Skipping a record with no id")
+                continue
+            if record_id in self._seen:
+                self.counts["records_skipped"] += 1
+                logger.error(f"[INDEXER] Skipping duplicate record id {record_id!r}, only the first is indexed")
+                continue
+            self._seen.add(record_id)
+            record_hash = content_hash(f"{self.version}\0{text}")
+            if self.state.record_hash(record_id) == record_hash:
+                self.counts["records_unchanged"] += 1
+                continue
+            self.counts["records_changed"] += 1
+            self._record_hashes[record_id] = record_hash
+            yield record_id, text
+
+    async def _chunked(self, records: Iterable[Tuple[str, str]]) -> AsyncIterator[Tuple[str, List[Dict]]]:
+        chunked = self.chunk_fn(self._changed_records(records))
+        if hasattr(chunked, "__aiter__"):
+            async for item in chunked:
+                yield item
+        else:
+            for item in chunked:
+                yield item
+
+    async def _plan(self, records: Iterable[Tuple[str, str]]) -> AsyncIterator[Dict]:
+        """Yield the chunks that need embedding, queueing state updates and deletions on the way"""
+        async for record_id, chunks in self._chunked(records):
+            record_hash = self._record_hashes.pop(record_id)
+            stored = self.state.chunk_hashes(record_id)
+            pending_record = [record_hash, set(), False]
+            with self._lock:
+                self._pending_records[record_id] = pending_record
+            chunk_ids = set()
+            for chunk in chunks:
+                chunk_ids.add(chunk["id"])
+                chunk_hash = content_hash(chunk["text"])
+                if stored.get(chunk["id"]) == chunk_hash:
+                    self.counts["chunks_unchanged"] += 1
+                    continue
+                with self._lock:
+                    self._pending_chunks[chunk["id"]] = (record_id, chunk_hash)
+                    pending_record[1].add(chunk["id"])
+                yield chunk
+
+            stale = [chunk_id for chunk_id in stored if chunk_id not in chunk_ids]
+            with self._lock:
+                if stale:
+                    # The record hash may only be saved once its stale chunks are deleted too
+                    self._stale_chunks.extend(stale)
+                    self._deferred_records.append((record_id, record_hash))
+                    pending_record[0] = None
+                pending_record[2] = True
+                done = not pending_record[1]
+                if done:
+                    del self._pending_records[record_id]
+            if done and pending_record[0]:
+                self.state.save_records([(record_id, record_hash)])
+
+    def _on_indexed(self, chunk_ids: List[str]):
+        saved = []
+        completed = []
+        with self._lock:
+            for chunk_id in chunk_ids:
+                pending = self._pending_chunks.pop(chunk_id, None)
+                if pending is None:
+                    continue
+                record_id, chunk_hash = pending
+                saved.append((chunk_id, record_id, chunk_hash))
+                pending_record = self._pending_records.get(record_id)
+                if pending_record is None:
+                    continue
+                pending_record[1].discard(chunk_id)
+                if pending_record[2] and not pending_record[1]:
+                    del self._pending_records[record_id]
+                    if pending_record[0]:
+                        completed.append((record_id, pending_record[0]))
+        self.state.save_chunks(saved)
+        if completed:
+            self.state.save_records(completed)
+
+    async def run(self, records: Iterable[Tuple[str, str]]) -> Dict:
+        """Bring the index in line with records; returns what was done"""
+        start = time.perf_counter()
+        indexer = BulkIndexer(self.embed_fn, self.backend, on_indexed=self._on_indexed, **self.indexer_options)
+        summary = await indexer.run(self._plan(records))
+        self.counts["chunks_indexed"] = summary["indexed"]
+
+        # Chunks a changed record no longer produces
+        if self._stale_chunks:
+            await asyncio.to_thread(self.backend.delete, self._stale_chunks)
+            self.state.delete_chunks(self._stale_chunks)
+            self.state.save_records(self._deferred_records)
+            self.counts["chunks_deleted"] += len(self._stale_chunks)
+
+        # Records that are gone from the source entirely
+        vanished = sorted(self.state.record_ids() - self._seen)
+        if vanished:
+            chunk_ids = self.state.chunk_ids(vanished)
+            await asyncio.to_thread(self.backend.delete, chunk_ids)
+            self.state.delete_records(vanished)
+            self.counts["chunks_deleted"] += len(chunk_ids)
+            self.counts["records_deleted"] = len(vanished)
+
+        self.counts["duration"] = round(time.perf_counter() - start, 2)
+        logger.info(f"[INDEXER] Incremental refresh: {self.counts}")
+        return dict(self.counts)
@@ -0,0 +1,167 @@
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+from src.utils.logging_config import setup_logger
+
+logger = setup_logger("lexical_index")
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class LexicalIndex:
+    """On-disk BM25 inverted index in SQLite.
+
+    Postings are (term, doc, tf) rows in a WITHOUT ROWID table clustered by term, so a
+    query reads one contiguous range per term. Documents get a small integer id, and
+    corpus totals live in a meta row so scoring never scans the whole table. Like the
+    local vector index it takes the same (id, vector, metadata) items, indexing
+    metadata["text"], so it can sit next to any vector backend.
+
+    It only sees documents written after it was created, so documents already in the
+    vector backend are added once by a backfill (see needs_backfill / mark_backfilled).
+    """
+
+    # Bump to make the next indexing run backfill the whole corpus again
+    BACKFILL_VERSION = 1
+
+    def __init__(self, index_dir: str, k1: float = 1.2, b: float = 0.75, max_df_ratio: float = 0.5):
+        self.k1 = k1
+        self.b = b
+        # Terms in more than this share of documents (e.g. the "Titles" field label) carry
+        # almost no weight but have the longest postings, so they are skipped
+        self.max_df_ratio = max_df_ratio
+
+        os.makedirs(index_dir, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(index_dir, "lexical.db"), check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS docs (doc INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, length INTEGER NOT NULL, metadata TEXT)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, doc INTEGER NOT NULL, tf INTEGER NOT NULL, PRIMARY KEY (term, doc)) WITHOUT ROWID")
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings (doc)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self.db.execute("INSERT OR IGNORE INTO meta VALUES ('doc_count', 0), ('total_length', 0), ('backfill_version', 0)")
+        self._lock = threading.Lock()
+
+        logger.info(f"[LEXICAL] Loaded {self._meta('doc_count')} documents from {index_dir}")
+
+    def _meta(self, key: str) -> int:
+        return self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    def needs_backfill(self) -> bool:
+        with self._lock:
+            return self._meta("backfill_version") < self.BACKFILL_VERSION
+
+    def mark_backfilled(self):
+        with self._lock:
+            self.db.execute("UPDATE meta SET value = ? WHERE key = 'backfill_version'", (self.BACKFILL_VERSION,))
+
+    def _remove(self, doc_id: str) -> bool:
+        existing = self.db.execute("SELECT doc, length FROM docs WHERE id = ?", (doc_id,)).fetchone()
+        if not existing:
+            return False
+        doc, length = existing
+        self.db.execute("DELETE FROM postings WHERE doc = ?", (doc,))
+        self.db.execute("DELETE FROM docs WHERE doc = ?", (doc,))
+        self.db.execute("UPDATE meta SET value = value - 1 WHERE key = 'doc_count'")
+        self.db.execute("UPDATE meta SET value = value - ? WHERE key = 'total_length'", (length,))
+        return True
+
+    def upsert(self, items: Sequence[Tuple[str, Sequence[float], Dict]]):
+        """Insert or replace (id, vector, metadata) items; the vector is ignored"""
+        if not items:
+            return
+        with self._lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                for doc_id, _, metadata in items:
+                    metadata = metadata or {}
+                    terms = Counter(tokenize(metadata.get("text", "")))
+                    length = sum(terms.values())
+                    self._remove(doc_id)
+                    doc = self.db.execute(
+                        "INSERT INTO docs (id, length, metadata) VALUES (?, ?, ?)",
+                        (doc_id, length, json.dumps(metadata))
+                    ).lastrowid
+                    self.db.executemany(
+                        "INSERT INTO postings (term, doc, tf) VALUES (?, ?, ?)",
+                        [(term, doc, tf) for term, tf in terms.items()]
+                    )
+                    self.db.execute("UPDATE meta SET value = value + 1 WHERE key = 'doc_count'")
+                    self.db.execute("UPDATE meta SET value = value + ? WHERE key = 'total_length'", (length,))
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+
+    def delete(self, ids: Sequence[str]):
+        if not ids:
+            return
+        with self._lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                for doc_id in ids:
+                    self._remove(doc_id)
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+
+    def query(self, text: str, top_k: int = 5) -> List[Dict]:
+        """Return the top_k documents by BM25 score as {"id", "score", "metadata"} dicts"""
+        terms = set(tokenize(text))
+        if not terms:
+            return []
+        with self._lock:
+            doc_count = self._meta("doc_count")
+            if doc_count == 0:
+                return []
+            avg_length = self._meta("total_length") / doc_count or 1.0
+
+            frequencies = {
+                term: self.db.execute("SELECT COUNT(*) FROM postings WHERE term = ?", (term,)).fetchone()[0]
+                for term in terms
+            }
+            frequencies = {term: df for term, df in frequencies.items() if df}
+            selective = {term: df for term, df in frequencies.items() if df <= doc_count * self.max_df_ratio}
+            frequencies = selective or frequencies
+
+            scores: Dict[int, float] = {}
+            for term, df in frequencies.items():
+                idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+                for doc, tf, length in self.db.execute(
+                    "SELECT p.doc, p.tf, d.length FROM postings p JOIN docs d ON d.doc = p.doc WHERE p.term = ?", (term,)
+                ):
+                    norm = tf + self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[doc] = scores.get(doc, 0.0) + idf * tf * (self.k1 + 1) / norm
+
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+            if not best:
+                return []
+            placeholders = ",".join("?" * len(best))
+            records = {
+                doc: (doc_id, metadata)
+                for doc, doc_id, metadata in self.db.execute(
+                    f"SELECT doc, id, metadata FROM docs WHERE doc IN ({placeholders})", [doc for doc, _ in best]
+                )
+            }
+
+        return [
+            {"id": records[doc][0], "score": score, "metadata": json.loads(records[doc][1])}
+            for doc, score in best if doc in records
+        ]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "documents": self._meta("doc_count"),
+                "terms": self.db.execute("SELECT COUNT(DISTINCT term) FROM postings").fetchone()[0],
+            }
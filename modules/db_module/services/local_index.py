@@ -0,0 +1,289 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.utils.logging_config import setup_logger
+
+logger = setup_logger("local_index")
+
+
+class LocalVectorIndex:
+    """In-process cosine-similarity index: vectors in a memory-mapped float32 matrix,
+    ids and metadata in a SQLite side table.
+
+    Small corpora are searched brute force with one matrix product. Past ivf_threshold
+    vectors an IVF index (k-means centroids + inverted lists) is built and only the
+    nprobe closest lists are scanned. The IVF is built when the index is loaded and
+    rebuilt on a background thread once the corpus grows by a quarter or more than
+    ivf_rebuild_fraction of its vectors are rewritten in place; queries keep using the
+    previous lists until the new ones are swapped in. SQLite serializes writers across
+    the DB module's workers; readers reload when the stored generation changes.
+    """
+
+    GROWTH_ROWS = 1024
+
+    def __init__(self, index_dir: str, dim: int, ivf_threshold: int = 10_000, nprobe: int = 8,
+                 ivf_rebuild_fraction: float = 0.1):
+        self.dim = dim
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self.ivf_rebuild_fraction = ivf_rebuild_fraction
+
+        os.makedirs(index_dir, exist_ok=True)
+        self.vectors_path = os.path.join(index_dir, f"vectors_{dim}.f32")
+        self.db = sqlite3.connect(os.path.join(index_dir, "metadata.db"), check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS vectors (id TEXT PRIMARY KEY, row INTEGER UNIQUE NOT NULL, metadata TEXT)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self.db.execute("INSERT OR IGNORE INTO meta VALUES ('generation', 0), ('next_row', 0), ('updated_rows', 0)")
+
+        self._lock = threading.RLock()
+        self._generation = -1
+        self._matrix: Optional[np.ndarray] = None
+        self._live = np.zeros(0, dtype=bool)
+        self._count = 0
+        # Vectors overwritten in place so far (by any worker)
+        self._updated = 0
+        # IVF state: centroids, inverted lists of rows, and the row and update counts it was built at
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[np.ndarray] = []
+        self._ivf_rows = 0
+        self._ivf_updated = 0
+        self._ivf_thread: Optional[threading.Thread] = None
+
+        self._reload()
+        # Pay for the first clustering at load, not in the first query
+        self.wait_for_ivf()
+        logger.info(f"[LOCAL INDEX] Loaded {self._count} vectors from {index_dir}")
+
+    # --- storage -----------------------------------------------------------------
+
+    def _meta(self, key: str) -> int:
+        return self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    def _map_vectors(self, rows: int, writable: bool = False) -> Optional[np.memmap]:
+        if rows == 0:
+            return None
+        needed = rows * self.dim * 4
+        if writable and (not os.path.exists(self.vectors_path) or os.path.getsize(self.vectors_path) < needed):
+            # Grow in steps so appends don't remap the file every time
+            capacity = -(-rows // self.GROWTH_ROWS) * self.GROWTH_ROWS
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(capacity * self.dim * 4)
+        return np.memmap(self.vectors_path, dtype=np.float32, mode="r+" if writable else "r", shape=(rows, self.dim))
+
+    def _reload(self):
+        generation = self._meta("generation")
+        if generation == self._generation:
+            return
+        next_row = self._meta("next_row")
+        live = np.zeros(next_row, dtype=bool)
+        rows = [row for (row,) in self.db.execute("SELECT row FROM vectors")]
+        live[rows] = True
+
+        self._matrix = self._map_vectors(next_row)
+        self._live = live
+        self._count = len(rows)
+        self._updated = self._meta("updated_rows")
+        self._generation = generation
+        if self._ivf_stale():
+            self._start_ivf_build()
+
+    def upsert(self, items: Sequence[Tuple[str, Sequence[float], Dict]]):
+        """Insert or replace (id, vector, metadata) items"""
+        if not items:
+            return
+        vectors = np.asarray([vector for _, vector, _ in items], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+
+        with self._lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                next_row = self._meta("next_row")
+                assigned_rows: Dict[str, int] = {}
+                assignments = []
+                updated = 0
+                for (doc_id, _, metadata), vector in zip(items, vectors):
+                    row = assigned_rows.get(doc_id)
+                    if row is None:
+                        existing = self.db.execute("SELECT row FROM vectors WHERE id = ?", (doc_id,)).fetchone()
+                        if existing:
+                            row = existing[0]
+                            updated += 1
+                        else:
+                            row = next_row
+                            next_row += 1
+                        assigned_rows[doc_id] = row
+                    assignments.append((doc_id, row, json.dumps(metadata or {}), vector))
+
+                matrix = self._map_vectors(next_row, writable=True)
+                for _, row, _, vector in assignments:
+                    matrix[row] = vector
+                matrix.flush()
+                del matrix
+
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO vectors (id, row, metadata) VALUES (?, ?, ?)",
+                    [(doc_id, row, metadata) for doc_id, row, metadata, _ in assignments]
+                )
+                self.db.execute("UPDATE meta SET value = ? WHERE key = 'next_row'", (next_row,))
+                self.db.execute("UPDATE meta SET value = value + ? WHERE key = 'updated_rows'", (updated,))
+                self.db.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+            self._reload()
+
+    def delete(self, ids: Sequence[str]):
+        """Remove vectors by id; their rows are left as unused space in the matrix"""
+        if not ids:
+            return
+        with self._lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                self.db.executemany("DELETE FROM vectors WHERE id = ?", [(doc_id,) for doc_id in ids])
+                self.db.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+            self._reload()
+
+    # --- search ------------------------------------------------------------------
+
+    def _ivf_stale(self) -> bool:
+        if self._count < self.ivf_threshold:
+            return False
+        if self._centroids is None:
+            return True
+        grown = len(self._live) > self._ivf_rows * 1.25
+        # A vector rewritten in place stays in the list it was first assigned to
+        drifted = self._updated - self._ivf_updated > self._ivf_rows * self.ivf_rebuild_fraction
+        return grown or drifted
+
+    def _start_ivf_build(self):
+        if self._ivf_thread is not None and self._ivf_thread.is_alive():
+            return
+        self._ivf_thread = threading.Thread(
+            target=self._build_ivf,
+            args=(self._matrix, self._live.copy(), self._updated),
+            name="ivf-build",
+            daemon=True
+        )
+        self._ivf_thread.start()
+
+    def wait_for_ivf(self, timeout: Optional[float] = None):
+        """Block until a running IVF build has been swapped in"""
+        thread = self._ivf_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _build_ivf(self, matrix: np.ndarray, live: np.ndarray, updated: int,
+                   iterations: int = 10, sample_size: int = 20_000):
+        """k-means over (a sample of) the live vectors, then assign every row to its nearest centroid.
+
+        Runs on its own thread against a snapshot, so queries only wait for the swap.
+        """
+        try:
+            live_rows = np.flatnonzero(live)
+            nlist = max(1, int(np.sqrt(len(live_rows))))
+            rng = np.random.default_rng(0)
+            sample = matrix[rng.choice(live_rows, size=min(sample_size, len(live_rows)), replace=False)]
+
+            centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+            for _ in range(iterations):
+                assignment = np.argmax(sample @ centroids.T, axis=1)
+                for c in range(nlist):
+                    members = sample[assignment == c]
+                    if len(members):
+                        centroid = members.mean(axis=0)
+                        centroids[c] = centroid / (np.linalg.norm(centroid) or 1)
+
+            assignment = np.argmax(matrix[live_rows] @ centroids.T, axis=1)
+            lists = [live_rows[assignment == c] for c in range(nlist)]
+        except Exception as e:
+            logger.error(f"[LOCAL INDEX] IVF build failed, keeping the previous lists: {e}")
+            return
+
+        with self._lock:
+            self._centroids = centroids
+            self._lists = lists
+            self._ivf_rows = len(live)
+            self._ivf_updated = updated
+        logger.info(f"[LOCAL INDEX] Built IVF index: {nlist} lists over {len(live_rows)} vectors")
+
+    def _candidate_rows(self, query: np.ndarray) -> np.ndarray:
+        closest = np.argsort(self._centroids @ query)[::-1][:self.nprobe]
+        rows = np.concatenate([self._lists[c] for c in closest])
+        # Rows appended after the IVF build aren't in any list yet, scan them directly
+        tail = np.arange(self._ivf_rows, len(self._live))
+        rows = np.concatenate([rows, tail])
+        return rows[self._live[rows]]
+
+    def _top_k(self, rows: np.ndarray, scores: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        k = min(top_k, len(rows))
+        if k == 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(rows[i]), float(scores[i])) for i in best]
+
+    def query(self, vector: Sequence[float], top_k: int = 5) -> List[Dict]:
+        """Return the top_k most similar items as {"id", "score", "metadata"} dicts"""
+        return self.query_many([vector], top_k)[0]
+
+    def query_many(self, vectors: Sequence[Sequence[float]], top_k: int = 5) -> List[List[Dict]]:
+        """Search several queries at once; brute force scores them all in one matrix product"""
+        with self._lock:
+            self._reload()
+            if self._count == 0:
+                return [[] for _ in vectors]
+            queries = np.asarray(vectors, dtype=np.float32)
+            norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            queries = queries / np.where(norms == 0, 1, norms)
+
+            if self._centroids is None:
+                rows = np.flatnonzero(self._live)
+                scores = self._matrix[rows] @ queries.T
+                hits = [self._top_k(rows, scores[:, i], top_k) for i in range(len(queries))]
+            else:
+                hits = []
+                for query in queries:
+                    rows = self._candidate_rows(query)
+                    hits.append(self._top_k(rows, self._matrix[rows] @ query, top_k))
+
+            wanted = sorted({row for query_hits in hits for row, _ in query_hits})
+            records = {}
+            if wanted:
+                placeholders = ",".join("?" * len(wanted))
+                records = {
+                    row: (doc_id, metadata)
+                    for doc_id, row, metadata in self.db.execute(
+                        f"SELECT id, row, metadata FROM vectors WHERE row IN ({placeholders})", wanted
+                    )
+                }
+
+        results = []
+        for query_hits in hits:
+            matches = []
+            for row, score in query_hits:
+                if row in records:
+                    doc_id, metadata = records[row]
+                    matches.append({"id": doc_id, "score": score, "metadata": json.loads(metadata)})
+            results.append(matches)
+        return results
+
+    def stats(self) -> Dict:
+        return {
+            "backend": "local",
+            "vectors": self._count,
+            "rows": len(self._live),
+            "ivf_lists": len(self._lists) if self._centroids is not None else 0,
+            "ivf_building": self._ivf_thread is not None and self._ivf_thread.is_alive(),
+        }
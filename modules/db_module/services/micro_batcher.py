@@ -0,0 +1,108 @@
+import asyncio
+from typing import Awaitable, Callable, Generic, List, Optional, Set, Tuple, TypeVar
+
+from src.utils.logging_config import setup_logger
+
+logger = setup_logger("micro_batcher")
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    """Coalesces items submitted within a short window into one batch call.
+
+    The first submit opens a window of max_wait seconds (or until max_batch items
+    arrive); process_batch then gets every item in the window and must return one
+    result per item, in order. A failed batch, one that returns the wrong number of
+    results or one that is cancelled fails each of its callers.
+    """
+
+    def __init__(self, process_batch: Callable[[List[T]], Awaitable[List[R]]],
+                 max_batch: int = 32, max_wait: float = 0.005):
+        self.process_batch = process_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pending: List[Tuple[T, asyncio.Future]] = []
+        self._full: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        # Every window still waiting or running its batch, so stop() can settle them all
+        self._flushers: Set[asyncio.Task] = set()
+
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, item: T) -> R:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        if self._flusher is None or self._flusher.done():
+            self._open_window(asyncio.Event())
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+        return await future
+
+    def _open_window(self, full: asyncio.Event):
+        self._full = full
+        self._flusher = asyncio.create_task(self._flush_after_window(full))
+        self._flushers.add(self._flusher)
+        self._flusher.add_done_callback(self._flushers.discard)
+
+    async def _flush_after_window(self, full: asyncio.Event):
+        batch = None
+        try:
+            try:
+                await asyncio.wait_for(full.wait(), timeout=self.max_wait)
+            except asyncio.TimeoutError:
+                pass
+
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            if self._pending:
+                # Overflow starts the next window straight away
+                overflow = asyncio.Event()
+                overflow.set()
+                self._open_window(overflow)
+            else:
+                # This window is closed; a submit made while the batch runs must open a new one
+                self._flusher = None
+
+            self.batches += 1
+            self.items += len(batch)
+            results = await self.process_batch([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"process_batch returned {len(results)} results for {len(batch)} items")
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except asyncio.CancelledError:
+            if batch is None:
+                # Cancelled while the window was open: its items go down with it
+                batch, self._pending = self._pending, []
+                self._flusher = None
+            _fail(batch, RuntimeError("Batch was cancelled before it completed"))
+            raise
+        except Exception as e:
+            logger.error(f"[BATCH] Batch of {len(batch or [])} failed: {e}")
+            _fail(batch or [], e)
+
+    async def stop(self):
+        """Cancel open windows and running batches; every waiting caller gets an error"""
+        flushers = list(self._flushers)
+        for flusher in flushers:
+            flusher.cancel()
+        await asyncio.gather(*flushers, return_exceptions=True)
+        _fail(self._pending, RuntimeError("MicroBatcher stopped"))
+        self._pending = []
+        self._flusher = None
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+def _fail(batch: List[Tuple[T, asyncio.Future]], error: BaseException):
+    for _, future in batch:
+        if not future.done():
+            future.set_exception(error)
@@ -1,46 +1,151 @@
-import voyageai
+import asyncio
+import hashlib
+import math
+import re
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Sequence
 
-# Initialize VoyageAI client
-vc = voyageai.Client(api_key=VOYAGE_API_KEY)
+from src.utils.logging_config import setup_logger
+from src.config import api_keys
 
-# Function to rerank the retrieved documents based on the user query
-def rerank_results(query: str, retrieved_documents: List[dict], top_k: int = 5) -> List[dict]:
-    """
-    Function to rerank the retrieved documents based on relevance to the query.
-    
-    Args:
-        query (str): The user's search query.
-        retrieved_documents (List[dict]): A list of documents (chunks) retrieved from Pinecone.
-        top_k (int): The number of top results to return after reranking. Defaults to 5.
-        
-    Returns:
-        List[dict]: The top-k documents sorted by relevance.
+logger = setup_logger("reranker")
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def candidate_text(match: Dict) -> str:
+    return (match.get("metadata") or {}).get("text", "")
+
+
+class VoyageScorer:
+    """Cross-encoder relevance scores from Voyage AI's rerank endpoint"""
+
+    name = "voyage"
+
+    def __init__(self, model: str = "rerank-2", client=None):
+        import voyageai
+        self.model = model
+        self.client = client or voyageai.Client(api_key=api_keys.VOYAGE_API_KEY)
+
+    def score(self, query: str, texts: Sequence[str]) -> List[float]:
+        reranking = self.client.rerank(query, list(texts), model=self.model, truncation=True)
+        scores = [0.0] * len(texts)
+        for result in reranking.results:
+            scores[result.index] = result.relevance_score
+        return scores
+
+
+class LexicalScorer:
+    """BM25 over the candidate set itself: needs no model or network, so it is the fallback"""
+
+    name = "lexical"
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+    def score(self, query: str, texts: Sequence[str]) -> List[float]:
+        query_terms = set(TOKEN_PATTERN.findall(query.lower()))
+        documents = [Counter(TOKEN_PATTERN.findall(text.lower())) for text in texts]
+        if not query_terms or not documents:
+            return [0.0] * len(texts)
+        avg_length = sum(sum(doc.values()) for doc in documents) / len(documents) or 1.0
+        document_frequency = {term: sum(1 for doc in documents if term in doc) for term in query_terms}
+
+        scores = []
+        for doc in documents:
+            length = sum(doc.values())
+            score = 0.0
+            for term in query_terms:
+                tf = doc.get(term, 0)
+                if not tf:
+                    continue
+                idf = math.log(1 + (len(documents) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+                score += idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / avg_length))
+            scores.append(score)
+        return scores
+
+
+class RerankStage:
+    """Reorders over-fetched vector matches by query relevance.
+
+    The primary scorer runs in a thread under whatever is left of the query's latency
+    budget; if too little is left the candidates are returned in vector order, and if the
+    scorer fails or times out the fallback scorer is used. Primary scores are cached per
+    (query, candidate id set), so a repeated question skips the remote call.
     """
-    # Extract the text from each retrieved document (chunk)
-    documents = [doc['text'] for doc in retrieved_documents]
-
-    # Use VoyageAI's rerank model
-    reranking = vc.rerank(query, documents, model="rerank-2", top_k=top_k)
-    
-    # Format the reranked results to return the relevant chunks
-    reranked_results = []
-    for result in reranking.results:
-        reranked_results.append({
-            "document": result.document,
-            "relevance_score": result.relevance_score
-        })
-    
-    return reranked_results
-
-# Example: Search and rerank the top 3 most relevant documents
-def search_and_rerank(query: str):
-    # Step 1: Search your Pinecone index to retrieve the relevant chunks
-    retrieved_documents = pinecone_search(query)  # Function to search Pinecone, not shown here
-    
-    # Step 2: Rerank the retrieved documents based on relevance to the query
-    top_results = rerank_results(query, retrieved_documents, top_k=3)
-    
-    # Display the top 3 reranked results
-    for result in top_results:
-        print(f"Document: {result['document']}")
-        print(f"Relevance Score: {result['relevance_score']}")
+
+    def __init__(self, scorer, fallback=None, cache_entries: int = 512, min_time: float = 0.05):
+        self.scorer = scorer
+        self.fallback = fallback
+        self.cache_entries = cache_entries
+        self.min_time = min_time
+        self._cache: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+
+        self.counts = {"reranked": 0, "cache_hits": 0, "fallbacks": 0, "skipped": 0}
+
+    @staticmethod
+    def _cache_key(query: str, matches: Sequence[Dict]) -> str:
+        ids = "\0".join(sorted(match["id"] for match in matches))
+        return hashlib.sha256(f"{' '.join(query.lower().split())}\0{ids}".encode("utf-8")).hexdigest()
+
+    def _apply(self, matches: Sequence[Dict], scores: Dict[str, float], top_k: int) -> List[Dict]:
+        ranked = sorted(matches, key=lambda match: scores.get(match["id"], float("-inf")), reverse=True)
+        return [{**match, "rerank_score": scores.get(match["id"])} for match in ranked[:top_k]]
+
+    async def rerank(self, query: str, matches: List[Dict], top_k: int, deadline: Optional[float] = None) -> List[Dict]:
+        """Return the top_k matches by relevance; deadline is a time.perf_counter() value"""
+        if len(matches) <= 1:
+            return matches[:top_k]
+
+        key = self._cache_key(query, matches)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.counts["cache_hits"] += 1
+            return self._apply(matches, cached, top_k)
+
+        remaining = deadline - time.perf_counter() if deadline is not None else None
+        if remaining is not None and remaining < self.min_time:
+            self.counts["skipped"] += 1
+            logger.info(f"[RERANK] Skipped, only {remaining * 1000:.0f}ms of the budget left")
+            return matches[:top_k]
+
+        texts = [candidate_text(match) for match in matches]
+        try:
+            scores = await asyncio.wait_for(asyncio.to_thread(self.scorer.score, query, texts), timeout=remaining)
+        except Exception as e:
+            if self.fallback is None:
+                logger.error(f"[RERANK] {self.scorer.name} rerank failed: {e!r}")
+                return matches[:top_k]
+            logger.warning(f"[RERANK] {self.scorer.name} rerank failed ({e!r}), using {self.fallback.name}")
+            self.counts["fallbacks"] += 1
+            scores = self.fallback.score(query, texts)
+            return self._apply(matches, dict(zip((match["id"] for match in matches), scores)), top_k)
+
+        scores_by_id = dict(zip((match["id"] for match in matches), scores))
+        self._cache[key] = scores_by_id
+        while len(self._cache) > self.cache_entries:
+            self._cache.popitem(last=False)
+        self.counts["reranked"] += 1
+        return self._apply(matches, scores_by_id, top_k)
+
+    def stats(self) -> Dict:
+        return {
+            "scorer": self.scorer.name,
+            "fallback": self.fallback.name if self.fallback else None,
+            "cache_entries": len(self._cache),
+            **self.counts,
+        }
+
+
+def create_rerank_stage(name: str, model: str, cache_entries: int, min_time: float) -> Optional[RerankStage]:
+    """Build the rerank stage selected by RERANK_BACKEND ("voyage", "lexical" or "none")"""
+    if name == "none":
+        return None
+    if name == "voyage":
+        return RerankStage(VoyageScorer(model), fallback=LexicalScorer(), cache_entries=cache_entries, min_time=min_time)
+    if name == "lexical":
+        return RerankStage(LexicalScorer(), cache_entries=cache_entries, min_time=min_time)
+    raise ValueError(f"Unknown rerank backend: {name}")
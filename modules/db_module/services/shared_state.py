@@ -0,0 +1,105 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from src.utils.logging_config import setup_logger
+from src.config.service_config import SHARED_STATE_PATH
+
+logger = setup_logger("shared_state")
+
+
+class SharedStateStore:
+    """Small SQLite (WAL) store shared by every DB module worker process.
+
+    Holds the recent chat exchanges and a few key/value entries (the active context).
+    Each cache keeps its own in-memory copy and compares data_version() with the value
+    it last loaded at before reading it: SQLite's data_version pragma changes whenever
+    another connection commits, so the check costs one pragma and no table read, and a
+    process only reloads after another worker actually wrote something.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS exchanges "
+            "(id INTEGER PRIMARY KEY AUTOINCREMENT, question TEXT NOT NULL, answer TEXT NOT NULL, timestamp TEXT NOT NULL)"
+        )
+        self.db.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT)")
+        self._lock = threading.Lock()
+
+    def data_version(self) -> int:
+        """Changes whenever another process commits; this connection's own writes leave it as is"""
+        with self._lock:
+            return self.db.execute("PRAGMA data_version").fetchone()[0]
+
+    # --- chat exchanges ------------------------------------------------------------
+
+    def recent_exchanges(self, limit: int) -> List[Tuple[str, str, str]]:
+        """The last limit (question, answer, timestamp) rows, oldest first"""
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT question, answer, timestamp FROM exchanges ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return rows[::-1]
+
+    def append_exchange(self, question: str, answer: str, timestamp: str, keep: int):
+        """Add an exchange and trim the table to the newest keep rows"""
+        with self._lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                row_id = self.db.execute(
+                    "INSERT INTO exchanges (question, answer, timestamp) VALUES (?, ?, ?)", (question, answer, timestamp)
+                ).lastrowid
+                self.db.execute("DELETE FROM exchanges WHERE id <= ?", (row_id - keep,))
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+
+    def replace_exchanges(self, exchanges: List[Tuple[str, str, str]]):
+        with self._lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                self.db.execute("DELETE FROM exchanges")
+                self.db.executemany("INSERT INTO exchanges (question, answer, timestamp) VALUES (?, ?, ?)", exchanges)
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+
+    # --- key/value -----------------------------------------------------------------
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            row = self.db.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_many(self, values: Dict[str, object]):
+        with self._lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)",
+                    [(key, json.dumps(value)) for key, value in values.items()]
+                )
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+
+
+_shared_state: Optional[SharedStateStore] = None
+
+
+def get_shared_state() -> SharedStateStore:
+    """Per-process handle on the shared store at SHARED_STATE_PATH"""
+    global _shared_state
+    if _shared_state is None:
+        _shared_state = SharedStateStore(SHARED_STATE_PATH)
+        logger.info(f"[SHARED] Using shared state at {SHARED_STATE_PATH} (pid {os.getpid()})")
+    return _shared_state
@@ -0,0 +1,151 @@
+import asyncio
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Optional, Tuple
+
+from modules.db_module.repositories.chat_repository import ChatRepository
+from src.utils.logging_config import setup_logger
+from src.config.service_config import USAGE_PRICE_PER_1000_TOKENS
+
+logger = setup_logger("usage_service")
+
+FIELDS = ("requests", "prompt_tokens", "completion_tokens", "total_tokens")
+
+
+def _empty() -> Dict[str, int]:
+    return dict.fromkeys(FIELDS, 0)
+
+
+def _add(totals: Dict[str, int], values: Dict[str, int]):
+    for field in FIELDS:
+        totals[field] += values[field]
+
+
+def usage_cost(total_tokens: int) -> Decimal:
+    return Decimal(total_tokens) / 1000 * Decimal(str(USAGE_PRICE_PER_1000_TOKENS))
+
+
+class UsageAccountant:
+    """Running API usage totals, per day and per key, held in memory.
+
+    Every call is written as a raw chatgpt_api_usage row plus an increment of its
+    (day, key) rollup row in the same transaction, and the in-memory totals are bumped
+    once that commits, so reading them never touches the database. Each worker only sees
+    its own increments between reconciliations: reconcile() rebuilds the last few days
+    of rollups from the raw table (correcting drift from writers that bypass it) and
+    reloads the rollup table, which also brings in what the other workers recorded.
+    A worker's writes and reloads take turns, so a reload never drops or double-counts
+    a call recorded while it runs.
+    """
+
+    def __init__(self, session_maker, reconcile_days: int = 2, reconcile_interval: float = 60.0):
+        self.session_maker = session_maker
+        self.reconcile_days = reconcile_days
+        self.reconcile_interval = reconcile_interval
+
+        self._rollups: Dict[Tuple[date, str], Dict[str, int]] = {}
+        self._by_key: Dict[str, Dict[str, int]] = {}
+        self._totals = _empty()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.reconciled_at: Optional[datetime] = None
+
+    # --- in-memory totals ----------------------------------------------------------
+
+    def _apply(self, day: date, usage_key: str, values: Dict[str, int]):
+        _add(self._rollups.setdefault((day, usage_key), _empty()), values)
+        _add(self._by_key.setdefault(usage_key, _empty()), values)
+        _add(self._totals, values)
+
+    async def load(self):
+        """Replace the in-memory totals with the rollup table (one row per day and key)"""
+        # Read and swap under the lock record() holds from commit to apply, so every
+        # record lands either in the snapshot or on top of it, never in neither or both
+        async with self._lock:
+            async with self.session_maker() as session:
+                rows = await ChatRepository(session).get_usage_rollups()
+            self._rollups, self._by_key, self._totals = {}, {}, _empty()
+            for row in rows:
+                self._apply(row["day"], row["usage_key"], row)
+        logger.info(f"[USAGE] Loaded {len(rows)} rollup rows, {self._totals['total_tokens']} tokens in total")
+
+    async def reconcile(self):
+        since = datetime.utcnow().date() - timedelta(days=self.reconcile_days - 1)
+        async with self.session_maker() as session:
+            rebuilt = await ChatRepository(session).rebuild_usage_rollups(since)
+        await self.load()
+        self.reconciled_at = datetime.utcnow()
+        if rebuilt is None:
+            logger.info("[USAGE] Another worker is rebuilding the rollups, reloaded them only")
+        else:
+            logger.info(f"[USAGE] Rebuilt {rebuilt} rollup rows since {since}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.error(f"[USAGE] Reconciliation failed: {e}")
+
+    # --- lifecycle -----------------------------------------------------------------
+
+    async def start(self):
+        try:
+            await self.load()
+        except Exception as e:
+            logger.error(f"[USAGE] Initial load failed, totals start empty until the next reconciliation: {e}")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    # --- recording and reading -----------------------------------------------------
+
+    async def record(self, prompt_tokens: int, completion_tokens: int, total_tokens: int,
+                     usage_key: str = "default") -> bool:
+        values = {
+            "requests": 1,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": total_tokens,
+        }
+        async with self._lock:
+            async with self.session_maker() as session:
+                saved = await ChatRepository(session).save_api_usage(
+                    prompt_tokens, completion_tokens, total_tokens, usage_key
+                )
+            if not saved:
+                return False
+            self._apply(datetime.utcnow().date(), usage_key, values)
+        total = self._totals["total_tokens"]
+        logger.info(f"Total tokens used: {total}, Current cost: ${usage_cost(total)}")
+        return True
+
+    def totals(self, usage_key: Optional[str] = None) -> Dict[str, int]:
+        """All-time totals, overall or for one key"""
+        totals = self._totals if usage_key is None else self._by_key.get(usage_key, _empty())
+        return dict(totals)
+
+    def day_totals(self, day: date, usage_key: str = "default") -> Dict[str, int]:
+        return dict(self._rollups.get((day, usage_key), _empty()))
+
+    def summary(self) -> Dict:
+        today = datetime.utcnow().date()
+        today_totals = _empty()
+        for usage_key in self._by_key:
+            _add(today_totals, self._rollups.get((today, usage_key), _empty()))
+        return {
+            "total": {**self._totals, "cost": str(usage_cost(self._totals["total_tokens"]))},
+            "today": {**today_totals, "cost": str(usage_cost(today_totals["total_tokens"]))},
+            "by_key": {
+                usage_key: {**totals, "cost": str(usage_cost(totals["total_tokens"]))}
+                for usage_key, totals in self._by_key.items()
+            },
+            "reconciled_at": self.reconciled_at.isoformat() if self.reconciled_at else None,
+        }
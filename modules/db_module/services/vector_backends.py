@@ -0,0 +1,124 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence, Tuple
+
+from src.utils.logging_config import setup_logger
+from src.config import api_keys
+from src.config.service_config import (
+    EMBEDDING_DIM, VECTOR_INDEX_DIR, VECTOR_IVF_THRESHOLD, VECTOR_IVF_NPROBE,
+    VECTOR_IVF_REBUILD_FRACTION
+)
+from modules.db_module.services.local_index import LocalVectorIndex
+
+logger = setup_logger("vector_backends")
+
+
+class PineconeBackend:
+    """Remote Pinecone index behind the same query/upsert/delete interface as LocalVectorIndex"""
+
+    INDEX_NAME = "voyageai-pinecone-text"
+    UPSERT_BATCH_SIZE = 200
+
+    def __init__(self, index=None):
+        self.index = index or self._initialize_pinecone()
+        # Pinecone has no multi-query call, so a batch fans out over a few pooled connections
+        self.query_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="pinecone-query")
+
+    def _initialize_pinecone(self):
+        """Initialize Pinecone index"""
+        # Imported here so the local backend runs without the Pinecone client installed
+        from pinecone import Pinecone, ServerlessSpec
+
+        try:
+            pc = Pinecone(api_key=api_keys.PINECONE_API_KEY)
+
+            # First try to get the existing index
+            try:
+                logger.info(f"Attempting to connect to existing index: {self.INDEX_NAME}")
+                return pc.Index(self.INDEX_NAME)
+            except Exception as e:
+                logger.info(f"Index {self.INDEX_NAME} does not exist, creating new one")
+                # If index doesn't exist, create it
+                pc.create_index(
+                    name=self.INDEX_NAME,
+                    dimension=EMBEDDING_DIM,
+                    metric="cosine",
+                    spec=ServerlessSpec(
+                        cloud="aws",
+                        region="us-east-1"
+                    )
+                )
+                logger.info(f"Successfully created new index: {self.INDEX_NAME}")
+                return pc.Index(self.INDEX_NAME)
+
+        except Exception as e:
+            logger.error(f"Failed to initialize Pinecone: {e}")
+            raise
+
+    def query(self, vector: Sequence[float], top_k: int = 5) -> List[Dict]:
+        results = self.index.query(
+            vector=list(vector),
+            top_k=top_k,
+            include_metadata=True
+        )
+        return [
+            {"id": match.id, "score": match.score, "metadata": match.metadata or {}}
+            for match in results.matches
+        ]
+
+    def query_many(self, vectors: Sequence[Sequence[float]], top_k: int = 5) -> List[List[Dict]]:
+        return list(self.query_executor.map(lambda vector: self.query(vector, top_k), vectors))
+
+    def upsert(self, items: Sequence[Tuple[str, Sequence[float], Dict]]):
+        items = [(doc_id, list(vector), metadata) for doc_id, vector, metadata in items]
+        for i in range(0, len(items), self.UPSERT_BATCH_SIZE):
+            self.index.upsert(vectors=items[i:i + self.UPSERT_BATCH_SIZE])
+
+    def delete(self, ids: Sequence[str]):
+        ids = list(ids)
+        for i in range(0, len(ids), 1000):
+            self.index.delete(ids=ids[i:i + 1000])
+
+    def stats(self) -> Dict:
+        return {"backend": "pinecone", "index": self.INDEX_NAME}
+
+
+class MirroredBackend:
+    """Writes go to the primary backend and every mirror (e.g. the lexical index); reads use the primary"""
+
+    def __init__(self, primary, *mirrors):
+        self.primary = primary
+        self.mirrors = mirrors
+
+    def query(self, vector: Sequence[float], top_k: int = 5) -> List[Dict]:
+        return self.primary.query(vector, top_k)
+
+    def query_many(self, vectors: Sequence[Sequence[float]], top_k: int = 5) -> List[List[Dict]]:
+        return self.primary.query_many(vectors, top_k)
+
+    def upsert(self, items: Sequence[Tuple[str, Sequence[float], Dict]]):
+        self.primary.upsert(items)
+        for mirror in self.mirrors:
+            mirror.upsert(items)
+
+    def delete(self, ids: Sequence[str]):
+        self.primary.delete(ids)
+        for mirror in self.mirrors:
+            mirror.delete(ids)
+
+    def stats(self) -> Dict:
+        return self.primary.stats()
+
+
+def create_vector_backend(name: str):
+    """Build the vector backend selected by VECTOR_BACKEND"""
+    if name == "pinecone":
+        return PineconeBackend()
+    if name == "local":
+        return LocalVectorIndex(
+            VECTOR_INDEX_DIR,
+            dim=EMBEDDING_DIM,
+            ivf_threshold=VECTOR_IVF_THRESHOLD,
+            nprobe=VECTOR_IVF_NPROBE,
+            ivf_rebuild_fraction=VECTOR_IVF_REBUILD_FRACTION
+        )
+    raise ValueError(f"Unknown vector backend: {name}")
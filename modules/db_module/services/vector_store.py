@@ -1,123 +1,171 @@
+import asyncio
+import time
 import voyageai
-from pinecone import Pinecone, ServerlessSpec, Index
-from typing import List, Dict
-import itertools
+from typing import List, Dict, Optional, Tuple, Iterable, AsyncIterable, Union
 from src.utils.logging_config import setup_logger
 from src.config import api_keys
+from src.config.service_config import (
+    EMBEDDING_MODEL, EMBEDDING_DIM, EMBEDDING_CACHE_DIR,
+    EMBEDDING_CACHE_MEMORY_ENTRIES, EMBEDDING_CACHE_MAX_DISK_ENTRIES, VECTOR_BACKEND,
+    VECTOR_QUERY_BATCH_SIZE, VECTOR_QUERY_BATCH_WAIT,
+    INDEX_EMBED_BATCH_SIZE, INDEX_UPSERT_BATCH_SIZE, INDEX_EMBED_WORKERS, INDEX_UPSERT_WORKERS,
+    RERANK_BACKEND, RERANK_MODEL, RERANK_OVERFETCH, RERANK_CACHE_ENTRIES, VECTOR_QUERY_BUDGET, RERANK_MIN_TIME,
+    HYBRID_SEARCH, LEXICAL_INDEX_DIR, HYBRID_RRF_K
+)
+from modules.db_module.services.embedding_cache import EmbeddingCache
+from modules.db_module.services.vector_backends import MirroredBackend, create_vector_backend
+from modules.db_module.services.lexical_index import LexicalIndex
+from modules.db_module.services.micro_batcher import MicroBatcher
+from modules.db_module.services.bulk_indexer import BulkIndexer
+from modules.db_module.services.reranker import RerankStage, create_rerank_stage
 
 logger = setup_logger("db_module")
 
+def reciprocal_rank_fusion(rankings: List[List[Dict]], k: int = HYBRID_RRF_K) -> List[Dict]:
+    """Merge ranked match lists: each match scores sum(1 / (k + rank)) over the lists it appears in.
+
+    The vector similarity stays in "score" (None for lexical-only matches) and the fused
+    value goes in "fusion_score".
+    """
+    fused: Dict[str, Dict] = {}
+    for ranking_index, ranking in enumerate(rankings):
+        for rank, match in enumerate(ranking, start=1):
+            entry = fused.setdefault(match["id"], {
+                **match,
+                "score": match["score"] if ranking_index == 0 else None,
+                "fusion_score": 0.0
+            })
+            entry["fusion_score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda match: match["fusion_score"], reverse=True)
+
 class VectorStoreService:
-    def __init__(self, index: Index = None):
-        """Initialize VectorStore with optional existing index"""
-        self.index = index or self._initialize_pinecone()
+    def __init__(self, backend=None, embedding_cache: EmbeddingCache = None,
+                 reranker: Optional[RerankStage] = None, lexical_index: Optional[LexicalIndex] = None):
+        """Initialize VectorStore with an optional backend (defaults to VECTOR_BACKEND)"""
+        self.backend = backend or create_vector_backend(VECTOR_BACKEND)
+        logger.info(f"Vector store using {self.backend.stats()['backend']} backend")
         self.voyage_client = voyageai.Client(api_key=api_keys.VOYAGE_API_KEY)
+        self.embedding_cache = embedding_cache or EmbeddingCache(
+            EMBEDDING_CACHE_DIR,
+            dim=EMBEDDING_DIM,
+            memory_entries=EMBEDDING_CACHE_MEMORY_ENTRIES,
+            max_disk_entries=EMBEDDING_CACHE_MAX_DISK_ENTRIES
+        )
+        self.query_batcher = MicroBatcher(
+            self._query_batch,
+            max_batch=VECTOR_QUERY_BATCH_SIZE,
+            max_wait=VECTOR_QUERY_BATCH_WAIT
+        )
+        # Exact titles and ids are matched by a BM25 index kept alongside the vectors
+        self.lexical_index = lexical_index or (LexicalIndex(LEXICAL_INDEX_DIR) if HYBRID_SEARCH else None)
+        self.index_backend = MirroredBackend(self.backend, self.lexical_index) if self.lexical_index else self.backend
+        self.reranker = reranker or create_rerank_stage(
+            RERANK_BACKEND,
+            RERANK_MODEL,
+            cache_entries=RERANK_CACHE_ENTRIES,
+            min_time=RERANK_MIN_TIME
+        )
         
-    def _initialize_pinecone(self) -> Index:
-        """Initialize Pinecone index"""
-        try:
-            pc = Pinecone(api_key=api_keys.PINECONE_API_KEY)
-            index_name = "voyageai-pinecone-text"
-            
-            # First try to get the existing index
-            try:
-                logger.info(f"Attempting to connect to existing index: {index_name}")
-                return pc.Index(index_name)
-            except Exception as e:
-                logger.info(f"Index {index_name} does not exist, creating new one")
-                # If index doesn't exist, create it
-                pc.create_index(
-                    name=index_name,
-                    dimension=1024,
-                    metric="cosine",
-                    spec=ServerlessSpec(
-                        cloud="aws",
-                        region="us-east-1"
-                    )
-                )
-                logger.info(f"Successfully created new index: {index_name}")
-                return pc.Index(index_name)
-                
-        except Exception as e:
-            logger.error(f"Failed to initialize Pinecone: {e}")
-            raise
+    async def query(self, query_text: str, limit: int = 5, budget: Optional[float] = None) -> List[Dict]:
+        """Query the vector store and return relevant results.
 
-    async def query(self, query_text: str, limit: int = 5) -> List[Dict]:
-        """Query the vector store and return relevant results"""
+        Vector and BM25 candidates are fetched concurrently and merged by reciprocal-rank
+        fusion. With a reranker, limit * RERANK_OVERFETCH candidates are fetched and reranked
+        within what is left of the latency budget (seconds, default VECTOR_QUERY_BUDGET).
+        """
         try:
-            # Generate embedding for query
-            query_embedding = self.voyage_client.embed(
-                texts=[query_text],
-                model='voyage-3',
-                input_type='document'
-            ).embeddings[0]
-            
-            # Query Pinecone
-            results = self.index.query(
-                vector=query_embedding,
-                top_k=limit,
-                include_metadata=True
-            )
+            deadline = time.perf_counter() + (budget if budget is not None else VECTOR_QUERY_BUDGET)
+            fetch_limit = limit * RERANK_OVERFETCH if self.reranker else limit
+            # Concurrent queries are coalesced into one embedding call and one search
+            vector_search = self.query_batcher.submit((query_text, fetch_limit))
+            if self.lexical_index:
+                vector_matches, lexical_matches = await asyncio.gather(
+                    vector_search,
+                    asyncio.to_thread(self.lexical_index.query, query_text, fetch_limit)
+                )
+                matches = reciprocal_rank_fusion([vector_matches, lexical_matches])[:fetch_limit]
+            else:
+                matches = await vector_search
             
-            # Rerank results if available
-            if hasattr(self, 'rerank_results'):
-                return await self.rerank_results(query_text, results.matches)
+            if self.reranker:
+                return await self.reranker.rerank(query_text, matches, limit, deadline=deadline)
                 
-            return results.matches
+            return matches
             
         except Exception as e:
             logger.error(f"Error querying vector store: {e}")
             return []
 
+    async def _query_batch(self, items: List[Tuple[str, int]]) -> List[List[Dict]]:
+        """Embed and search a batch of (query_text, limit) items off the event loop"""
+        embeddings = await self._embed_queries([query_text for query_text, _ in items])
+        top_k = max(limit for _, limit in items)
+        results = await asyncio.to_thread(self.backend.query_many, embeddings, top_k)
+        if len(items) > 1:
+            logger.info(f"[VECTOR] Served {len(items)} queries with one batched search")
+        return [matches[:limit] for matches, (_, limit) in zip(results, items)]
+
+    async def _embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed queries, reusing cached embeddings and sending only the misses to Voyage in one call"""
+        embeddings: List[Optional[List[float]]] = []
+        missing: Dict[str, List[int]] = {}
+        for i, text in enumerate(texts):
+            cached = self.embedding_cache.get(EMBEDDING_MODEL, 'query', text)
+            embeddings.append(cached.tolist() if cached is not None else None)
+            if cached is None:
+                missing.setdefault(text, []).append(i)
+        
+        if missing:
+            # Queries use input_type='query'; documents are embedded with 'document'
+            response = await asyncio.to_thread(
+                self.voyage_client.embed,
+                texts=list(missing),
+                model=EMBEDDING_MODEL,
+                input_type='query'
+            )
+            for (text, positions), embedding in zip(missing.items(), response.embeddings):
+                self.embedding_cache.put(EMBEDDING_MODEL, 'query', text, embedding)
+                for i in positions:
+                    embeddings[i] = embedding
+        return embeddings
+
     async def index_documents(self, documents: List[Dict]) -> bool:
-        """Index new documents in batches"""
+        """Index new documents through the streaming embed/upsert pipeline"""
         try:
-            # Generate embeddings
-            embeddings = self._generate_embeddings(documents)
-            
-            # Prepare vectors for indexing
-            vectors = [
-                (doc["id"], embedding, {"text": doc["text"]}) 
-                for doc, embedding in zip(documents, embeddings)
-            ]
-            
-            # Index in batches
-            for batch in self._create_batches(vectors, 200):
-                self.index.upsert(vectors=batch)
-                
+            await self.index_stream(documents)
             return True
             
         except Exception as e:
             logger.error(f"Error indexing documents: {e}")
             return False
 
-    def _generate_embeddings(self, documents: List[Dict]) -> List:
-        """Generate embeddings for documents using Voyage AI"""
-        try:
-            batch_size = 128
-            all_embeddings = []
-            
-            for i in range(0, len(documents), batch_size):
-                batch = documents[i:i + batch_size]
-                texts = [doc["text"] for doc in batch]
-                
-                embeddings = self.voyage_client.embed(
-                    texts=texts,
-                    model='voyage-3',
-                    input_type='document',
-                    truncation=True
-                ).embeddings
-                
-                all_embeddings.extend(embeddings)
-                
-            return all_embeddings
-            
-        except Exception as e:
-            logger.error(f"Error generating embeddings: {e}")
-            raise
+    async def index_stream(self, documents: Union[Iterable[Dict], AsyncIterable[Dict]],
+                           checkpoint_path: Optional[str] = None) -> Dict:
+        """Index a (possibly very large) stream of {"id", "text"} documents.
+
+        Embedding and upserting overlap across concurrent workers and only a few batches
+        are held in memory; with a checkpoint path an interrupted run resumes where it stopped.
+        """
+        indexer = BulkIndexer(
+            self.embed_documents,
+            self.index_backend,
+            checkpoint_path=checkpoint_path,
+            embed_batch_size=INDEX_EMBED_BATCH_SIZE,
+            upsert_batch_size=INDEX_UPSERT_BATCH_SIZE,
+            embed_workers=INDEX_EMBED_WORKERS,
+            upsert_workers=INDEX_UPSERT_WORKERS
+        )
+        return await indexer.run(documents)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch of document texts with Voyage AI (blocking)"""
+        return self.voyage_client.embed(
+            texts=texts,
+            model=EMBEDDING_MODEL,
+            input_type='document',
+            truncation=True
+        ).embeddings
 
-    @staticmethod
-    def _create_batches(items: List, batch_size: int):
-        """Create batches of specified size from list"""
-        for i in range(0, len(items), batch_size):
-            yield items[i:i + batch_size] 
\ No newline at end of file
+    async def close(self):
+        """Fail any queries still waiting on a batch; call on shutdown"""
+        await self.query_batcher.stop()
@@ -0,0 +1,253 @@
+import asyncio
+import glob
+import json
+import os
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from src.utils.logging_config import setup_logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: the DB module runs a single worker there
+    fcntl = None
+
+logger = setup_logger("write_behind")
+
+
+class WriteBehindLog:
+    """Durable write-behind queue: records are appended (and fsynced) to a per-process WAL
+    file, and a background flusher tails that file, handing batches to write_batch.
+
+    The request path only pays for the local append. The backlog lives on disk, so a slow
+    or unavailable database grows the file rather than memory, and the flusher catches
+    up in full batches once it recovers. The flushed offset is kept in a sidecar file
+    after every successful batch. A WAL left behind by a dead worker (its lock is free)
+    is replayed from that offset at startup. Delivery is at-least-once: a crash between
+    a batch commit and the offset update replays that batch, so write_batch should
+    ignore records it has already written (chat exchanges carry an exchange_id for this).
+    """
+
+    def __init__(self, name: str, wal_dir: str, write_batch: Callable[[List[Dict]], Awaitable[bool]],
+                 batch_size: int = 50, flush_interval: float = 1.0, backlog_warning: int = 1000):
+        self.name = name
+        self.wal_dir = wal_dir
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.backlog_warning = backlog_warning
+
+        os.makedirs(wal_dir, exist_ok=True)
+        self.path = os.path.join(wal_dir, f"{name}-{os.getpid()}.wal")
+        self._file = None
+        self._lock = threading.Lock()
+        self._offset = 0
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._flusher: Optional[asyncio.Task] = None
+
+        self.appended = 0
+        self.flushed = 0
+        self.batches = 0
+        self.failures = 0
+        self._backlog_warned = False
+
+    # --- files ---------------------------------------------------------------------
+
+    @staticmethod
+    def _offset_path(path: str) -> str:
+        return f"{path}.offset"
+
+    @classmethod
+    def _read_offset(cls, path: str) -> int:
+        try:
+            with open(cls._offset_path(path), "r") as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    @classmethod
+    def _write_offset(cls, path: str, offset: int):
+        tmp_path = f"{cls._offset_path(path)}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(str(offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, cls._offset_path(path))
+
+    @staticmethod
+    def _read_records(path: str, offset: int, limit: int) -> Tuple[List[Dict], int]:
+        """Read up to limit complete lines from offset; a half-written last line is left for later"""
+        records = []
+        with open(path, "rb") as f:
+            f.seek(offset)
+            while len(records) < limit:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                if line.strip():
+                    records.append(json.loads(line))
+        return records, offset
+
+    def _append(self, line: bytes):
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.appended += 1
+
+    def _commit_offset(self, offset: int):
+        with self._lock:
+            if offset == self._file.tell():
+                # Fully drained: start the file over instead of letting it grow forever
+                self._file.truncate(0)
+                self._file.seek(0)
+                offset = 0
+            self._offset = offset
+            self._write_offset(self.path, offset)
+
+    # --- lifecycle -----------------------------------------------------------------
+
+    async def start(self):
+        self._file = open(self.path, "ab")
+        if fcntl:
+            # Held for the life of the process; a WAL whose lock can be taken is an orphan
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._offset = self._read_offset(self.path)
+        self._flusher = asyncio.create_task(self._run())
+        logger.info(f"[WRITE BEHIND] {self.name}: logging to {self.path}")
+
+    async def stop(self, timeout: float = 10.0):
+        """Flush what is left (within timeout) and stop; anything unflushed stays in the WAL"""
+        self._closing = True
+        self._wakeup.set()
+        if self._flusher:
+            try:
+                await asyncio.wait_for(self._flusher, timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"[WRITE BEHIND] {self.name}: stopped with {self.backlog} records left in the WAL")
+        if self._file:
+            self._file.close()
+
+    async def submit(self, record: Dict):
+        """Durably queue one record; returns once it is fsynced to the local WAL"""
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        await asyncio.to_thread(self._append, line)
+        if self.backlog >= self.batch_size:
+            self._wakeup.set()
+        if self.backlog >= self.backlog_warning and not self._backlog_warned:
+            logger.warning(f"[WRITE BEHIND] {self.name}: {self.backlog} records waiting for the database")
+            self._backlog_warned = True
+
+    @property
+    def backlog(self) -> int:
+        # Records inherited from a previous process with our pid were never counted as appended
+        return max(0, self.appended - self.flushed)
+
+    # --- flushing ------------------------------------------------------------------
+
+    async def _write_with_retry(self, records: List[Dict]) -> bool:
+        delay = 1.0
+        while True:
+            try:
+                if await self.write_batch(records):
+                    return True
+            except Exception as e:
+                logger.error(f"[WRITE BEHIND] {self.name}: batch of {len(records)} failed: {e}")
+            self.failures += 1
+            if self._closing:
+                return False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    async def _replay_orphans(self):
+        replay_lock = None
+        if fcntl:
+            # Scan under a directory-wide lock so two starting workers never replay the same orphan
+            replay_lock = open(os.path.join(self.wal_dir, f"{self.name}.replay.lock"), "a")
+            try:
+                fcntl.flock(replay_lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                replay_lock.close()
+                logger.info(f"[WRITE BEHIND] {self.name}: another worker is replaying orphaned WALs")
+                return
+        try:
+            for path in glob.glob(os.path.join(self.wal_dir, f"{self.name}-*.wal")):
+                if path != self.path:
+                    await self._replay_orphan(path)
+        finally:
+            if replay_lock:
+                replay_lock.close()
+
+    async def _replay_orphan(self, path: str):
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            if fcntl:
+                try:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return  # Another live worker owns it
+            offset = self._read_offset(path)
+            replayed = 0
+            while True:
+                records, next_offset = await asyncio.to_thread(self._read_records, path, offset, self.batch_size)
+                if not records:
+                    break
+                if not await self._write_with_retry(records):
+                    return
+                offset = next_offset
+                self._write_offset(path, offset)
+                replayed += len(records)
+            os.remove(path)
+            if os.path.exists(self._offset_path(path)):
+                os.remove(self._offset_path(path))
+        logger.info(f"[WRITE BEHIND] {self.name}: replayed {replayed} records from orphaned {path}")
+
+    async def _flush_available(self):
+        while True:
+            records, next_offset = await asyncio.to_thread(self._read_records, self.path, self._offset, self.batch_size)
+            if not records:
+                return
+            start = time.perf_counter()
+            if not await self._write_with_retry(records):
+                return
+            await asyncio.to_thread(self._commit_offset, next_offset)
+            self.flushed += len(records)
+            self.batches += 1
+            if self.backlog < self.backlog_warning:
+                self._backlog_warned = False
+            logger.info(f"[WRITE BEHIND] {self.name}: flushed {len(records)} records in {time.perf_counter() - start:.3f}s")
+
+    async def _run(self):
+        try:
+            await self._replay_orphans()
+        except Exception as e:
+            logger.error(f"[WRITE BEHIND] {self.name}: orphan replay failed: {e}")
+        # Records left in our own WAL (pid reuse after a crash) are picked up by the first flush
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self._flush_available()
+            except Exception as e:
+                logger.error(f"[WRITE BEHIND] {self.name}: flush failed: {e}")
+            if self._closing:
+                return
+
+    def stats(self) -> Dict:
+        return {
+            "pid": os.getpid(),
+            "backlog": self.backlog,
+            "appended": self.appended,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "failures": self.failures,
+        }
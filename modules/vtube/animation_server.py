@@ -112,8 +112,7 @@ def play_animation():
         log_safe_response = {
             'text': ai_response.get('text', ''),
             'success': ai_response.get('success', False),
-            # Indicate audio presence without logging the data
-            'audio': '<audio_data_present>' if 'audio' in ai_response else None
+            'audio_id': ai_response.get('audio_id')
         }
         
         logger.info(f"Received animation request - text: {text}, ai_response: {log_safe_response}, context: {context}")
@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from modules.db_module.services.micro_batcher import MicroBatcher
+from src.config import api_keys
+from src.config.service_config import (
+    ANILIST_CACHE_TTL, ANILIST_CACHE_ENTRIES, ANILIST_BATCH_SIZE, ANILIST_BATCH_WAIT,
+    ANILIST_RATE_LIMIT_RESERVE, ANILIST_MAX_RETRIES
+)
+from src.services.http_pool import http_pool
+from src.utils.logging_config import setup_logger
+
+logger = setup_logger("anilist_client")
+
+VARIABLE_PATTERN = re.compile(r"\$(\w+)")
+
+
+class AniListError(Exception):
+    """GraphQL errors returned by AniList"""
+
+    def __init__(self, errors: List[Dict]):
+        self.errors = errors
+        super().__init__("; ".join(error.get("message", str(error)) for error in errors))
+
+
+@dataclass
+class GraphQLField:
+    """One top-level query field, e.g. 'Page(page: $page) { ... }', with its variables.
+
+    types declares each variable's GraphQL type ({"page": "Int"}), which is what lets
+    fields from different callers be merged into one aliased query.
+    """
+    body: str
+    variables: Dict[str, Any] = field(default_factory=dict)
+    types: Dict[str, str] = field(default_factory=dict)
+
+    def cache_key(self) -> str:
+        text = f"{' '.join(self.body.split())}\0{json.dumps(self.variables, sort_keys=True)}"
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def build_batch_query(fields: List[GraphQLField]) -> Tuple[str, Dict[str, Any]]:
+    """Merge fields into one query, aliased q0, q1, ... with their variables prefixed to match"""
+    declarations, selections, variables = [], [], {}
+    for index, query_field in enumerate(fields):
+        alias = f"q{index}"
+        for name, graphql_type in query_field.types.items():
+            declarations.append(f"${alias}_{name}: {graphql_type}")
+            variables[f"{alias}_{name}"] = query_field.variables.get(name)
+        body = VARIABLE_PATTERN.sub(lambda match: f"${alias}_{match.group(1)}", query_field.body)
+        selections.append(f"{alias}: {body}")
+    header = f"query ({', '.join(declarations)})" if declarations else "query"
+    return f"{header} {{ {' '.join(selections)} }}", variables
+
+
+class AniListClient:
+    """Async AniList GraphQL client on the shared http_pool connection pool.
+
+    Query fields go through fetch(): results are cached for cache_ttl seconds, keyed by
+    the field and its variables, and fields fetched within batch_wait of each other are
+    sent as one aliased request. mutate() sends an authenticated mutation and clears the
+    cache, so a list read after a progress change is never the pre-change copy. The
+    X-RateLimit-Remaining / Retry-After headers are tracked, and requests wait for the
+    window to reset rather than run into (or keep hitting) a 429.
+    """
+
+    def __init__(self, target: str = "anilist", token: Optional[str] = None,
+                 cache_ttl: float = ANILIST_CACHE_TTL, cache_entries: int = ANILIST_CACHE_ENTRIES,
+                 batch_size: int = ANILIST_BATCH_SIZE, batch_wait: float = ANILIST_BATCH_WAIT,
+                 rate_limit_reserve: int = ANILIST_RATE_LIMIT_RESERVE, max_retries: int = ANILIST_MAX_RETRIES):
+        self.target = target
+        self.token = token
+        self.cache_ttl = cache_ttl
+        self.cache_entries = cache_entries
+        self.rate_limit_reserve = rate_limit_reserve
+        self.max_retries = max_retries
+
+        self._cache: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        # Bumped by every invalidation; a query that started before one doesn't cache its result
+        self._generation = 0
+        self._batcher = MicroBatcher(self._send_batch, max_batch=batch_size, max_wait=batch_wait)
+
+        self._remaining: Optional[int] = None
+        self._reset_at = 0.0
+        self.counts = {"requests": 0, "cache_hits": 0, "throttled": 0, "rate_limited": 0}
+
+    # --- transport -----------------------------------------------------------------
+
+    def _update_limits(self, headers):
+        remaining = headers.get("X-RateLimit-Remaining")
+        if remaining is not None:
+            self._remaining = int(remaining)
+        reset = headers.get("X-RateLimit-Reset")
+        if reset is not None:
+            self._reset_at = float(reset)
+        elif self._remaining is not None and self._remaining <= self.rate_limit_reserve:
+            # AniList's window is one minute; without a reset header assume a full window
+            self._reset_at = max(self._reset_at, time.time() + 60)
+
+    async def _throttle(self):
+        if self._remaining is None or self._remaining > self.rate_limit_reserve:
+            return
+        wait = self._reset_at - time.time()
+        if wait > 0:
+            self.counts["throttled"] += 1
+            logger.warning(f"[ANILIST] {self._remaining} requests left in the window, waiting {wait:.1f}s")
+            await asyncio.sleep(wait)
+        self._remaining = None
+
+    async def _post(self, query: str, variables: Dict[str, Any], authenticated: bool = False) -> Dict:
+        """POST one GraphQL document and return the whole response body ({"data", "errors"})"""
+        headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        if authenticated:
+            headers["Authorization"] = f"Bearer {self.token or api_keys.anilist_access_token}"
+
+        for attempt in range(self.max_retries + 1):
+            await self._throttle()
+            response = await http_pool.post(self.target, "/", json={"query": query, "variables": variables}, headers=headers)
+            self.counts["requests"] += 1
+            self._update_limits(response.headers)
+
+            if response.status_code == 429 and attempt < self.max_retries:
+                self.counts["rate_limited"] += 1
+                retry_after = float(response.headers.get("Retry-After", 60))
+                logger.warning(f"[ANILIST] Rate limited, retrying in {retry_after:.0f}s")
+                await asyncio.sleep(retry_after)
+                # Retry-After already covered the wait that the remaining count would ask for
+                self._remaining = None
+                continue
+            if response.status_code >= 400 and not response.content.startswith(b"{"):
+                response.raise_for_status()
+            return response.json()
+
+    # --- queries -------------------------------------------------------------------
+
+    async def _send_batch(self, fields: List[GraphQLField]) -> List[Any]:
+        query, variables = build_batch_query(fields)
+        body = await self._post(query, variables)
+        data = body.get("data") or {}
+        errors = body.get("errors") or []
+        if len(fields) > 1:
+            logger.info(f"[ANILIST] Sent {len(fields)} queries in one request")
+
+        results = []
+        for index in range(len(fields)):
+            alias = f"q{index}"
+            # Errors carry the alias as the first path element; unattributed ones fail every field
+            field_errors = [error for error in errors if (error.get("path") or [alias])[0] == alias]
+            results.append(AniListError(field_errors) if field_errors else data.get(alias))
+        return results
+
+    async def fetch(self, query_field: GraphQLField, ttl: Optional[float] = None) -> Any:
+        """Return the field's data, cached for ttl seconds (default cache_ttl; 0 always asks AniList)"""
+        ttl = self.cache_ttl if ttl is None else ttl
+        key = query_field.cache_key()
+        cached = self._cache.get(key) if ttl > 0 else None
+        if cached is not None and cached[0] > time.monotonic():
+            self._cache.move_to_end(key)
+            self.counts["cache_hits"] += 1
+            return cached[1]
+
+        generation = self._generation
+        result = await self._batcher.submit(query_field)
+        if isinstance(result, AniListError):
+            raise result
+
+        if ttl > 0 and generation == self._generation:
+            self._cache[key] = (time.monotonic() + ttl, result)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return result
+
+    async def fetch_many(self, fields: List[GraphQLField], ttl: Optional[float] = None) -> List[Any]:
+        """Fetch several fields; the ones not cached go out together in one request"""
+        return await asyncio.gather(*(self.fetch(query_field, ttl) for query_field in fields))
+
+    # --- mutations -----------------------------------------------------------------
+
+    async def mutate(self, mutation: str, variables: Dict[str, Any]) -> Dict:
+        """Send an authenticated mutation and drop every cached query result"""
+        try:
+            body = await self._post(mutation, variables, authenticated=True)
+        finally:
+            # Even a failed request may have been applied, so the cache goes either way
+            self.invalidate()
+        if body.get("errors"):
+            raise AniListError(body["errors"])
+        return body.get("data") or {}
+
+    def invalidate(self):
+        self._cache.clear()
+        self._generation += 1
+
+    def stats(self) -> Dict:
+        return {
+            "cache_entries": len(self._cache),
+            "rate_limit_remaining": self._remaining,
+            **self.counts,
+            **self._batcher.stats(),
+        }
+
+
+# Process-wide client; it must be used from one event loop (the Flask process's background loop)
+anilist_client = AniListClient()
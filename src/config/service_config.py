@@ -1,12 +1,103 @@
+import os
+
 # Service URLs
 BRAIN_MODULE_URL = "http://127.0.0.1:8015"
 AI_SERVICE_URL = "http://127.0.0.1:8013"
 VTUBE_MODULE_URL = "http://127.0.0.1:8002"
 FRONTEND_URL = "http://127.0.0.1:5000"
 DB_MODULE_URL = "http://127.0.0.1:8014"
+ANILIST_API_URL = "https://graphql.anilist.co"
 
 # Number of message pairs (user:assistant) to fetch for chat history
 CHAT_HISTORY_PAIRS = 10
+# Largest page the keyset-paginated /chat/history endpoint serves
+CHAT_HISTORY_PAGE_MAX = 500
+# SQLite file the DB module's worker processes share for chat history and the active context
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH", os.path.join("cache", "db_shared_state.db"))
+# Chat exchanges are appended to a per-process WAL file under WRITE_BEHIND_DIR and inserted
+# into MariaDB in batches of up to WRITE_BEHIND_BATCH_SIZE, at least every WRITE_BEHIND_FLUSH_INTERVAL seconds
+WRITE_BEHIND_DIR = os.getenv("WRITE_BEHIND_DIR", os.path.join("cache", "write_behind"))
+WRITE_BEHIND_BATCH_SIZE = 50
+WRITE_BEHIND_FLUSH_INTERVAL = 1.0
+# Backlog (unflushed exchanges) above which a warning is logged; the backlog stays on disk, not in memory
+WRITE_BEHIND_BACKLOG_WARNING = 1000
+# API usage totals are kept per day and key in chatgpt_api_usage_rollup and in memory; every
+# USAGE_RECONCILE_INTERVAL seconds the last USAGE_RECONCILE_DAYS days are rebuilt from the raw table
+USAGE_RECONCILE_INTERVAL = 60.0
+USAGE_RECONCILE_DAYS = 2
+USAGE_PRICE_PER_1000_TOKENS = 0.002
+
+# Brain response delivery: max undelivered responses per conversation and how long (seconds) they are kept
+RESPONSE_QUEUE_MAXSIZE = 10
+RESPONSE_QUEUE_TTL = 300
+
+# Text-to-speech: "azure" or "fake" (offline, silent audio), number of warm synthesizers, fake latency (seconds)
+TTS_BACKEND = os.getenv("TTS_BACKEND", "azure")
+TTS_POOL_SIZE = int(os.getenv("TTS_POOL_SIZE", "3"))
+TTS_FAKE_LATENCY = float(os.getenv("TTS_FAKE_LATENCY", "0.3"))
+
+# TTS audio cache: directory shared by AI workers, memory/disk budgets (MB), longest text worth caching
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join("cache", "tts"))
+TTS_CACHE_MEMORY_MB = int(os.getenv("TTS_CACHE_MEMORY_MB", "32"))
+TTS_CACHE_DISK_MB = int(os.getenv("TTS_CACHE_DISK_MB", "256"))
+TTS_CACHE_MAX_TEXT_CHARS = 200
+
+# Reply cache in front of the LLM: entries per AI worker, lifetime (seconds), near-duplicate cosine threshold
+RESPONSE_CACHE_MAX_ENTRIES = 256
+RESPONSE_CACHE_TTL = 600
+RESPONSE_CACHE_SIMILARITY = 0.85
+
+# Query embedding cache in the DB module (shared by its workers)
+EMBEDDING_MODEL = "voyage-3"
+EMBEDDING_DIM = 1024
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join("cache", "embeddings"))
+EMBEDDING_CACHE_MEMORY_ENTRIES = 2048
+EMBEDDING_CACHE_MAX_DISK_ENTRIES = 100_000
+
+# Vector search backend: "pinecone" (remote) or "local" (in-process index under VECTOR_INDEX_DIR)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", os.path.join("cache", "vector_index"))
+# Local index switches from brute force to IVF at this many vectors, scanning VECTOR_IVF_NPROBE lists per query
+VECTOR_IVF_THRESHOLD = 10_000
+VECTOR_IVF_NPROBE = 8
+# IVF lists are rebuilt (in the background) once this fraction of their vectors was overwritten in place
+VECTOR_IVF_REBUILD_FRACTION = 0.1
+# Vector queries arriving within this window (seconds) share one embed + search call
+VECTOR_QUERY_BATCH_SIZE = 16
+VECTOR_QUERY_BATCH_WAIT = 0.005
+# Bulk indexing pipeline: Voyage/upsert batch sizes and concurrent workers per stage
+INDEX_EMBED_BATCH_SIZE = 128
+INDEX_UPSERT_BATCH_SIZE = 200
+INDEX_EMBED_WORKERS = 2
+INDEX_UPSERT_WORKERS = 2
+# Hybrid retrieval: a BM25 index over the same documents, fused with vector results by
+# reciprocal-rank fusion (score = sum of 1 / (HYBRID_RRF_K + rank))
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", os.path.join("cache", "lexical_index"))
+HYBRID_RRF_K = 60
+# Rerank stage: "voyage" (remote, lexical fallback), "lexical" (local BM25) or "none"
+RERANK_BACKEND = os.getenv("RERANK_BACKEND", "voyage")
+RERANK_MODEL = "rerank-2"
+# Vector search fetches limit * RERANK_OVERFETCH candidates for the reranker to choose from
+RERANK_OVERFETCH = 4
+RERANK_CACHE_ENTRIES = 512
+# Latency budget for a whole vector query (seconds); reranking is skipped when less than
+# RERANK_MIN_TIME of it is left after embedding and search
+VECTOR_QUERY_BUDGET = 0.5
+RERANK_MIN_TIME = 0.05
+
+# AniList GraphQL client: query results are cached for ANILIST_CACHE_TTL seconds (cleared by
+# any mutation), queries issued within ANILIST_BATCH_WAIT seconds share one aliased request,
+# and requests pause when fewer than ANILIST_RATE_LIMIT_RESERVE calls are left in the minute
+ANILIST_CACHE_TTL = 300
+ANILIST_CACHE_ENTRIES = 256
+ANILIST_BATCH_SIZE = 10
+ANILIST_BATCH_WAIT = 0.01
+ANILIST_RATE_LIMIT_RESERVE = 2
+ANILIST_MAX_RETRIES = 3
+
+# Appended to a streamed answer saved to history after the completion failed part-way
+STREAM_INTERRUPTED_MARKER = " [response interrupted]"
 
 # Logging configuration
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -1,7 +1,27 @@
-from flask import render_template
+from flask import render_template, Response, abort
 from src.app_instance import app
+from src.services.http_pool import http_pool
+from src.utils.logging_config import setup_logger
+
+logger = setup_logger('main_routes')
 
 @app.route('/')
 def index():
     """Serve the main page."""
-    return render_template('index.html') 
\ No newline at end of file
+    return render_template('index.html')
+
+@app.route('/audio/<audio_id>')
+def get_audio(audio_id):
+    """Proxy synthesized audio from the AI service as raw bytes for the page to play."""
+    try:
+        response = http_pool.request_sync('ai', 'GET', f'/audio/{audio_id}')
+    except Exception as e:
+        logger.error(f"[ERROR] Failed to fetch audio {audio_id}: {e}")
+        abort(502)
+    if response.status_code != 200:
+        abort(response.status_code)
+    return Response(
+        response.content,
+        mimetype=response.headers.get('content-type', 'audio/wav'),
+        headers={'Cache-Control': response.headers.get('cache-control', 'no-store')}
+    )
@@ -1,12 +1,14 @@
+from flask import request
 from flask_socketio import emit
-import requests
+import json
 from src.app_instance import socketio, assistant, hotkey_handler
 from src.services.status_overlay import AssistantState
 from src.utils.logging_config import setup_logger, handle_error
-import asyncio
 from windows_functions.govee_mode_changer import change_lights_mode
 from api_functions.anilist_functions import show_media_list
 from src.services.timer_service import TimerService
+from src.services.http_pool import http_pool
+from src.services.loop_runner import background_loop
 import uuid
 
 # Setup module-specific logger
@@ -15,14 +17,26 @@ logger = setup_logger('socket_routes')
 # Initialize timer service with socketio instance
 timer_service = TimerService(socketio)
 
-# Replace WebSocket URL with HTTP URL
-BRAIN_SERVICE_URL = 'http://127.0.0.1:8015/process'
+
+def trigger_animation(animation_data):
+    """Ask the VTube service to play an animation for a reply"""
+    try:
+        animation_response = http_pool.request_sync(
+            'vtube',
+            'POST',
+            '/play_animation',
+            json=animation_data
+        )
+        animation_response.raise_for_status()
+        logger.info(f"Animation triggered successfully: {animation_data.get('message', 'unknown animation')}")
+    except Exception as e:
+        logger.error(f"Failed to trigger animation: {e}")
 
 def send_to_brain_service(data):
     """Send data to Brain service via HTTP"""
     try:
-        # Make HTTP POST request to Brain service
-        response = requests.post(BRAIN_SERVICE_URL, json={
+        # Make HTTP POST request to Brain service over the pooled keep-alive session
+        response = http_pool.request_sync('brain', 'POST', '/process', json={
             'transcript': data.get('transcript', ''),
             'skip_vtube': data.get('skip_vtube', False),
             'use_openai': data.get('use_openai', False),
@@ -48,20 +62,11 @@ def send_to_brain_service(data):
         
         # If we have animation data, trigger it immediately after sending response
         if animation_data:
-            try:
-                # Send animation request to VTube service
-                animation_response = requests.post(
-                    'http://localhost:5001/play_animation',
-                    json=animation_data
-                )
-                animation_response.raise_for_status()
-                logger.info(f"Animation triggered successfully: {animation_data.get('message', 'unknown animation')}")
-            except Exception as e:
-                logger.error(f"Failed to trigger animation: {e}")
+            trigger_animation(animation_data)
         
         # Update overlay state based on response
         if hotkey_handler:
-            if response_data.get('audio'):
+            if response_data.get('audio_id'):
                 hotkey_handler.set_state(AssistantState.SPEAKING)
             else:
                 hotkey_handler.set_state(AssistantState.LISTENING)
@@ -75,6 +80,51 @@ def send_to_brain_service(data):
         emit('error', {'message': str(e)})
         return None
 
+def stream_from_brain_service(data, sid):
+    """Relay streamed Brain service events to a single client as incremental socket events"""
+    try:
+        with http_pool.stream_sync('brain', 'POST', '/process/stream', json={
+            'transcript': data.get('transcript', ''),
+            'skip_vtube': data.get('skip_vtube', False),
+            'use_openai': data.get('use_openai', False),
+            'context': data.get('context', {}),
+            'conversation_id': str(uuid.uuid4())
+        }, timeout=(5, 60)) as response:
+            response.raise_for_status()
+            
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                event = json.loads(line)
+                event_type = event.pop('type', None)
+                
+                if event_type == 'delta':
+                    socketio.emit('response_delta', event, to=sid)
+                elif event_type == 'audio':
+                    # Per-sentence audio, played back-to-back by the client while later sentences generate
+                    socketio.emit('response_audio_chunk', event, to=sid)
+                    if hotkey_handler and event.get('index') == 0:
+                        hotkey_handler.set_state(AssistantState.SPEAKING)
+                elif event_type == 'done':
+                    socketio.emit('response_done', event, to=sid)
+                    if hotkey_handler and not event.get('audio_chunks'):
+                        hotkey_handler.set_state(AssistantState.LISTENING)
+                    # Animate once for the whole reply, as the non-streaming path does
+                    if not data.get('skip_vtube', False):
+                        trigger_animation({
+                            'text': data.get('transcript', ''),
+                            'ai_response': {'text': event.get('text', ''), 'success': event.get('success', True)},
+                            'context': data.get('context', {})
+                        })
+                elif event_type == 'error':
+                    raise RuntimeError(event.get('error', 'Unknown streaming error'))
+                    
+    except Exception as e:
+        logger.error(f"[ERROR] Brain service streaming failed: {e}")
+        if hotkey_handler:
+            hotkey_handler.set_state(AssistantState.ERROR)
+        socketio.emit('error', {'message': str(e)}, to=sid)
+
 @socketio.on('transcript')
 def handle_transcript(data):
     """Handle incoming transcription data."""
@@ -96,7 +146,11 @@ def handle_transcript(data):
             'use_openai': use_openai
         }
         logger.info(f"[TRANSCRIPT] Sending to brain: {request_data}")  # Log what we're sending
-        send_to_brain_service(request_data)
+        if data.get('stream', False):
+            # Stream in the background so the handler returns and emits reach the client as they arrive
+            socketio.start_background_task(stream_from_brain_service, request_data, request.sid)
+        else:
+            send_to_brain_service(request_data)
         
     except Exception as e:
         logger.error(f"[ERROR] Transcript handling failed: {e}")
@@ -225,8 +279,8 @@ def handle_action(data):
             
         if action_type == 'show_media_list':
             content_type = data.get('content_type')
-            # Run the async function in a synchronous context
-            response_text = asyncio.run(show_media_list(content_type))
+            # Run on the process's long-lived loop so pooled DB connections and the AniList cache survive
+            response_text = background_loop.run(show_media_list(content_type), timeout=60)
             
             emit('response', {
                 'text': response_text,
@@ -0,0 +1,231 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.config.service_config import AI_SERVICE_URL, ANILIST_API_URL, BRAIN_MODULE_URL, DB_MODULE_URL
+from src.utils.logging_config import setup_logger
+
+logger = setup_logger("http_pool")
+
+
+@dataclass
+class TargetConfig:
+    """Connection limits and default timeout for one downstream service"""
+    base_url: str
+    max_connections: int = 20
+    max_keepalive: int = 10
+    timeout: float = 10.0
+    read_timeout: Optional[float] = None
+
+
+class TargetMetrics:
+    """Request counters and latency totals for one target"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def record(self, duration: float, failed: bool):
+        self.requests += 1
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+        if failed:
+            self.errors += 1
+
+    def snapshot(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "avg_ms": round(self.total_time / self.requests * 1000, 2) if self.requests else 0.0,
+            "max_ms": round(self.max_time * 1000, 2),
+        }
+
+
+# Default targets; services can override a base URL with register()
+SERVICE_TARGETS: Dict[str, TargetConfig] = {
+    "ai": TargetConfig(AI_SERVICE_URL, timeout=15.0, read_timeout=60.0),
+    "brain": TargetConfig(BRAIN_MODULE_URL, timeout=15.0, read_timeout=60.0),
+    "db": TargetConfig(DB_MODULE_URL, max_connections=30, max_keepalive=15, timeout=5.0),
+    "vtube": TargetConfig(os.getenv("VTUBE_SERVICE_URL", "http://localhost:5001"), max_connections=5, max_keepalive=2),
+    "anilist": TargetConfig(ANILIST_API_URL, max_connections=5, max_keepalive=2, timeout=10.0),
+}
+
+
+class HTTPClientPool:
+    """Shared keep-alive connection pools for inter-service calls, one per target service.
+
+    Async callers (FastAPI services) use request()/stream(); the Flask process uses
+    request_sync()/stream_sync(), backed by a pooled requests.Session per target.
+    Pooled connections belong to the loop that opened them, so there is one async client
+    per target and event loop. Clients are created lazily and must be closed from the
+    owning service's lifespan (aclose() closes every loop's clients).
+    """
+
+    def __init__(self, targets: Dict[str, TargetConfig] = None):
+        self.targets = dict(targets or SERVICE_TARGETS)
+        self._clients: Dict[Tuple[str, asyncio.AbstractEventLoop], httpx.AsyncClient] = {}
+        self._sessions: Dict[str, requests.Session] = {}
+        self._metrics: Dict[str, TargetMetrics] = {name: TargetMetrics() for name in self.targets}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, base_url: str, **limits):
+        """Add a target or override its base URL/limits before first use"""
+        config = self.targets.get(name)
+        if config is None:
+            config = TargetConfig(base_url, **limits)
+        else:
+            config = TargetConfig(
+                base_url,
+                max_connections=limits.get("max_connections", config.max_connections),
+                max_keepalive=limits.get("max_keepalive", config.max_keepalive),
+                timeout=limits.get("timeout", config.timeout),
+                read_timeout=limits.get("read_timeout", config.read_timeout),
+            )
+        self.targets[name] = config
+        self._metrics.setdefault(name, TargetMetrics())
+
+    def _config(self, target: str) -> TargetConfig:
+        try:
+            return self.targets[target]
+        except KeyError:
+            raise ValueError(f"Unknown HTTP target: {target}")
+
+    def _timeout(self, config: TargetConfig) -> httpx.Timeout:
+        return httpx.Timeout(config.timeout, read=config.read_timeout or config.timeout)
+
+    def client(self, target: str) -> httpx.AsyncClient:
+        """Get (or lazily create) the pooled async client for a target on the running loop"""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get((target, loop))
+        if client is None or client.is_closed:
+            self._forget_closed_loops()
+            config = self._config(target)
+            client = httpx.AsyncClient(
+                base_url=config.base_url,
+                limits=httpx.Limits(
+                    max_connections=config.max_connections,
+                    max_keepalive_connections=config.max_keepalive,
+                ),
+                timeout=self._timeout(config),
+            )
+            self._clients[(target, loop)] = client
+            logger.info(f"[HTTP] Created pooled client for '{target}' ({config.base_url}, max {config.max_connections} connections)")
+        return client
+
+    def _forget_closed_loops(self):
+        """Drop clients whose loop was closed without aclose(); nothing can run on it any more"""
+        for key in [key for key in self._clients if key[1].is_closed()]:
+            self._clients.pop(key)
+            logger.warning(f"[HTTP] Event loop closed before its '{key[0]}' client was; call aclose() before the loop ends")
+
+    def session(self, target: str) -> requests.Session:
+        """Get (or lazily create) the pooled sync session for a target"""
+        with self._lock:
+            session = self._sessions.get(target)
+            if session is None:
+                config = self._config(target)
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config.max_connections)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[target] = session
+                logger.info(f"[HTTP] Created pooled session for '{target}' ({config.base_url})")
+            return session
+
+    async def request(self, target: str, method: str, path: str, **kwargs) -> httpx.Response:
+        metrics = self._metrics[target]
+        metrics.in_flight += 1
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = await self.client(target).request(method, path, **kwargs)
+            failed = response.status_code >= 500
+            return response
+        finally:
+            metrics.in_flight -= 1
+            metrics.record(time.perf_counter() - start, failed)
+
+    async def get(self, target: str, path: str, **kwargs) -> httpx.Response:
+        return await self.request(target, "GET", path, **kwargs)
+
+    async def post(self, target: str, path: str, **kwargs) -> httpx.Response:
+        return await self.request(target, "POST", path, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, target: str, method: str, path: str, **kwargs):
+        """Stream a response body; the connection returns to the pool when the block exits"""
+        metrics = self._metrics[target]
+        metrics.in_flight += 1
+        start = time.perf_counter()
+        failed = True
+        try:
+            async with self.client(target).stream(method, path, **kwargs) as response:
+                failed = response.status_code >= 500
+                yield response
+        finally:
+            metrics.in_flight -= 1
+            metrics.record(time.perf_counter() - start, failed)
+
+    def request_sync(self, target: str, method: str, path: str, **kwargs) -> requests.Response:
+        config = self._config(target)
+        kwargs.setdefault("timeout", (config.timeout, config.read_timeout or config.timeout))
+        metrics = self._metrics[target]
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = self.session(target).request(method, f"{config.base_url}{path}", **kwargs)
+            failed = response.status_code >= 500
+            return response
+        finally:
+            metrics.record(time.perf_counter() - start, failed)
+
+    @contextmanager
+    def stream_sync(self, target: str, method: str, path: str, **kwargs):
+        """Sync streaming request; closing the response releases the connection back to the pool"""
+        response = self.request_sync(target, method, path, stream=True, **kwargs)
+        try:
+            yield response
+        finally:
+            response.close()
+
+    def metrics(self) -> Dict[str, Dict]:
+        return {name: metrics.snapshot() for name, metrics in self._metrics.items()}
+
+    async def aclose(self):
+        """Close the async clients of every loop; call from the service lifespan shutdown"""
+        loop = asyncio.get_running_loop()
+        for (target, client_loop), client in list(self._clients.items()):
+            if client_loop is loop:
+                await client.aclose()
+            elif client_loop.is_running():
+                # Connections can only be closed on the loop that opened them
+                closing = asyncio.run_coroutine_threadsafe(client.aclose(), client_loop)
+                await asyncio.wait_for(asyncio.wrap_future(closing), timeout=5.0)
+            else:
+                logger.warning(f"[HTTP] Dropped '{target}' client: its event loop is no longer running")
+                continue
+            logger.info(f"[HTTP] Closed pooled client for '{target}': {self._metrics[target].snapshot()}")
+        self._clients.clear()
+
+    def close(self):
+        """Close all sync sessions"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+# Process-wide pool shared by every service module
+http_pool = HTTPClientPool()
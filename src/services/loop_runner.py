@@ -0,0 +1,64 @@
+import asyncio
+import concurrent.futures
+import threading
+from typing import Awaitable, Optional, TypeVar
+
+from src.utils.logging_config import setup_logger
+
+logger = setup_logger("loop_runner")
+
+T = TypeVar("T")
+
+
+class BackgroundLoop:
+    """One long-lived event loop on a daemon thread, for running coroutines from sync code.
+
+    asyncio.run() in a Flask-SocketIO handler builds and tears down a loop per call, so
+    anything pooled per loop (http_pool clients, the DB engine's connections, the AniList
+    cache and batcher) is thrown away every time, and a pooled connection reused from
+    another loop fails. Running the coroutines here instead keeps those alive across
+    handler calls.
+    """
+
+    def __init__(self, name: str = "background-loop"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name=self.name, daemon=True)
+                self._thread.start()
+                logger.info(f"[LOOP] Started {self.name}")
+            return self._loop
+
+    @property
+    def is_running(self) -> bool:
+        return self._loop is not None and self._loop.is_running()
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """Run a coroutine on the background loop and block until it finishes"""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def stop(self):
+        with self._lock:
+            if self._loop is None:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop.close()
+            self._loop = None
+            logger.info(f"[LOOP] Stopped {self.name}")
+
+
+# Process-wide loop for the Flask process's async helpers
+background_loop = BackgroundLoop()
@@ -142,17 +142,20 @@ window.addEventListener('app-initialized', () => {
         if (message) {
             const useOpenAI = document.getElementById('use-openai-check').checked;
             const skipVtube = document.getElementById('skip-vtube-check').checked;
+            const stream = document.getElementById('stream-response-check').checked;
             
             console.log('Sending text message with options:', {
                 useOpenAI,
                 skipVtube,
+                stream,
                 message
             });
 
             window.socket.emit('transcript', {
                 transcript: message,
                 skip_vtube: skipVtube,
-                use_openai: useOpenAI
+                use_openai: useOpenAI,
+                stream: stream
             });
             
             // Clear the input
@@ -164,17 +167,20 @@ window.addEventListener('app-initialized', () => {
     window.speechHandler.onFinalTranscript = (transcript) => {
         const useOpenAI = document.getElementById('use-openai-check').checked;
         const skipVtube = document.getElementById('skip-vtube-check').checked;
+        const stream = document.getElementById('stream-response-check').checked;
         
         console.log('Sending transcript with options:', {
             useOpenAI,
             skipVtube,
+            stream,
             transcript
         });
 
         window.socket.emit('transcript', {
             transcript: transcript,
             skip_vtube: skipVtube,
-            use_openai: useOpenAI
+            use_openai: useOpenAI,
+            stream: stream
         });
     };
 
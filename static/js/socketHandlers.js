@@ -7,6 +7,8 @@ export class SocketHandler {
         this.isPlaying = false;
         this.voiceEnabled = true;
         this.processingCount = 0;
+        this.streamingText = null;
+        this.streamAudio = null;
         this.setupConnectionHandlers();
     }
 
@@ -81,7 +83,7 @@ export class SocketHandler {
             }
             
             // Handle audio if present and voice is enabled
-            if (data.audio && this.voiceEnabled) {
+            if (data.audio_id && this.voiceEnabled) {
                 // Request audio focus when playing in background
                 if (!window.isPageVisible) {
                     try {
@@ -90,10 +92,43 @@ export class SocketHandler {
                         console.warn('MediaSession API not supported', err);
                     }
                 }
-                await this.playAudioResponse(data.audio);
+                await this.playAudioResponse(data.audio_id);
             }
         });
 
+        // Streaming responses: append text deltas as they arrive
+        this.socket.on('response_delta', (data) => {
+            const responseElement = document.getElementById('response');
+            if (this.streamingText === null) {
+                this.streamingText = '';
+            }
+            this.streamingText += data.text || '';
+            if (responseElement) {
+                responseElement.textContent = this.streamingText;
+            }
+        });
+
+        // Streaming responses: each completed sentence arrives as its own audio chunk
+        this.socket.on('response_audio_chunk', (data) => {
+            if (data.audio_id && this.voiceEnabled) {
+                this.enqueueAudioChunk(data.audio_id);
+            }
+        });
+
+        // Streaming responses: final event carries the full text
+        this.socket.on('response_done', async (data) => {
+            console.log('Streamed response complete:', data.timing);
+            const text = data.text || this.streamingText || 'No response';
+            this.streamingText = null;
+
+            const responseElement = document.getElementById('response');
+            if (responseElement) {
+                responseElement.textContent = text;
+            }
+
+            this.finishAudioStream();
+        });
+
         // Add handler for stop command
         this.socket.on('stop_audio', () => {
             this.stopCurrentAudio();
@@ -101,6 +136,7 @@ export class SocketHandler {
 
         this.socket.on('error', (error) => {
             console.error('Socket error:', error);
+            this.streamingText = null;
             document.getElementById('response').textContent = 'Error: ' + (error.message || 'Unknown error');
         });
 
@@ -150,10 +186,19 @@ export class SocketHandler {
         responseElement.innerHTML = html || 'None';
     }
 
-    async playAudioResponse(audioData, textResponse) {
+    async fetchAudio(audioId) {
+        // Audio is served as raw bytes by ID instead of base64 inside the socket payload
+        const response = await fetch(`/audio/${audioId}`);
+        if (!response.ok) {
+            throw new Error(`Audio ${audioId} unavailable (${response.status})`);
+        }
+        return response.arrayBuffer();
+    }
+
+    async playAudioResponse(audioId, textResponse) {
         // If audio is currently playing, add to queue and return
         if (this.isPlaying) {
-            this.audioQueue.push(audioData);
+            this.audioQueue.push(audioId);
             this.responseQueue.push(textResponse);
             this.updateResponseDisplay();
             console.log('Audio and text added to queue. Queue length:', this.audioQueue.length);
@@ -169,9 +214,9 @@ export class SocketHandler {
                 window.speechHandler.switchToTriggerMode();
             }
 
-            // Convert base64 to audio buffer
+            // Fetch and decode the audio
             const audioContext = new (window.AudioContext || window.webkitAudioContext)();
-            const arrayBuffer = Uint8Array.from(atob(audioData), c => c.charCodeAt(0)).buffer;
+            const arrayBuffer = await this.fetchAudio(audioId);
             const audioBuffer = await audioContext.decodeAudioData(arrayBuffer);
             
             // Create and play audio source
@@ -200,7 +245,92 @@ export class SocketHandler {
         }
     }
 
+    startAudioStream() {
+        // Switch to trigger mode as soon as the first chunk starts, same as full responses
+        if (window.speechHandler) {
+            window.speechHandler.switchToTriggerMode();
+        }
+
+        this.streamAudio = {
+            context: new (window.AudioContext || window.webkitAudioContext)(),
+            nextStartTime: 0,
+            sources: new Set(),
+            chain: Promise.resolve(),
+            finished: false
+        };
+        this.isPlaying = true;
+    }
+
+    enqueueAudioChunk(audioId) {
+        if (!this.streamAudio) {
+            this.startAudioStream();
+        }
+        const stream = this.streamAudio;
+        stream.finished = false;
+
+        // Start downloading right away; only decoding and scheduling wait for earlier chunks
+        const download = this.fetchAudio(audioId);
+        download.catch(() => {});
+
+        // Decode in arrival order so chunks are scheduled in sentence order, back-to-back without gaps
+        stream.chain = stream.chain.then(async () => {
+            if (this.streamAudio !== stream) return;
+            const arrayBuffer = await download;
+            const audioBuffer = await stream.context.decodeAudioData(arrayBuffer);
+            if (this.streamAudio !== stream) return;
+
+            const source = stream.context.createBufferSource();
+            source.buffer = audioBuffer;
+            source.connect(stream.context.destination);
+
+            const startAt = Math.max(stream.context.currentTime, stream.nextStartTime);
+            source.start(startAt);
+            stream.nextStartTime = startAt + audioBuffer.duration;
+            stream.sources.add(source);
+
+            source.onended = () => {
+                stream.sources.delete(source);
+                this.checkAudioStreamEnded(stream);
+            };
+        }).catch((error) => {
+            console.error('Error playing audio chunk:', error);
+        });
+    }
+
+    finishAudioStream() {
+        const stream = this.streamAudio;
+        if (!stream) return;
+        stream.finished = true;
+        stream.chain.then(() => this.checkAudioStreamEnded(stream));
+    }
+
+    checkAudioStreamEnded(stream) {
+        if (this.streamAudio !== stream || !stream.finished || stream.sources.size > 0) {
+            return;
+        }
+        this.streamAudio = null;
+        stream.context.close();
+        this.isPlaying = false;
+        this.socket.emit('audio_finished');
+        this.processAudioQueue();
+    }
+
     stopCurrentAudio() {
+        if (this.streamAudio) {
+            const stream = this.streamAudio;
+            this.streamAudio = null;
+            stream.sources.forEach((source) => {
+                try {
+                    source.stop();
+                } catch (e) {
+                    console.warn('Error stopping audio chunk:', e);
+                }
+            });
+            stream.context.close();
+            this.isPlaying = false;
+            this.socket.emit('audio_finished');
+        }
+
         if (this.currentAudio) {
             try {
                 this.currentAudio.stop();
@@ -306,77 +436,82 @@ export class SocketHandler {
     }
 
     // Add new method for handling long-running tasks
-    async handleLongRunningTask(conversationId) {
+    handleLongRunningTask(conversationId) {
         console.log('Handling long-running task:', conversationId);
         
         this.updateProcessingStatus(true);
 
-        let retryCount = 0;
-        const maxRetries = 30;
-        
-        try {
-            while (retryCount < maxRetries) {
-                const response = await fetch(`http://127.0.0.1:8015/pending_response/${conversationId}`);
-                if (!response.ok) {
-                    throw new Error(`HTTP error! status: ${response.status}`);
-                }
-                const data = await response.json();
-                
-                if (data.status !== 'waiting') {
-                    this.updateProcessingStatus(false);
-                    console.log('Long-running task completed:', data);
-                    
-                    // Handle audio if present
-                    if (data.audio && this.voiceEnabled) {
-                        // Use the queue system with both audio and text
-                        if (this.isPlaying) {
-                            this.audioQueue.push(data.audio);
-                            this.responseQueue.push(data.text || data.response || 'No response');
-                            this.updateResponseDisplay();
-                            console.log('Audio and text added to queue from long-running task');
-                        } else {
-                            await this.playAudioResponse(data.audio, data.text || data.response || 'No response');
-                        }
-                    } else {
-                        // If no audio, just update the response immediately
-                        this.currentResponse = data.text || data.response || 'No response';
-                        this.updateResponseDisplay();
-                    }
-                    
-                    // If we have animation data, handle it
-                    if (data.animation_data) {
-                        try {
-                            const animation_response = await fetch('http://localhost:5001/play_animation', {
-                                method: 'POST',
-                                headers: {
-                                    'Content-Type': 'application/json',
-                                },
-                                body: JSON.stringify(data.animation_data)
-                            });
-                            if (!animation_response.ok) {
-                                console.error('Animation request failed');
-                            }
-                        } catch (e) {
-                            console.error('Failed to trigger animation:', e);
-                        }
-                    }
-                    
-                    return data;
+        // The brain pushes the response over server-sent events as soon as it is ready
+        const timeoutMs = 60000;
+        return new Promise((resolve) => {
+            const events = new EventSource(`${window.BRAIN_SERVICE_URL}/responses/${conversationId}/events`);
+            let settled = false;
+
+            const finish = (data) => {
+                if (settled) return;
+                settled = true;
+                clearTimeout(timer);
+                events.close();
+                this.updateProcessingStatus(false);
+                resolve(data);
+            };
+
+            const timer = setTimeout(() => {
+                console.error('Long-running task timed out');
+                finish(null);
+            }, timeoutMs);
+
+            events.addEventListener('response', async (event) => {
+                const data = JSON.parse(event.data);
+                finish(data);
+                console.log('Long-running task completed:', data);
+                await this.handleCompletedResponse(data);
+            });
+
+            events.onerror = (error) => {
+                // EventSource retries on its own; only give up once the browser closes it
+                if (events.readyState === EventSource.CLOSED) {
+                    console.error('Response channel closed:', error);
+                    finish(null);
                 }
-                
-                // Wait before next poll
-                await new Promise(resolve => setTimeout(resolve, 1000));
-                retryCount++;
-                
+            };
+        });
+    }
+
+    async handleCompletedResponse(data) {
+        // Handle audio if present
+        if (data.audio_id && this.voiceEnabled) {
+            // Use the queue system with both audio and text
+            if (this.isPlaying) {
+                this.audioQueue.push(data.audio_id);
+                this.responseQueue.push(data.text || data.response || 'No response');
+                this.updateResponseDisplay();
+                console.log('Audio and text added to queue from long-running task');
+            } else {
+                await this.playAudioResponse(data.audio_id, data.text || data.response || 'No response');
             }
-        } catch (error) {
-            this.updateProcessingStatus(false);
-            console.error('Error polling for response:', error);
+        } else {
+            // If no audio, just update the response immediately
+            this.currentResponse = data.text || data.response || 'No response';
+            this.updateResponseDisplay();
         }
         
-        if (retryCount >= maxRetries) {
-            this.updateProcessingStatus(false);
-            console.error('Long-running task timed out');
+        // If we have animation data, handle it
+        if (data.animation_data) {
+            try {
+                const animation_response = await fetch('http://localhost:5001/play_animation', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                    },
+                    body: JSON.stringify(data.animation_data)
+                });
+                if (!animation_response.ok) {
+                    console.error('Animation request failed');
+                }
+            } catch (e) {
+                console.error('Failed to trigger animation:', e);
+            }
         }
     }
 
@@ -0,0 +1,64 @@
+import asyncio
+
+import shared_code.anilist.anilist_client as anilist_module
+from shared_code.anilist.anilist_client import AniListClient, GraphQLField
+
+
+class FakeResponse:
+    def __init__(self, body, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {"X-RateLimit-Remaining": "80"}
+        self.content = b"{}"
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+class SlowPool:
+    """Answers each aliased field with its own variables, after a delay"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.requests = []
+
+    async def post(self, target, path, json=None, headers=None):
+        self.requests.append(json)
+        await asyncio.sleep(self.delay)
+        aliases = {name.split("_", 1)[0] for name in json["variables"]}
+        return FakeResponse({"data": {alias: {"id": json["variables"][f"{alias}_id"]} for alias in aliases}})
+
+
+def media_field(media_id):
+    return GraphQLField("Media(id: $id) { id }", variables={"id": media_id}, types={"id": "Int"})
+
+
+def test_fetch_during_in_flight_batch_completes(monkeypatch):
+    pool = SlowPool(delay=0.05)
+    monkeypatch.setattr(anilist_module, "http_pool", pool)
+
+    async def scenario():
+        client = AniListClient(batch_wait=0.001)
+        first = asyncio.create_task(client.fetch(media_field(1)))
+        await asyncio.sleep(0.02)  # the first request is now in flight
+        second = asyncio.create_task(client.fetch(media_field(2)))
+        return await asyncio.wait_for(asyncio.gather(first, second), timeout=1.0)
+
+    assert asyncio.run(scenario()) == [{"id": 1}, {"id": 2}]
+    assert len(pool.requests) == 2
+
+
+def test_concurrent_fetches_share_one_request_and_cache(monkeypatch):
+    pool = SlowPool(delay=0.0)
+    monkeypatch.setattr(anilist_module, "http_pool", pool)
+
+    async def scenario():
+        client = AniListClient(batch_wait=0.01)
+        results = await client.fetch_many([media_field(1), media_field(2)])
+        cached = await client.fetch(media_field(1))
+        return results, cached
+
+    results, cached = asyncio.run(scenario())
+    assert results == [{"id": 1}, {"id": 2}]
+    assert cached == {"id": 1}
+    assert len(pool.requests) == 1
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from modules.brain.main_brain import BrainService
+
+
+class ConnectedRequest:
+    async def is_disconnected(self):
+        return False
+
+
+def test_response_is_requeued_when_the_client_leaves_before_it_is_sent():
+    async def scenario():
+        service = BrainService()
+        await service.response_queue.queue_response("c1", {"text": "first"})
+        await service.response_queue.queue_response("c1", {"text": "second"})
+
+        events = service.response_events("c1", ConnectedRequest())
+        await events.__anext__()
+        # The server failed to send that chunk and closes the stream
+        await events.aclose()
+
+        return [service.response_queue.get_response_nowait("c1") for _ in range(3)]
+
+    assert asyncio.run(scenario()) == [{"text": "first"}, {"text": "second"}, None]
+
+
+def test_delivered_response_is_not_requeued():
+    async def scenario():
+        service = BrainService()
+        await service.response_queue.queue_response("c1", {"text": "only"})
+
+        events = service.response_events("c1", ConnectedRequest())
+        chunks = [chunk async for chunk in events]
+
+        return chunks, service.response_queue.get_response_nowait("c1")
+
+    chunks, left = asyncio.run(scenario())
+    assert chunks == ['event: response\ndata: {"text": "only"}\n\n']
+    assert left is None
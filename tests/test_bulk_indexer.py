@@ -0,0 +1,50 @@
+import asyncio
+import os
+
+import pytest
+
+from modules.db_module.services.bulk_indexer import BulkIndexer
+
+
+class MemoryBackend:
+    """Stores upserted items; raises once fail_after items have been written"""
+
+    def __init__(self, fail_after=None):
+        self.items = {}
+        self.fail_after = fail_after
+
+    def upsert(self, items):
+        if self.fail_after is not None and len(self.items) >= self.fail_after:
+            raise RuntimeError("backend down")
+        self.items.update({doc_id: metadata for doc_id, _, metadata in items})
+
+
+def embed(texts):
+    return [[float(len(text))] for text in texts]
+
+
+def documents(count):
+    return [{"id": f"doc{i}", "text": f"text {i}"} for i in range(count)]
+
+
+def make_indexer(backend, checkpoint_path):
+    return BulkIndexer(embed, backend, checkpoint_path=checkpoint_path, embed_batch_size=2,
+                       upsert_batch_size=2, embed_workers=1, upsert_workers=1, max_retries=1)
+
+
+def test_interrupted_run_resumes_from_the_checkpoint(tmp_path):
+    checkpoint = str(tmp_path / "index.checkpoint")
+
+    with pytest.raises(RuntimeError, match="backend down"):
+        asyncio.run(make_indexer(MemoryBackend(fail_after=4), checkpoint).run(documents(10)))
+
+    with open(checkpoint, encoding="utf-8") as f:
+        assert f.read().split() == ["doc0", "doc1", "doc2", "doc3"]
+
+    backend = MemoryBackend()
+    result = asyncio.run(make_indexer(backend, checkpoint).run(documents(10)))
+
+    assert result["skipped"] == 4 and result["indexed"] == 6
+    assert sorted(backend.items) == [f"doc{i}" for i in range(4, 10)]
+    # A complete run leaves nothing to resume
+    assert not os.path.exists(checkpoint)
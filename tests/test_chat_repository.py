@@ -0,0 +1,37 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("sqlalchemy.ext.asyncio")
+
+from sqlalchemy.dialects import mysql
+
+from modules.db_module.repositories.chat_repository import ChatRepository
+
+
+class RecordingSession:
+    def __init__(self):
+        self.statements = []
+        self.committed = False
+
+    async def execute(self, statement, *args):
+        self.statements.append(str(statement.compile(dialect=mysql.dialect())))
+
+    async def commit(self):
+        self.committed = True
+
+    async def rollback(self):
+        pass
+
+
+def test_exchange_batch_dedupes_on_exchange_id_without_ignore():
+    session = RecordingSession()
+    rows = [{"question": "q", "answer": "a", "added_time": datetime(2026, 1, 1), "exchange_id": "abc"}]
+
+    assert asyncio.run(ChatRepository(session).add_chat_exchanges(rows))
+
+    (sql,) = session.statements
+    assert "IGNORE" not in sql
+    assert "ON DUPLICATE KEY UPDATE exchange_id = private_conversations.exchange_id" in sql
+    assert session.committed
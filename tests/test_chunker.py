@@ -0,0 +1,38 @@
+import asyncio
+import time
+
+from modules.db_module.services.chunker import TokenChunker
+
+
+class SlowChunker(TokenChunker):
+    """Stands in for the tokenizer: one chunk per item, after a blocking delay per batch"""
+
+    def chunk_batch(self, items):
+        time.sleep(0.05)
+        return [(key, [{"id": f"{key}:chunk1", "text": text}]) for key, text in items]
+
+
+def test_chunk_stream_async_keeps_the_loop_responsive():
+    chunker = SlowChunker()
+    items = [(str(i), f"text {i}") for i in range(6)]
+
+    async def scenario():
+        ticks = 0
+        done = False
+
+        async def tick():
+            nonlocal ticks
+            while not done:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        ticker = asyncio.create_task(tick())
+        results = [item async for item in chunker.chunk_stream_async(items, batch_size=2)]
+        done = True
+        await ticker
+        return results, ticks
+
+    results, ticks = asyncio.run(scenario())
+    assert [key for key, _ in results] == [str(i) for i in range(6)]
+    # Three 50ms batches ran in a thread while the loop kept ticking
+    assert ticks >= 10
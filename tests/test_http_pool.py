@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from src.services.http_pool import HTTPClientPool, TargetConfig
+from src.services.loop_runner import BackgroundLoop
+
+
+def make_pool():
+    return HTTPClientPool({"svc": TargetConfig("http://127.0.0.1:1")})
+
+
+def test_client_is_reused_within_a_loop():
+    pool = make_pool()
+
+    async def scenario():
+        first, second = pool.client("svc"), pool.client("svc")
+        await pool.aclose()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first is second
+    assert first.is_closed
+
+
+def test_each_loop_gets_its_own_client_and_aclose_closes_all():
+    pool = make_pool()
+    background = BackgroundLoop("test-loop")
+
+    async def get_client():
+        return pool.client("svc")
+
+    try:
+        other = background.run(get_client(), timeout=5)
+
+        async def scenario():
+            mine = pool.client("svc")
+            await pool.aclose()
+            return mine
+
+        mine = asyncio.run(scenario())
+    finally:
+        background.stop()
+
+    assert mine is not other
+    assert mine.is_closed and other.is_closed
+
+
+def test_clients_of_closed_loops_are_forgotten():
+    pool = make_pool()
+
+    async def get_client():
+        return pool.client("svc")
+
+    asyncio.run(get_client())  # this loop closes without aclose()
+    asyncio.run(get_client())
+
+    assert len(pool._clients) == 1
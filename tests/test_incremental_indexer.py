@@ -0,0 +1,72 @@
+import asyncio
+
+from modules.db_module.services.incremental_indexer import IncrementalIndexer
+
+
+class MemoryBackend:
+    def __init__(self):
+        self.vectors = {}
+
+    def upsert(self, items):
+        for doc_id, embedding, metadata in items:
+            self.vectors[doc_id] = metadata["text"]
+
+    def delete(self, ids):
+        for doc_id in ids:
+            self.vectors.pop(doc_id, None)
+
+
+def split_chunks(items):
+    """One chunk per "|"-separated part, produced two records at a time like a batching chunker"""
+    batch = []
+    for item in list(items) + [None]:
+        if item is not None:
+            batch.append(item)
+            if len(batch) < 2:
+                continue
+        for key, text in batch:
+            yield key, [{"id": f"{key}:chunk{n}", "text": part} for n, part in enumerate(text.split("|"), start=1)]
+        batch = []
+
+
+def embed(texts):
+    return [[0.0] for _ in texts]
+
+
+def refresh(tmp_path, backend, records):
+    indexer = IncrementalIndexer(embed, backend, chunk_fn=split_chunks, state_path=str(tmp_path / "state.db"))
+    return asyncio.run(indexer.run(records))
+
+
+def test_duplicate_and_missing_ids_are_skipped(tmp_path):
+    backend = MemoryBackend()
+
+    counts = refresh(tmp_path, backend, [("None", "a|b"), ("None", "c"), (None, "d"), ("", "e"), ("Bleach", "f")])
+
+    assert backend.vectors == {"None:chunk1": "a", "None:chunk2": "b", "Bleach:chunk1": "f"}
+    assert counts["records_skipped"] == 3
+    assert counts["chunks_deleted"] == 0
+
+
+def test_only_changed_chunks_are_reindexed_and_stale_ones_deleted(tmp_path):
+    backend = MemoryBackend()
+    refresh(tmp_path, backend, [("Naruto", "a|b|c"), ("Bleach", "d")])
+
+    counts = refresh(tmp_path, backend, [("Naruto", "a|x")])
+
+    assert backend.vectors == {"Naruto:chunk1": "a", "Naruto:chunk2": "x"}
+    assert counts["chunks_unchanged"] == 1
+    assert counts["chunks_indexed"] == 1
+    assert counts["chunks_deleted"] == 2  # Naruto:chunk3 and the vanished Bleach:chunk1
+    assert counts["records_deleted"] == 1
+
+
+def test_unchanged_records_are_not_chunked_again(tmp_path):
+    backend = MemoryBackend()
+    refresh(tmp_path, backend, [("Naruto", "a|b")])
+
+    counts = refresh(tmp_path, backend, [("Naruto", "a|b")])
+
+    assert counts["records_unchanged"] == 1
+    assert counts["chunks_indexed"] == 0
+    assert backend.vectors == {"Naruto:chunk1": "a", "Naruto:chunk2": "b"}
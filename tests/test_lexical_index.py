@@ -0,0 +1,52 @@
+import pytest
+
+from modules.db_module.services.lexical_index import LexicalIndex
+
+
+def item(doc_id, text):
+    return (doc_id, [], {"text": text})
+
+
+def ids(matches):
+    return [match["id"] for match in matches]
+
+
+def test_bm25_ranks_rarer_and_denser_terms_higher(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    index.upsert([
+        item("a", "Title: Cowboy Bebop. Bounty hunters in space"),
+        item("b", "Title: Space Brothers. Two brothers train to be astronauts in space"),
+        item("c", "Title: Planetes. Debris collectors in orbit"),
+        item("d", "Title: Trigun. A gunman on a desert planet"),
+    ])
+
+    assert ids(index.query("bounty space")) == ["a", "b"]
+    # "title" is in every document, so it is skipped in favour of the selective term
+    assert ids(index.query("title orbit")) == ["c"]
+
+
+def test_upsert_replaces_and_delete_removes(tmp_path):
+    index = LexicalIndex(str(tmp_path))
+    index.upsert([item("a", "giant robots"), item("b", "slice of life")])
+    index.upsert([item("a", "cooking show")])
+    index.delete(["b"])
+
+    assert index.query("robots") == []
+    assert ids(index.query("cooking")) == ["a"]
+    assert index.stats()["documents"] == 1
+
+
+def test_fusion_puts_matches_found_by_both_rankings_first():
+    pytest.importorskip("voyageai")
+    from modules.db_module.services.vector_store import reciprocal_rank_fusion
+
+    vector = [{"id": "v1", "score": 0.9}, {"id": "both", "score": 0.8}, {"id": "v3", "score": 0.7}]
+    lexical = [{"id": "l1", "score": 12.0}, {"id": "both", "score": 9.0}]
+
+    fused = reciprocal_rank_fusion([vector, lexical], k=60)
+
+    assert ids(fused) == ["both", "v1", "l1", "v3"]
+    by_id = {match["id"]: match for match in fused}
+    # The vector similarity is kept, lexical-only matches have none
+    assert by_id["both"]["score"] == 0.8 and by_id["l1"]["score"] is None
+    assert by_id["both"]["fusion_score"] == pytest.approx(2 / 62)
@@ -0,0 +1,45 @@
+import numpy as np
+
+from modules.db_module.services.local_index import LocalVectorIndex
+
+DIM = 8
+
+
+def clustered_items(count):
+    """Vectors spread around the first two axes, so the IVF splits them by axis"""
+    rng = np.random.default_rng(1)
+    items = []
+    for i in range(count):
+        vector = rng.normal(scale=0.05, size=DIM)
+        vector[i % 2] += 1.0
+        items.append((f"doc{i}", vector.tolist(), {"n": i}))
+    return items
+
+
+def axis(n):
+    vector = np.zeros(DIM)
+    vector[n] = 1.0
+    return vector.tolist()
+
+
+def test_ivf_is_built_at_load_not_in_the_query_path(tmp_path):
+    LocalVectorIndex(str(tmp_path), DIM, ivf_threshold=50).upsert(clustered_items(100))
+
+    index = LocalVectorIndex(str(tmp_path), DIM, ivf_threshold=50)
+
+    stats = index.stats()
+    assert stats["ivf_lists"] > 0 and not stats["ivf_building"]
+
+
+def test_in_place_updates_past_the_fraction_rebuild_the_lists(tmp_path):
+    index = LocalVectorIndex(str(tmp_path), DIM, ivf_threshold=50, nprobe=1, ivf_rebuild_fraction=0.1)
+    index.upsert(clustered_items(100))
+    index.wait_for_ivf()
+
+    # Move twenty vectors from the first axis to a new, third one
+    moved = [(f"doc{i}", axis(2), {"n": i}) for i in range(0, 40, 2)]
+    index.upsert(moved)
+    index.wait_for_ivf()
+
+    hits = index.query(axis(2), top_k=20)
+    assert {hit["id"] for hit in hits} == {doc_id for doc_id, _, _ in moved}
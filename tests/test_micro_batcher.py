@@ -0,0 +1,86 @@
+import asyncio
+
+from modules.db_module.services.micro_batcher import MicroBatcher
+
+
+def test_submit_during_slow_batch_is_flushed():
+    async def scenario():
+        started = asyncio.Event()
+        release = asyncio.Event()
+        batches = []
+
+        async def process_batch(items):
+            batches.append(list(items))
+            started.set()
+            await release.wait()
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(process_batch, max_batch=8, max_wait=0.001)
+        first = asyncio.create_task(batcher.submit(1))
+        await started.wait()
+
+        # Arrives while the first batch is still being processed
+        second = asyncio.create_task(batcher.submit(2))
+        await asyncio.sleep(0.01)
+        release.set()
+
+        return await asyncio.wait_for(asyncio.gather(first, second), timeout=1.0), batches
+
+    results, batches = asyncio.run(scenario())
+    assert results == [2, 4]
+    assert batches == [[1], [2]]
+
+
+def test_items_in_one_window_share_a_batch():
+    async def scenario():
+        batches = []
+
+        async def process_batch(items):
+            batches.append(list(items))
+            return items
+
+        batcher = MicroBatcher(process_batch, max_batch=8, max_wait=0.01)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(3)))
+        return results, batches
+
+    results, batches = asyncio.run(scenario())
+    assert results == [0, 1, 2]
+    assert batches == [[0, 1, 2]]
+
+
+def test_short_result_list_fails_every_caller():
+    async def scenario():
+        async def process_batch(items):
+            return items[:1]
+
+        batcher = MicroBatcher(process_batch, max_batch=8, max_wait=0.01)
+        return await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True),
+            timeout=1.0
+        )
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_stop_fails_waiting_and_running_callers():
+    async def scenario():
+        started = asyncio.Event()
+
+        async def process_batch(items):
+            started.set()
+            await asyncio.sleep(10)
+            return items
+
+        batcher = MicroBatcher(process_batch, max_batch=1, max_wait=0.01)
+        running = asyncio.create_task(batcher.submit(1))
+        await started.wait()
+        # These sit in open windows or start batches of their own when stop() runs
+        queued = [asyncio.create_task(batcher.submit(i)) for i in (2, 3)]
+        await asyncio.sleep(0)
+        await batcher.stop()
+        return await asyncio.wait_for(asyncio.gather(running, *queued, return_exceptions=True), timeout=1.0)
+
+    results = asyncio.run(scenario())
+    assert len(results) == 3
+    assert all(isinstance(result, RuntimeError) for result in results)
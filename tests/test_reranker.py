@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+from modules.db_module.services.reranker import LexicalScorer, RerankStage
+
+
+class SlowScorer:
+    """Remote scorer stand-in that ranks in reverse vector order, slowly"""
+
+    name = "slow"
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.calls = 0
+
+    def score(self, query, texts):
+        self.calls += 1
+        time.sleep(self.delay)
+        return [float(i) for i in range(len(texts))]
+
+
+def matches():
+    # Vector order puts the least relevant text first
+    texts = ["weather report", "cooking show", "mecha anime with giant robots"]
+    return [{"id": f"m{i}", "metadata": {"text": text}} for i, text in enumerate(texts)]
+
+
+def rerank(stage, budget):
+    async def scenario():
+        return await stage.rerank("giant robots anime", matches(), top_k=2,
+                                  deadline=time.perf_counter() + budget)
+    return [match["id"] for match in asyncio.run(scenario())]
+
+
+def test_scorer_within_budget_decides_the_order():
+    stage = RerankStage(SlowScorer(0.0), fallback=LexicalScorer())
+
+    assert rerank(stage, budget=1.0) == ["m2", "m1"]
+    assert stage.counts["reranked"] == 1
+
+
+def test_scorer_past_the_budget_falls_back_to_lexical():
+    stage = RerankStage(SlowScorer(0.3), fallback=LexicalScorer())
+
+    ids = rerank(stage, budget=0.1)
+
+    assert ids[0] == "m2"
+    assert stage.counts["fallbacks"] == 1
+    # Fallback scores are not cached, the next call tries the scorer again
+    assert stage.stats()["cache_entries"] == 0
+
+
+def test_too_little_budget_keeps_vector_order():
+    scorer = SlowScorer(0.0)
+    stage = RerankStage(scorer, fallback=LexicalScorer(), min_time=0.05)
+
+    assert rerank(stage, budget=0.01) == ["m0", "m1"]
+    assert stage.counts["skipped"] == 1
+    assert scorer.calls == 0
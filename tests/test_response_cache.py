@@ -0,0 +1,29 @@
+from modules.ai.services.response_cache import CachedResponse, ResponseCache, anchor_tokens
+
+
+def test_numeric_variant_is_not_a_similar_hit():
+    cache = ResponseCache()
+    cache.put("set chapter count to 12 for one piece", "", CachedResponse("q", "Set to 12"))
+
+    assert cache.get("set chapter count to 13 for one piece", "") is None
+    assert cache.similar_hits == 0
+
+
+def test_rephrasing_with_same_numbers_is_a_similar_hit():
+    cache = ResponseCache()
+    cache.put("set chapter count to 12 for one piece", "", CachedResponse("q", "Set to 12"))
+
+    entry = cache.get("set the chapter count to 12 for one piece", "")
+    assert entry is not None and entry.text == "Set to 12"
+    assert cache.similar_hits == 1
+
+
+def test_different_name_is_not_a_similar_hit():
+    cache = ResponseCache()
+    cache.put("Tell me about Naruto", "", CachedResponse("q", "Naruto is..."))
+
+    assert cache.get("Tell me about Bleach", "") is None
+
+
+def test_anchor_tokens_skip_sentence_starts():
+    assert anchor_tokens("What is One Piece? Show episode 5") == frozenset({"name:one", "name:piece", "one", "5"})
@@ -0,0 +1,65 @@
+from collections import deque
+
+import pytest
+
+from modules.db_module.services import cache_service
+from modules.db_module.services.cache_service import ChatHistoryCache, ContextCache
+from modules.db_module.services.shared_state import SharedStateStore
+
+PAIRS = 3
+
+
+@pytest.fixture
+def workers(tmp_path, monkeypatch):
+    """Build caches the way separate worker processes would: one store connection each"""
+    path = str(tmp_path / "shared_state.db")
+    monkeypatch.setattr(cache_service, "get_shared_state", lambda: SharedStateStore(path))
+
+    def make(cache_class):
+        monkeypatch.setattr(cache_class, "_instance", None)
+        cache = cache_class()
+        if cache_class is ChatHistoryCache:
+            cache.max_pairs = PAIRS
+            cache.exchanges = deque(maxlen=PAIRS)
+        monkeypatch.setattr(cache_class, "_instance", None)
+        return cache
+
+    return make
+
+
+def test_exchanges_added_on_one_worker_are_seen_by_another(workers):
+    first, second = workers(ChatHistoryCache), workers(ChatHistoryCache)
+    assert not second.has_history()
+
+    for i in range(5):
+        first.add_new_exchange(f"q{i}", f"a{i}")
+
+    # Both rings hold the newest PAIRS exchanges, rendered the same way
+    expected = "\n".join(f"Madrus: q{i}\nShiro: a{i}" for i in range(2, 5))
+    assert first.get_rendered_history() == expected
+    assert second.get_rendered_history() == expected
+    assert [m["content"] for m in second.get_cached_history(limit=1)] == ["q4", "a4"]
+
+
+def test_workers_writing_in_turn_keep_one_history(workers):
+    first, second = workers(ChatHistoryCache), workers(ChatHistoryCache)
+
+    first.add_new_exchange("q0", "a0")
+    second.add_new_exchange("q1", "a1")
+    first.add_new_exchange("q2", "a2")
+    second.add_new_exchange("q3", "a3")
+
+    questions = [m["content"] for m in first.get_cached_history()[::2]]
+    assert questions == ["q1", "q2", "q3"]
+    assert second.get_rendered_history() == first.get_rendered_history()
+
+
+def test_context_refresh_mark_reaches_every_worker(workers):
+    first, second = workers(ContextCache), workers(ContextCache)
+
+    first.update_context("watching Frieren")
+    assert second.get_context() == "watching Frieren"
+    assert not second.should_refresh()
+
+    second.mark_for_refresh()
+    assert first.should_refresh()
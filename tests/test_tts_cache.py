@@ -0,0 +1,42 @@
+import asyncio
+import os
+import time
+
+from modules.ai.services.tts_cache import TTSAudioCache
+
+
+def test_waiter_survives_cancelled_creator(tmp_path):
+    cache = TTSAudioCache(str(tmp_path), memory_max_bytes=1024, disk_max_bytes=4096)
+    calls = []
+
+    async def create():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return b"audio"
+
+    async def scenario():
+        creator = asyncio.create_task(cache.get_or_create("k", create))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.get_or_create("k", create))
+        await asyncio.sleep(0.01)
+        creator.cancel()
+        return await asyncio.wait_for(waiter, timeout=1.0)
+
+    assert asyncio.run(scenario()) == b"audio"
+    assert len(calls) == 2
+
+
+def test_disk_budget_counts_other_workers_files_and_sweeps_tmp(tmp_path):
+    # Written by "another worker" before this one started
+    for name in ("a", "b", "c"):
+        (tmp_path / f"{name}.audio").write_bytes(b"x" * 100)
+        time.sleep(0.01)
+    stale = tmp_path / "d.audio.123.tmp"
+    stale.write_bytes(b"partial")
+    os.utime(stale, (time.time() - 3600, time.time() - 3600))
+
+    cache = TTSAudioCache(str(tmp_path), memory_max_bytes=1024, disk_max_bytes=250)
+
+    assert not stale.exists()
+    assert not (tmp_path / "a.audio").exists()
+    assert cache.stats()["disk_bytes"] == 200
@@ -0,0 +1,31 @@
+import asyncio
+import json
+import os
+
+from modules.db_module.services.write_behind import WriteBehindLog
+
+
+def test_orphan_is_replayed_by_one_worker(tmp_path):
+    orphan = tmp_path / "exchanges-99999.wal"
+    orphan.write_text("".join(json.dumps({"exchange_id": str(i)}) + "\n" for i in range(3)))
+    written = []
+
+    async def write_batch(records):
+        await asyncio.sleep(0.02)
+        written.extend(record["exchange_id"] for record in records)
+        return True
+
+    async def scenario():
+        workers = []
+        for pid in (1, 2):
+            worker = WriteBehindLog("exchanges", str(tmp_path), write_batch, batch_size=1, flush_interval=0.01)
+            worker.path = os.path.join(str(tmp_path), f"exchanges-{pid}.wal")
+            workers.append(worker)
+        await asyncio.gather(*(worker.start() for worker in workers))
+        await asyncio.sleep(0.2)
+        for worker in workers:
+            await worker.stop()
+
+    asyncio.run(scenario())
+    assert written == ["0", "1", "2"]
+    assert not orphan.exists()